@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量渲染命令行工具
+无需图形界面，从目录或JSONL文件批量生成图表
+
+用法示例：
+    python batch_render.py inputs/ -t 法律条文关系图 -o output/batch
+    python batch_render.py jobs.jsonl -o output/batch -f svg
+    python batch_render.py jobs.jsonl -o output/batch --workers 8
+    python batch_render.py huge.jsonl -o output/tiles --tiles --workers 8
+
+目录模式下每个 .txt 文件为一个任务；JSONL模式下每行一个任务：
+    {"name": "宪法体系", "text": "...", "template": "法律条文关系图", "format": "png"}
+无法解析或缺少 text 的行记为该行任务失败，其余任务照常渲染。
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from diagram_renderer import DiagramRenderer, SUPPORTED_FORMATS
+from parallel_renderer import ParallelRenderer
+from render_cache import RenderCache
+from tile_renderer import TileRenderer
+from style_compiler import compile_style
+
+
+# 文件名中不允许的字符（路径分隔符、Windows保留字符和控制字符）
+UNSAFE_NAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def safe_name(name, default):
+    """任务名称转为输出目录下的文件名，不能包含路径（例如 ../x 或绝对路径）"""
+    name = UNSAFE_NAME_CHARS.sub('_', str(name)).strip().strip('.')
+    return name or default
+
+
+def iter_jobs(source, default_template, default_format):
+    """逐个产生渲染任务，不一次性读入全部输入
+
+    JSONL中无法解析的行产生带 error 的任务（名称为 diagram_行号），由渲染函数记为失败。
+    """
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if not filename.lower().endswith('.txt'):
+                continue
+            with open(os.path.join(source, filename), 'r', encoding='utf-8') as f:
+                text = f.read()
+            yield {
+                'name': os.path.splitext(filename)[0],
+                'text': text,
+                'template': default_template,
+                'format': default_format
+            }
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                default_name = f'diagram_{line_no}'
+                try:
+                    job = json.loads(line)
+                    if not isinstance(job, dict):
+                        raise ValueError("任务应为JSON对象")
+                    yield {
+                        'name': safe_name(job.get('name', default_name), default_name),
+                        'text': job['text'],
+                        'template': job.get('template', default_template),
+                        'format': job.get('format', default_format)
+                    }
+                except (ValueError, KeyError) as e:
+                    # json.JSONDecodeError 是 ValueError 的子类
+                    yield {'name': default_name, 'format': default_format,
+                           'error': f"第{line_no}行无效: {type(e).__name__}: {e}"}
+
+
+def render_serial(jobs, template_dir, dpi, cache_dir=None):
+    """在当前进程中逐个渲染任务"""
+    cache = RenderCache(cache_dir) if cache_dir else None
+    renderer = DiagramRenderer(template_dir=template_dir, dpi=dpi, cache=cache)
+    for job in jobs:
+        if job.get('error'):
+            yield {'name': job['name'], 'ok': False, 'error': job['error']}
+            continue
+        try:
+            image_bytes = renderer.render(job['text'], job['template'], job['format'])
+            with open(job['output_path'], 'wb') as f:
+                f.write(image_bytes)
+            yield {'name': job['name'], 'ok': True, 'error': None}
+        except Exception as e:
+            yield {'name': job['name'], 'ok': False, 'error': e}
+
+
+def render_tiles(jobs, template_dir, workers=1, tile_size=256):
+    """逐个任务生成 DeepZoom 瓦片金字塔（名称.dzi 和 名称_files/），瓦片由进程池并行渲染"""
+    renderer = DiagramRenderer(template_dir=template_dir)
+    for job in jobs:
+        if job.get('error'):
+            yield {'name': job['name'], 'ok': False, 'error': job['error']}
+            continue
+        try:
+            template = renderer.get_template(job['template'])
+            template_type = template.get('type', 'hierarchy')
+            if template_type == 'image_template':
+                raise ValueError("图片模板不支持瓦片输出")
+            data = renderer.parse_text_content(job['text'])
+            scene = renderer.scene_for(data, template_type,
+                                       compile_style(template, template_type))
+            TileRenderer(scene, tile_size=tile_size).render(job['output_dir'], job['name'],
+                                                            workers=workers)
+            yield {'name': job['name'], 'ok': True, 'error': None}
+        except Exception as e:
+            yield {'name': job['name'], 'ok': False, 'error': e}
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="法学研究科研绘图工具 - 批量渲染")
+    parser.add_argument('source', help="输入目录（*.txt）或JSONL任务文件")
+    parser.add_argument('-o', '--output', default=os.path.join('output', 'batch'),
+                        help="输出目录")
+    parser.add_argument('-t', '--template', default='法律条文关系图',
+                        help="默认模板名称")
+    parser.add_argument('-f', '--format', default='png', choices=SUPPORTED_FORMATS,
+                        help="默认输出格式")
+    parser.add_argument('--dpi', type=int, default=300, help="输出分辨率")
+    parser.add_argument('--template-dir', default='templates', help="模板目录")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="并行渲染进程数（大于1时启用进程池）")
+    parser.add_argument('--cache-dir', default=None,
+                        help="渲染缓存目录，重复的输入直接复用已渲染结果")
+    parser.add_argument('--tiles', action='store_true',
+                        help="输出可缩放浏览的 DeepZoom 瓦片金字塔，适合超大图表")
+    parser.add_argument('--tile-size', type=int, default=256, help="瓦片边长（像素）")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+
+    def output_jobs():
+        for job in iter_jobs(args.source, args.template, args.format):
+            job['output_path'] = os.path.join(args.output, f"{job['name']}.{job['format']}")
+            yield job
+
+    if args.tiles:
+        def tile_jobs():
+            for job in iter_jobs(args.source, args.template, args.format):
+                job['output_dir'] = args.output
+                yield job
+        results = render_tiles(tile_jobs(), args.template_dir, args.workers, args.tile_size)
+    elif args.workers > 1:
+        results = ParallelRenderer(workers=args.workers, template_dir=args.template_dir,
+                                   dpi=args.dpi, cache_dir=args.cache_dir
+                                   ).render_batch(output_jobs())
+    else:
+        results = render_serial(output_jobs(), args.template_dir, args.dpi, args.cache_dir)
+
+    start = time.time()
+    succeeded = 0
+    failed = 0
+
+    for result in results:
+        if result['ok']:
+            succeeded += 1
+        else:
+            failed += 1
+            print(f"✗ {result['name']} 渲染失败: {result['error']}", file=sys.stderr)
+
+    elapsed = time.time() - start
+    print(f"渲染完成: 成功 {succeeded} 个, 失败 {failed} 个, 用时 {elapsed:.1f} 秒")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
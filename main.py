@@ -9,21 +9,24 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch, ConnectionPatch
-import numpy as np
 import json
 import os
 from datetime import datetime
 import sys
-from PIL import Image, ImageTk
-import base64
-import io
 
 # 添加utils目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
-from drawing_utils import DrawingUtils
 from ai_service import AlibabaCloudAIService
+from diagram_renderer import DiagramRenderer
+from render_cache import RenderCache
+from template_registry import get_registry
+from blob_store import get_blob_store
+from style_compiler import compile_style
+from llm_cache import LLMResponseCache
+from job_executor import BackgroundJobExecutor
+from live_preview import LivePreview, Debouncer, INTERACTIVE_LIMIT
+from node_dragger import NodeDragger
+from export_pipeline import ExportPipeline, targets_for
 
 class LegalResearchDrawingTool:
     def __init__(self, root):
@@ -37,18 +40,37 @@ class LegalResearchDrawingTool:
         
         # 初始化变量
         self.current_template = None
+        self.current_template_type = None
         self.drawing_data = {}
         self.canvas = None
         self.figure = None
         self.ax = None
         self.current_diagram_path = None
         
+        # 初始化渲染器（绘制逻辑与界面解耦）
+        self.renderer = DiagramRenderer(templates={})
+        
+        # 渲染缓存：重复生成相同图表时直接复用已保存的图片
+        self.render_cache = RenderCache(os.path.join('.cache', 'render'))
+        self.last_render_key = None
+        self.last_generated_text = None
+        
+        # 后台任务：分析和高清渲染不占用界面线程，使用独立的渲染器
+        self.background_renderer = DiagramRenderer(templates={}, cache=self.render_cache)
+        self.job_executor = BackgroundJobExecutor(self.root)
+        # 导出：场景只生成一次，各格式在后台进程中并行输出
+        self.export_pipeline = ExportPipeline(figsize=self.renderer.figsize)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # 初始化AI服务
-        self.ai_service = AlibabaCloudAIService("sk-4dbeb6767a574dff9eeef2c40e3acc96")
-        self.ai_enabled = self.ai_service.is_available()
+        self.ai_service = AlibabaCloudAIService("sk-4dbeb6767a574dff9eeef2c40e3acc96",
+                                                cache=LLMResponseCache())
+        # 可用性检测在后台进行，不阻塞窗口启动
+        self.ai_enabled = False
         
         self.setup_ui()
         self.load_templates()
+        self.start_ai_health_check()
         
     def setup_ui(self):
         """设置用户界面"""
@@ -102,13 +124,20 @@ class LegalResearchDrawingTool:
         ai_frame = ttk.LabelFrame(control_frame, text="AI智能功能", padding=5)
         ai_frame.pack(fill=tk.X, pady=(0, 10))
         
+        # 实时预览：编辑文本时增量更新画布
+        self.live_preview_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(text_frame, text="实时预览", variable=self.live_preview_var,
+                        command=self.toggle_live_preview).pack(anchor=tk.W, pady=(5, 0))
+        self.text_input.bind('<<Modified>>', self.on_text_modified)
+        
         self.ai_var = tk.BooleanVar(value=self.ai_enabled)
         self.ai_check = ttk.Checkbutton(ai_frame, text="启用AI分析", 
-                                       variable=self.ai_var, state='normal' if self.ai_enabled else 'disabled')
+                                       variable=self.ai_var, state='disabled')
         self.ai_check.pack(anchor=tk.W)
         
-        ai_status = "✓ AI服务可用" if self.ai_enabled else "✗ AI服务不可用"
-        ttk.Label(ai_frame, text=ai_status, foreground='green' if self.ai_enabled else 'red').pack(anchor=tk.W)
+        self.ai_status_var = tk.StringVar(value="… 正在检测AI服务")
+        self.ai_status_label = ttk.Label(ai_frame, textvariable=self.ai_status_var, foreground='gray')
+        self.ai_status_label.pack(anchor=tk.W)
         
         # 操作按钮区域
         button_frame = ttk.LabelFrame(control_frame, text="操作面板", padding=5)
@@ -132,6 +161,16 @@ class LegalResearchDrawingTool:
         ttk.Button(btn_row3, text="📤 导出模板", command=self.export_template).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=1)
         ttk.Button(btn_row3, text="🗑️ 清空画布", command=self.clear_canvas).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=1)
         
+        # 第四行按钮
+        btn_row4 = ttk.Frame(button_frame)
+        btn_row4.pack(fill=tk.X, pady=2)
+        ttk.Button(btn_row4, text="📦 导出全部格式", command=self.export_all_formats).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=1)
+        
+        # SVG/PDF 直接由场景输出，不经过matplotlib
+        self.native_vector_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(button_frame, text="SVG/PDF 快速矢量导出", 
+                        variable=self.native_vector_var).pack(anchor=tk.W, pady=(2, 0))
+        
         # 右侧绘图区域
         drawing_frame = ttk.LabelFrame(content_frame, text="绘图预览区域", padding=10)
         content_frame.add(drawing_frame, weight=3)
@@ -142,6 +181,14 @@ class LegalResearchDrawingTool:
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         
+        # 实时预览只增删变化的图形，停止输入300毫秒后才更新
+        self.live_preview = LivePreview(self.ax)
+        self.preview_debouncer = Debouncer(self.root, 300, self.update_live_preview)
+        
+        # 拖动节点：只重绘被拖动的节点和它的连线，位置保存到图表数据
+        self.node_dragger = NodeDragger(self.canvas, self.live_preview, on_moved=self.on_node_moved)
+        self.node_dragger.connect()
+        
         # 添加工具栏
         toolbar = NavigationToolbar2Tk(self.canvas, drawing_frame)
         toolbar.update()
@@ -155,7 +202,14 @@ class LegalResearchDrawingTool:
         status_bar = ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN)
         status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
-        # 添加进度条
+        # 添加进度条和取消按钮
+        self.cancel_button = ttk.Button(status_frame, text="⏹ 取消", command=self.cancel_job,
+                                        state='disabled')
+        self.cancel_button.pack(side=tk.RIGHT, padx=2)
+        
+        self.progress_bar = ttk.Progressbar(status_frame, mode='determinate', maximum=100, length=160)
+        self.progress_bar.pack(side=tk.RIGHT, padx=5)
+        
         self.progress_var = tk.StringVar()
         self.progress_var.set("")
         progress_label = ttk.Label(status_frame, textvariable=self.progress_var)
@@ -164,11 +218,45 @@ class LegalResearchDrawingTool:
     def refresh_interface(self):
         """刷新界面"""
         self.load_templates()
+        self.start_ai_health_check()
         self.status_var.set("界面已刷新")
         
+    def start_ai_health_check(self):
+        """在后台检测AI服务可用性，结果返回后更新界面"""
+        self.ai_status_var.set("… 正在检测AI服务")
+        self.ai_status_label.config(foreground='gray')
+        future = self.ai_service.probe_availability_async()
+        self.root.after(200, self.poll_ai_health_check, future)
+        
+    def poll_ai_health_check(self, future):
+        """轮询后台检测结果（Tk控件只能在主线程中更新）"""
+        if not future.done():
+            self.root.after(200, self.poll_ai_health_check, future)
+            return
+            
+        was_enabled = self.ai_enabled
+        self.ai_enabled = future.exception() is None and future.result()
+        if self.ai_enabled and not was_enabled:
+            self.ai_var.set(True)
+        self.ai_check.config(state='normal' if self.ai_enabled else 'disabled')
+        self.update_ai_status_indicator()
+        
+    def update_ai_status_indicator(self):
+        """根据检测结果和熔断状态更新AI状态指示"""
+        breaker_state = self.ai_service.circuit_breaker.state
+        if breaker_state != 'closed':
+            self.ai_status_var.set("⚠ AI服务暂时不可用（熔断中）")
+            self.ai_status_label.config(foreground='orange')
+        elif self.ai_enabled:
+            self.ai_status_var.set("✓ AI服务可用")
+            self.ai_status_label.config(foreground='green')
+        else:
+            self.ai_status_var.set("✗ AI服务不可用")
+            self.ai_status_label.config(foreground='red')
+        
     def quick_save(self):
-        """快速保存当前图表"""
-        if not self.figure:
+        """快速保存当前图表（后台导出，完成后在状态栏提示）"""
+        if not self.drawing_data:
             messagebox.showwarning("警告", "没有可保存的图表")
             return
             
@@ -176,23 +264,17 @@ class LegalResearchDrawingTool:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         template_name = self.template_var.get() if self.template_var.get() else "图表"
         filename = f"{template_name}_{timestamp}.png"
+        file_path = os.path.join("output", filename)
         
-        # 创建输出目录
-        output_dir = "output"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            
-        file_path = os.path.join(output_dir, filename)
+        def on_saved(results):
+            if results[0]['ok']:
+                self.current_diagram_path = file_path
+                self.status_var.set(f"快速保存成功: {file_path}")
+            else:
+                messagebox.showerror("错误", f"快速保存失败: {results[0]['error']}")
+                
+        self.start_export({'png': file_path}, on_saved)
         
-        try:
-            self.figure.savefig(file_path, dpi=300, bbox_inches='tight', 
-                              facecolor='white', edgecolor='none')
-            self.current_diagram_path = file_path
-            messagebox.showinfo("成功", f"图表已快速保存到: {file_path}")
-            self.status_var.set(f"快速保存成功: {filename}")
-        except Exception as e:
-            messagebox.showerror("错误", f"快速保存失败: {str(e)}")
-            
     def download_result(self):
         """下载生成结果"""
         if not self.current_diagram_path or not os.path.exists(self.current_diagram_path):
@@ -213,24 +295,95 @@ class LegalResearchDrawingTool:
         )
         
         if file_path:
+            self.export_to_path(file_path, "下载完成")
+            
+    def export_all_formats(self):
+        """同时导出 PNG/PDF/SVG/JPG 四种格式"""
+        if not self.drawing_data:
+            messagebox.showwarning("警告", "没有可导出的图表，请先生成图表")
+            return
+            
+        file_path = filedialog.asksaveasfilename(
+            initialfile=self.template_var.get() or "图表",
+            filetypes=[("所有文件", "*.*")]
+        )
+        if not file_path:
+            return
+            
+        base_path = os.path.splitext(file_path)[0]
+        
+        def on_exported(results):
+            saved = [result['format'].upper() for result in results if result['ok']]
+            failed = [f"{result['format'].upper()}: {result['error']}" for result in results if not result['ok']]
+            if failed:
+                messagebox.showerror("错误", "部分格式导出失败:\n" + "\n".join(failed))
+            self.status_var.set(f"已导出 {'/'.join(saved)} 到: {base_path}.*")
+            
+        self.start_export(targets_for(base_path, ('png', 'pdf', 'svg', 'jpg')), on_exported)
+        
+    def export_to_path(self, file_path, success_message):
+        """按扩展名导出单个文件（未知扩展名按PNG），完成后提示"""
+        fmt = os.path.splitext(file_path)[1][1:].lower()
+        fmt = 'jpg' if fmt == 'jpeg' else fmt
+        if fmt not in ('png', 'pdf', 'svg', 'jpg'):
+            fmt = 'png'
+            
+        def on_exported(results):
+            if results[0]['ok']:
+                messagebox.showinfo("成功", f"已保存到: {file_path}")
+                self.status_var.set(success_message)
+            else:
+                messagebox.showerror("错误", f"保存失败: {results[0]['error']}")
+                
+        self.start_export({fmt: file_path}, on_exported)
+        
+    def start_export(self, targets, on_done):
+        """主线程：生成一次场景，交给后台进程输出 targets（{格式: 路径}）
+        
+        导出的是当前图表数据（包括拖动后的节点位置），与画布的缩放平移无关；
+        画布仍是缓存中的生成结果时，PNG直接写入缓存的图片。
+        """
+        template = self.current_template or {}
+        template_type = self.current_template_type or template.get('type', 'hierarchy')
+        data = self.drawing_data
+        
+        prerendered = {}
+        if self.last_render_key:
+            cached = self.render_cache.get(self.last_render_key)
+            if cached is not None:
+                prerendered['png'] = cached
+                
+        scene = None
+        if template_type != "image_template" and set(targets) - set(prerendered):
+            scene = self.renderer.scene_for(data, template_type,
+                                            compile_style(template, template_type))
+            
+        try:
+            backend = 'native' if self.native_vector_var.get() else 'matplotlib'
+            job = self.export_pipeline.export(targets, scene=scene, data=data, template=template,
+                                              template_type=template_type, prerendered=prerendered,
+                                              backend=backend)
+        except Exception as e:
+            messagebox.showerror("错误", f"导出失败: {str(e)}")
+            return
+        self.status_var.set(f"正在后台导出 {'/'.join(fmt.upper() for fmt in targets)}...")
+        self.root.after(100, self.poll_export, job, on_done)
+        
+    def poll_export(self, job, on_done):
+        """轮询后台导出结果（Tk控件只能在主线程中更新）"""
+        if not job.done():
+            self.root.after(100, self.poll_export, job, on_done)
+            return
+        results = []
+        for fmt, future in job.futures.items():
             try:
-                # 根据选择的格式保存
-                if file_path.lower().endswith('.pdf'):
-                    self.figure.savefig(file_path, format='pdf', dpi=300, bbox_inches='tight')
-                elif file_path.lower().endswith('.svg'):
-                    self.figure.savefig(file_path, format='svg', dpi=300, bbox_inches='tight')
-                elif file_path.lower().endswith('.jpg'):
-                    self.figure.savefig(file_path, format='jpg', dpi=300, bbox_inches='tight')
-                else:
-                    # 复制原文件
-                    import shutil
-                    shutil.copy2(self.current_diagram_path, file_path)
-                    
-                messagebox.showinfo("成功", f"结果已下载到: {file_path}")
-                self.status_var.set("下载完成")
+                results.append(future.result())
             except Exception as e:
-                messagebox.showerror("错误", f"下载失败: {str(e)}")
-                
+                # 工作进程异常退出或导出已被取消
+                results.append({'format': fmt, 'path': None, 'ok': False, 'size': 0,
+                                'error': str(e) or type(e).__name__})
+        on_done(results)
+        
     def preview_template(self):
         """预览模板"""
         if not self.current_template:
@@ -260,44 +413,12 @@ class LegalResearchDrawingTool:
         
     def load_templates(self):
         """加载内置模板"""
-        self.templates = {}
-        
-        # 加载法学模板
-        legal_template_path = os.path.join('templates', 'legal_templates.json')
-        if os.path.exists(legal_template_path):
-            try:
-                with open(legal_template_path, 'r', encoding='utf-8') as f:
-                    legal_templates = json.load(f)
-                    self.templates.update(legal_templates)
-            except Exception as e:
-                print(f"加载法学模板文件失败: {e}")
-        
-        # 加载学术论文模板
-        academic_template_path = os.path.join('templates', 'academic_templates.json')
-        if os.path.exists(academic_template_path):
-            try:
-                with open(academic_template_path, 'r', encoding='utf-8') as f:
-                    academic_templates = json.load(f)
-                    self.templates.update(academic_templates)
-            except Exception as e:
-                print(f"加载学术论文模板文件失败: {e}")
-        
-        # 如果没有加载到任何模板，使用默认模板
-        if not self.templates:
-            self.templates = {
-                "法律条文关系图": {
-                    "type": "hierarchy",
-                    "description": "展示法律条文之间的层级关系",
-                    "layout": "vertical",
-                    "default_text": "宪法\n基本法\n行政法规\n部门规章\n地方性法规"
-                },
-                "学术论文研究框架图": {
-                    "type": "framework",
-                    "description": "展示学术论文的研究框架和结构",
-                    "layout": "grid",
-                    "default_text": "研究背景\n文献综述\n理论框架\n研究方法\n数据分析\n结论建议"
-                }
-            }
+        # 加载法学模板和学术论文模板，没有模板文件时使用默认模板；
+        # 注册表只重新解析修改过的模板文件，导入的模板仍然保留
+        self.templates = get_registry()
+        self.templates.refresh()
+        self.renderer.templates = self.templates
+        self.background_renderer.templates = self.templates
         
         self.template_combo['values'] = list(self.templates.keys())
         if self.templates:
@@ -317,7 +438,7 @@ class LegalResearchDrawingTool:
                 self.text_input.insert("1.0", self.current_template['default_text'])
                 
     def generate_diagram(self):
-        """生成图表"""
+        """生成图表（分析和高清渲染在后台线程中执行，界面保持响应）"""
         if not self.current_template:
             messagebox.showwarning("警告", "请先选择一个模板")
             return
@@ -327,135 +448,233 @@ class LegalResearchDrawingTool:
             messagebox.showwarning("警告", "请输入文本内容")
             return
             
-        try:
-            self.clear_canvas()
-            self.progress_var.set("正在生成图表...")
-            self.root.update()
-            
-            # 如果启用AI分析
-            if self.ai_var.get() and self.ai_enabled:
-                self.status_var.set("AI正在分析文本...")
-                self.root.update()
-
-                # AI分析文本结构
-                ai_analysis = self.ai_service.analyze_text_structure(text_content)
-
-                # 使用AI建议的图表类型
-                if ai_analysis.get('suggested_type'):
-                    template_type = ai_analysis['suggested_type']
-                else:
-                    template_type = self.current_template.get('type', 'hierarchy')
-
-                # 使用AI增强的文本内容
-                enhanced_text = ai_analysis.get('enhanced_text', text_content)
-                if enhanced_text != text_content:
-                    self.text_input.delete("1.0", tk.END)
-                    self.text_input.insert("1.0", enhanced_text)
-                    text_content = enhanced_text
+        template = self.current_template
+        use_ai = self.ai_var.get() and self.ai_enabled
+        previous_data = self.drawing_data
+        self.preview_debouncer.cancel()
+        
+        # 提交新任务会自动取消正在进行的任务
+        self.job_executor.submit(
+            lambda token, progress: self.run_generate_job(token, progress, text_content,
+                                                          template, use_ai, previous_data),
+            on_success=self.on_generate_finished,
+            on_error=self.on_generate_failed,
+            on_progress=self.on_job_progress,
+            on_cancel=self.on_job_cancelled
+        )
+        self.set_job_running(True)
+        self.status_var.set("正在生成图表...")
+        
+    def run_generate_job(self, token, progress, text_content, template, use_ai,
+                         previous_data=None):
+        """后台线程：AI分析、文本解析和300dpi渲染（不能访问Tk控件）
 
+        AI请求不加锁，被取消的旧任务仍在等待网络时新任务可以开始；解析和渲染
+        使用共享的渲染器，在执行器的锁内进行。
+        """
+        enhanced_text = text_content
+        ai_analysis = None
+        
+        # 如果启用AI分析
+        if use_ai:
+            progress(0.1, "AI正在分析文本...")
+            
+            # AI分析文本结构
+            ai_analysis = self.ai_service.analyze_text_structure(text_content)
+            
+            # 使用AI建议的图表类型
+            if ai_analysis.get('suggested_type'):
+                template_type = ai_analysis['suggested_type']
+            else:
+                template_type = template.get('type', 'hierarchy')
+                
+            # 使用AI增强的文本内容
+            enhanced_text = ai_analysis.get('enhanced_text', text_content)
+        else:
+            progress(0.1, "正在解析文本...")
+            template_type = template["type"]
+            
+        with self.job_executor.lock:
+            token.raise_if_cancelled()
+            if ai_analysis is not None:
                 # 解析AI分析的结果
-                parsed_data = self.parse_ai_analysis(ai_analysis)
+                parsed_data = self.renderer.parse_ai_analysis(ai_analysis)
             else:
                 # 传统解析方法
-                parsed_data = self.parse_text_content(text_content)
-                template_type = self.current_template["type"]
-
+                parsed_data = self.renderer.parse_text_content(text_content)
+            
+            # 保留拖动过且文字未变的节点位置
+            self.carry_positions(previous_data, parsed_data)
+            
+            # 预先渲染快速保存所需的高清图片，结果写入渲染缓存
+            progress(0.4, "正在渲染高清图片...")
+            self.background_renderer.render_data(parsed_data, template, 'png', 300, template_type)
+        token.raise_if_cancelled()
+        
+        progress(0.9, "正在更新预览...")
+        return {
+            'text_content': text_content,
+            'enhanced_text': enhanced_text,
+            'parsed_data': parsed_data,
+            'template': template,
+            'template_type': template_type
+        }
+        
+    def on_generate_finished(self, result):
+        """主线程：显示生成结果"""
+        self.update_ai_status_indicator()
+        
+        # 使用AI增强的文本内容
+        if result['enhanced_text'] != result['text_content']:
+            self.text_input.delete("1.0", tk.END)
+            self.text_input.insert("1.0", result['enhanced_text'])
+            
+        parsed_data = result['parsed_data']
+        # 使用提交任务时的模板：任务运行期间切换模板不影响缓存键和绘制结果
+        template = result['template']
+        template_type = result['template_type']
+        self.current_template_type = template_type
+        self.last_generated_text = result['enhanced_text']
+        self.drawing_data = parsed_data
+        
+        # 相同输入且画布上已是该结果时，无需重新绘制
+        render_key = RenderCache.make_key(parsed_data, template, 'png', 300, template_type)
+        if render_key != self.last_render_key:
+            self.clear_canvas()
+            
+            # 图形不多时逐个绘制，可以拖动节点
+            style = compile_style(template, template_type)
+            scene = None
+            if template_type != "image_template":
+                scene = self.renderer.build_scene(self.ax, parsed_data, template_type, style)
+            if scene is not None and scene.size <= INTERACTIVE_LIMIT:
+                self.live_preview.update(scene)
             # 根据模板类型绘制图表
-            if template_type == "image_template":
-                self.draw_image_template_diagram(parsed_data)
+            elif template_type == "image_template":
+                self.draw_image_template_diagram(parsed_data, template)
             elif template_type == "hierarchy":
-                self.draw_hierarchy_diagram(parsed_data)
+                self.draw_hierarchy_diagram(parsed_data, style)
             elif template_type == "flowchart":
-                self.draw_flowchart_diagram(parsed_data)
+                self.draw_flowchart_diagram(parsed_data, style)
             elif template_type == "network":
-                self.draw_network_diagram(parsed_data)
+                self.draw_network_diagram(parsed_data, style)
             elif template_type == "decision_tree":
-                self.draw_decision_tree_diagram(parsed_data)
+                self.draw_decision_tree_diagram(parsed_data, style)
             elif template_type == "framework":
-                self.draw_framework_diagram(parsed_data)
+                self.draw_framework_diagram(parsed_data, style)
             else:
-                self.draw_hierarchy_diagram(parsed_data)
-
-            # 更新画布
-            self.canvas.draw()
-            self.status_var.set("图表生成完成")
+                self.draw_hierarchy_diagram(parsed_data, style)
+                
+            # 记录当前画布内容，缩放或平移后失效
+            self.last_render_key = render_key
+            self.ax.callbacks.connect('xlim_changed', self.invalidate_render_key)
+            self.ax.callbacks.connect('ylim_changed', self.invalidate_render_key)
+            
+        # 更新画布
+        self.canvas.draw_idle()
+        self.set_job_running(False)
+        self.status_var.set("图表生成完成")
+        
+        # 自动快速保存（高清图片已在后台渲染并缓存，导出只需写文件）
+        self.quick_save()
+        
+    def on_generate_failed(self, error):
+        """主线程：生成失败"""
+        self.set_job_running(False)
+        self.update_ai_status_indicator()
+        messagebox.showerror("错误", f"生成图表失败: {str(error)}")
+        self.status_var.set("生成失败")
+        
+    def on_job_progress(self, fraction, message):
+        """主线程：更新进度"""
+        self.progress_bar['value'] = fraction * 100
+        self.progress_var.set(message)
+        
+    def on_job_cancelled(self):
+        """主线程：任务已取消"""
+        self.set_job_running(False)
+        self.status_var.set("已取消")
+        
+    def cancel_job(self):
+        """取消正在进行的后台任务"""
+        self.job_executor.cancel()
+        
+    def set_job_running(self, running):
+        """切换任务进行中的界面状态"""
+        self.cancel_button.config(state='normal' if running else 'disabled')
+        if not running:
+            self.progress_bar['value'] = 0
             self.progress_var.set("")
             
-            # 自动快速保存
-            self.quick_save()
+    def on_text_modified(self, event=None):
+        """文本变化时安排一次实时预览"""
+        if not self.text_input.edit_modified():
+            return
+        # 重置修改标志，否则之后的编辑不会再触发 <<Modified>>
+        self.text_input.edit_modified(False)
+        if self.live_preview_var.get():
+            self.preview_debouncer.trigger()
+            
+    def toggle_live_preview(self):
+        """开启时立即预览，关闭时取消尚未执行的预览"""
+        if self.live_preview_var.get():
+            self.preview_debouncer.trigger()
+        else:
+            self.preview_debouncer.cancel()
+            
+    def update_live_preview(self):
+        """主线程：解析当前文本并增量更新画布（不使用AI）"""
+        if not self.current_template:
+            return
+        text_content = self.text_input.get("1.0", tk.END).strip()
+        if not text_content:
+            return
+        # 画布已是该文本的生成结果（例如刚写回AI增强文本）时不覆盖
+        if self.last_render_key is not None and text_content == self.last_generated_text:
+            return
             
-        except Exception as e:
-            messagebox.showerror("错误", f"生成图表失败: {str(e)}")
-            self.status_var.set("生成失败")
-            self.progress_var.set("")
+        parsed_data = self.renderer.parse_text_content(text_content)
+        self.carry_positions(self.drawing_data, parsed_data)
+        self.drawing_data = parsed_data
+        self.current_template_type = self.current_template.get('type', 'hierarchy')
+        scene = self.renderer.build_scene(self.ax, parsed_data, self.current_template_type,
+                                          self.current_style())
+        if scene is None:
+            # 图片模板没有可比较的场景，需要点击生成
+            return
+            
+        stats = self.live_preview.update(scene)
+        self.invalidate_render_key()
+        self.canvas.draw_idle()
+        self.status_var.set(f"实时预览: 新增{stats['added']} 删除{stats['removed']} "
+                            f"移动{stats['moved']} 修改{stats['changed']}")
+        
+    def on_node_moved(self, node_id, position):
+        """主线程：节点拖动结束，位置保存到图表数据中"""
+        x, y = position
+        self.drawing_data.setdefault('positions', {})[node_id] = [round(x, 3), round(y, 3)]
+        self.invalidate_render_key()
+        self.status_var.set(f"节点已移动到 ({x:.1f}, {y:.1f})，位置已保存")
+        
+    @staticmethod
+    def carry_positions(previous_data, parsed_data):
+        """把上一次拖动的节点位置带到新的解析结果中（只保留ID和文字都未变的节点）"""
+        positions = (previous_data or {}).get('positions')
+        if not positions:
+            return
+        previous_text = {node['id']: node['text'] for node in previous_data.get('nodes', [])}
+        kept = {node['id']: positions[node['id']] for node in parsed_data.get('nodes', [])
+                if node['id'] in positions and previous_text.get(node['id']) == node['text']}
+        if kept:
+            parsed_data['positions'] = kept
             
     def parse_text_content(self, text):
         """解析文本内容"""
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        # 简单的解析逻辑，可以根据需要扩展
-        parsed_data = {
-            'title': lines[0] if lines else "法学研究图表",
-            'nodes': [],
-            'connections': []
-        }
-        
-        for i, line in enumerate(lines[1:], 1):
-            if '->' in line or '→' in line:
-                # 连接关系
-                parts = line.replace('→', '->').split('->')
-                if len(parts) == 2:
-                    parsed_data['connections'].append({
-                        'from': parts[0].strip(),
-                        'to': parts[1].strip()
-                    })
-            else:
-                # 节点
-                parsed_data['nodes'].append({
-                    'id': f"node_{i}",
-                    'text': line,
-                    'level': i
-                })
-                
-        return parsed_data
+        return self.renderer.parse_text_content(text)
     
     def parse_ai_analysis(self, ai_analysis):
         """解析AI分析结果"""
-        parsed_data = {
-            'title': "AI智能分析图表",
-            'nodes': [],
-            'connections': []
-        }
-        
-        # 处理AI分析的概念
-        concepts = ai_analysis.get('concepts', [])
-        for i, concept in enumerate(concepts):
-            if isinstance(concept, dict):
-                node = {
-                    'id': concept.get('id', f'node_{i}'),
-                    'text': concept.get('text', str(concept)),
-                    'level': concept.get('level', 1)
-                }
-            else:
-                node = {
-                    'id': f'node_{i}',
-                    'text': str(concept),
-                    'level': 1
-                }
-            parsed_data['nodes'].append(node)
-        
-        # 处理连接关系
-        connections = ai_analysis.get('connections', [])
-        for conn in connections:
-            if isinstance(conn, dict):
-                parsed_data['connections'].append({
-                    'from': conn.get('from', ''),
-                    'to': conn.get('to', ''),
-                    'type': conn.get('type', 'simple'),
-                    'label': conn.get('label', '')
-                })
-        
-        return parsed_data
+        return self.renderer.parse_ai_analysis(ai_analysis)
     
     def enhance_content(self):
         """AI内容增强"""
@@ -468,322 +687,82 @@ class LegalResearchDrawingTool:
             messagebox.showwarning("警告", "请输入文本内容")
             return
         
-        try:
-            self.status_var.set("AI正在增强内容...")
-            self.root.update()
-            
-            # 获取当前模板类型
-            template_type = self.current_template.get('type', 'hierarchy') if self.current_template else 'hierarchy'
-            
-            # AI增强内容
-            enhanced_text = self.ai_service.enhance_diagram_content(text_content, template_type)
-            
-            # 更新文本输入
-            self.text_input.delete("1.0", tk.END)
-            self.text_input.insert("1.0", enhanced_text)
-            
-            self.status_var.set("AI内容增强完成")
-            messagebox.showinfo("成功", "AI已成功增强内容，请重新生成图表")
-            
-        except Exception as e:
-            messagebox.showerror("错误", f"AI内容增强失败: {str(e)}")
-            self.status_var.set("AI内容增强失败")
+        # 获取当前模板类型
+        template_type = self.current_template.get('type', 'hierarchy') if self.current_template else 'hierarchy'
         
-    def draw_hierarchy_diagram(self, data):
+        def run_enhance_job(token, progress):
+            progress(0.1, "AI正在增强内容...")
+            return self.ai_service.enhance_diagram_content(text_content, template_type)
+            
+        self.job_executor.submit(
+            run_enhance_job,
+            on_success=self.on_enhance_finished,
+            on_error=self.on_enhance_failed,
+            on_progress=self.on_job_progress,
+            on_cancel=self.on_job_cancelled
+        )
+        self.set_job_running(True)
+        self.status_var.set("AI正在增强内容...")
+        
+    def on_enhance_finished(self, enhanced_text):
+        """主线程：显示增强后的内容"""
+        self.set_job_running(False)
+        self.update_ai_status_indicator()
+        
+        # 更新文本输入
+        self.text_input.delete("1.0", tk.END)
+        self.text_input.insert("1.0", enhanced_text)
+        
+        self.status_var.set("AI内容增强完成")
+        messagebox.showinfo("成功", "AI已成功增强内容，请重新生成图表")
+        
+    def on_enhance_failed(self, error):
+        """主线程：内容增强失败"""
+        self.set_job_running(False)
+        messagebox.showerror("错误", f"AI内容增强失败: {str(error)}")
+        self.status_var.set("AI内容增强失败")
+        
+    def current_style(self):
+        """当前模板编译后的样式（注册表按模板名称缓存编译结果）"""
+        name = self.template_var.get()
+        if name in self.templates and self.templates[name] is self.current_template:
+            return self.templates.style(name, self.current_template_type)
+        return compile_style(self.current_template, self.current_template_type)
+        
+    def draw_hierarchy_diagram(self, data, style=None):
         """绘制层级关系图"""
-        self.ax.clear()
-        
-        nodes = data['nodes']
-        connections = data['connections']
-        
-        # 计算节点位置
-        levels = {}
-        for node in nodes:
-            level = node.get('level', 1)
-            if level not in levels:
-                levels[level] = []
-            levels[level].append(node)
-            
-        # 绘制节点
-        node_positions = {}
-        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
-        
-        for level, level_nodes in levels.items():
-            y = 10 - level * 2
-            for i, node in enumerate(level_nodes):
-                x = (i - len(level_nodes) / 2) * 3
-                node_positions[node['id']] = (x, y)
-                
-                # 绘制节点框
-                box = FancyBboxPatch((x-1.2, y-0.5), 2.4, 1, 
-                                   boxstyle="round,pad=0.1", 
-                                   facecolor=colors[level % len(colors)],
-                                   edgecolor='black', linewidth=2)
-                self.ax.add_patch(box)
-                
-                # 添加文本
-                self.ax.text(x, y, node['text'], ha='center', va='center', 
-                           fontsize=10, fontweight='bold')
-                
-        # 绘制连接线
-        for conn in connections:
-            from_node = conn.get('from', '')
-            to_node = conn.get('to', '')
-            conn_type = conn.get('type', 'simple')
-            label = conn.get('label', '')
-            
-            # 查找节点位置
-            from_pos = None
-            to_pos = None
-            
-            for node in nodes:
-                if node['text'] == from_node:
-                    from_pos = node_positions.get(node['id'])
-                elif node['text'] == to_node:
-                    to_pos = node_positions.get(node['id'])
-            
-            if from_pos and to_pos:
-                x1, y1 = from_pos
-                x2, y2 = to_pos
-                
-                # 使用高级箭头绘制
-                DrawingUtils.draw_advanced_arrow(
-                    self.ax, x1, y1, x2, y2, 
-                    arrow_type=conn_type, 
-                    color='black', 
-                    linewidth=2, 
-                    label=label
-                )
-        
-        # 如果没有明确的连接关系，使用层次连接
-        if not connections and len(nodes) > 1:
-            for i in range(len(nodes) - 1):
-                pos1 = node_positions.get(nodes[i]['id'])
-                pos2 = node_positions.get(nodes[i+1]['id'])
-                if pos1 and pos2:
-                    DrawingUtils.draw_hierarchical_connection(
-                        self.ax, pos1, pos2, i+1, 'black', 2
-                    )
-                    
-        self.ax.set_xlim(-10, 10)
-        self.ax.set_ylim(0, 12)
-        self.ax.set_title(data['title'], fontsize=16, fontweight='bold', pad=20)
-        self.ax.axis('off')
+        self.renderer.draw_hierarchy(self.ax, data, style or self.current_style())
         
-    def draw_flowchart_diagram(self, data):
+    def draw_flowchart_diagram(self, data, style=None):
         """绘制流程图"""
-        self.ax.clear()
-        
-        nodes = data['nodes']
-        
-        # 绘制流程图
-        for i, node in enumerate(nodes):
-            x = 0
-            y = 10 - i * 2
-            
-            # 绘制流程框
-            if i == 0:  # 开始
-                box = FancyBboxPatch((x-1.5, y-0.5), 3, 1, 
-                                   boxstyle="round,pad=0.1", 
-                                   facecolor='#90EE90', edgecolor='black', linewidth=2)
-            elif i == len(nodes) - 1:  # 结束
-                box = FancyBboxPatch((x-1.5, y-0.5), 3, 1, 
-                                   boxstyle="round,pad=0.1", 
-                                   facecolor='#FFB6C1', edgecolor='black', linewidth=2)
-            else:  # 过程
-                box = FancyBboxPatch((x-1.5, y-0.5), 3, 1, 
-                                   boxstyle="round,pad=0.1", 
-                                   facecolor='#87CEEB', edgecolor='black', linewidth=2)
-                
-            self.ax.add_patch(box)
-            self.ax.text(x, y, node['text'], ha='center', va='center', 
-                       fontsize=10, fontweight='bold')
-            
-            # 绘制箭头
-            if i < len(nodes) - 1:
-                DrawingUtils.draw_advanced_arrow(
-                    self.ax, x, y+0.5, x, y-0.5, 
-                    arrow_type='simple', 
-                    color='black', 
-                    linewidth=2
-                )
-                
-        self.ax.set_xlim(-5, 5)
-        self.ax.set_ylim(0, 12)
-        self.ax.set_title(data['title'], fontsize=16, fontweight='bold', pad=20)
-        self.ax.axis('off')
+        self.renderer.draw_flowchart(self.ax, data, style or self.current_style())
         
-    def draw_network_diagram(self, data):
+    def draw_network_diagram(self, data, style=None):
         """绘制网络图"""
-        self.ax.clear()
-        
-        nodes = data['nodes']
-        
-        # 计算节点位置（圆形布局）
-        n = len(nodes)
-        for i, node in enumerate(nodes):
-            angle = 2 * np.pi * i / n
-            x = 5 * np.cos(angle)
-            y = 5 * np.sin(angle)
-            
-            # 绘制节点
-            circle = patches.Circle((x, y), 1, facecolor='#FFD700', 
-                                  edgecolor='black', linewidth=2)
-            self.ax.add_patch(circle)
-            
-            # 添加文本
-            self.ax.text(x, y, node['text'], ha='center', va='center', 
-                       fontsize=9, fontweight='bold')
-            
-            # 绘制连接线
-            if i < n - 1:
-                next_angle = 2 * np.pi * (i + 1) / n
-                next_x = 5 * np.cos(next_angle)
-                next_y = 5 * np.sin(next_angle)
-                
-                DrawingUtils.draw_advanced_arrow(
-                    self.ax, x, y, next_x, next_y, 
-                    arrow_type='simple', 
-                    color='black', 
-                    linewidth=1
-                )
-                
-        self.ax.set_xlim(-8, 8)
-        self.ax.set_ylim(-8, 8)
-        self.ax.set_title(data['title'], fontsize=16, fontweight='bold', pad=20)
-        self.ax.axis('off')
+        self.renderer.draw_network(self.ax, data, style or self.current_style())
         
-    def draw_decision_tree_diagram(self, data):
+    def draw_decision_tree_diagram(self, data, style=None):
         """绘制决策树"""
-        self.ax.clear()
+        self.renderer.draw_decision_tree(self.ax, data, style or self.current_style())
         
-        nodes = data['nodes']
-        
-        # 绘制决策树
-        for i, node in enumerate(nodes):
-            x = 0
-            y = 10 - i * 1.5
-            
-            # 绘制菱形（决策节点）
-            if i % 2 == 0:
-                diamond = patches.Polygon([(x-1, y), (x, y+0.5), (x+1, y), (x, y-0.5)], 
-                                        facecolor='#FFA07A', edgecolor='black', linewidth=2)
-                self.ax.add_patch(diamond)
-            else:
-                # 绘制矩形（结果节点）
-                box = FancyBboxPatch((x-1, y-0.5), 2, 1, 
-                                   boxstyle="round,pad=0.1", 
-                                   facecolor='#98FB98', edgecolor='black', linewidth=2)
-                self.ax.add_patch(box)
-                
-            self.ax.text(x, y, node['text'], ha='center', va='center', 
-                       fontsize=9, fontweight='bold')
-            
-            # 绘制连接线
-            if i < len(nodes) - 1:
-                self.ax.annotate('', xy=(x, y-0.5), xytext=(x, y+0.5),
-                               arrowprops=dict(arrowstyle='->', lw=2, color='black'))
-                
-        self.ax.set_xlim(-5, 5)
-        self.ax.set_ylim(0, 12)
-        self.ax.set_title(data['title'], fontsize=16, fontweight='bold', pad=20)
-        self.ax.axis('off')
-        
-    def draw_framework_diagram(self, data):
+    def draw_framework_diagram(self, data, style=None):
         """绘制框架图"""
-        self.ax.clear()
+        self.renderer.draw_framework(self.ax, data, style or self.current_style())
         
-        nodes = data['nodes']
-        
-        # 网格布局
-        cols = 3
-        rows = (len(nodes) + cols - 1) // cols
-        
-        for i, node in enumerate(nodes):
-            row = i // cols
-            col = i % cols
-            
-            x = (col - 1) * 4
-            y = 8 - row * 2
-            
-            # 绘制框架框
-            box = FancyBboxPatch((x-1.5, y-0.5), 3, 1, 
-                               boxstyle="round,pad=0.1", 
-                               facecolor='#E6E6FA', edgecolor='black', linewidth=2)
-            self.ax.add_patch(box)
-            
-            # 添加文本
-            self.ax.text(x, y, node['text'], ha='center', va='center', 
-                       fontsize=9, fontweight='bold')
-            
-        self.ax.set_xlim(-6, 6)
-        self.ax.set_ylim(0, 10)
-        self.ax.set_title(data['title'], fontsize=16, fontweight='bold', pad=20)
-        self.ax.axis('off')
-        
-    def draw_image_template_diagram(self, data):
-        """绘制图片模板图表"""
-        if not self.current_template or self.current_template.get('type') != 'image_template':
+    def draw_image_template_diagram(self, data, template=None):
+        """绘制图片模板图表（默认使用当前模板）"""
+        template = template or self.current_template
+        if not template or template.get('type') != 'image_template':
             return
             
         try:
-            # 获取图片数据
-            image_base64 = self.current_template.get('image_base64')
-            if not image_base64:
-                messagebox.showerror("错误", "图片模板数据不完整")
-                return
-                
-            # 解码base64图片数据
-            image_data = base64.b64decode(image_base64)
-            image = Image.open(io.BytesIO(image_data))
-            
-            # 调整图片大小以适应画布
-            fig_width, fig_height = self.figure.get_size_inches()
-            dpi = self.figure.dpi
-            canvas_width = fig_width * dpi
-            canvas_height = fig_height * dpi
-            
-            # 计算图片显示尺寸
-            img_width, img_height = image.size
-            aspect_ratio = img_width / img_height
-            canvas_aspect = canvas_width / canvas_height
-            
-            if aspect_ratio > canvas_aspect:
-                # 图片更宽，以宽度为准
-                display_width = canvas_width * 0.8
-                display_height = display_width / aspect_ratio
-            else:
-                # 图片更高，以高度为准
-                display_height = canvas_height * 0.8
-                display_width = display_height * aspect_ratio
-                
-            # 调整图片大小
-            image = image.resize((int(display_width), int(display_height)), Image.Resampling.LANCZOS)
-            
-            # 显示图片
-            self.ax.imshow(image, extent=[-6, 6, -4, 4])
-            
-            # 添加标题
-            title = data.get('title', '图片模板图表')
-            self.ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
-            
-            # 如果有文本内容，在图片下方显示
-            if data.get('nodes'):
-                text_content = '\n'.join([node['text'] for node in data['nodes']])
-                self.ax.text(0, -5, text_content, ha='center', va='top', 
-                           fontsize=10, bbox=dict(boxstyle="round,pad=0.5", 
-                                                facecolor='lightblue', alpha=0.7))
-            
-            self.ax.set_xlim(-6, 6)
-            self.ax.set_ylim(-6, 6)
-            self.ax.axis('off')
-            
+            self.renderer.draw_image_template(self.ax, data, template)
         except Exception as e:
             messagebox.showerror("错误", f"绘制图片模板失败: {str(e)}")
         
     def save_diagram(self):
         """保存图表"""
-        if not self.figure:
+        if not self.drawing_data:
             messagebox.showwarning("警告", "没有可保存的图表")
             return
             
@@ -793,13 +772,8 @@ class LegalResearchDrawingTool:
         )
         
         if file_path:
-            try:
-                self.figure.savefig(file_path, dpi=300, bbox_inches='tight')
-                messagebox.showinfo("成功", f"图表已保存到: {file_path}")
-                self.status_var.set("图表保存成功")
-            except Exception as e:
-                messagebox.showerror("错误", f"保存失败: {str(e)}")
-                
+            self.export_to_path(file_path, "图表保存成功")
+            
     def import_template(self):
         """导入模板 - 支持JSON和图片格式"""
         file_path = filedialog.askopenfilename(
@@ -821,16 +795,16 @@ class LegalResearchDrawingTool:
                         template_data = json.load(f)
                     
                     template_name = template_data.get('name', '导入的JSON模板')
-                    self.templates[template_name] = template_data
+                    # 内嵌的图片数据存入图片存储，模板中只保留哈希
+                    template_data = get_blob_store().externalize(template_data)
+                    self.templates.register(template_name, template_data)
                     
                 elif file_ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff']:
                     # 导入图片模板
                     template_name = os.path.splitext(os.path.basename(file_path))[0]
                     
-                    # 读取图片并转换为base64
-                    with open(file_path, 'rb') as f:
-                        image_data = f.read()
-                        image_base64 = base64.b64encode(image_data).decode('utf-8')
+                    # 图片按内容哈希保存到图片存储
+                    image_blob = get_blob_store().put_file(file_path)
                     
                     # 创建图片模板数据结构
                     template_data = {
@@ -839,12 +813,12 @@ class LegalResearchDrawingTool:
                         'description': f'从图片导入的模板: {template_name}',
                         'layout': 'image',
                         'image_path': file_path,
-                        'image_base64': image_base64,
+                        'image_blob': image_blob,
                         'image_format': file_ext[1:],  # 去掉点号
                         'default_text': f'基于图片模板 {template_name} 的图表'
                     }
                     
-                    self.templates[template_name] = template_data
+                    self.templates.register(template_name, template_data)
                     
                 else:
                     messagebox.showerror("错误", f"不支持的文件格式: {file_ext}")
@@ -873,9 +847,10 @@ class LegalResearchDrawingTool:
         
         if file_path:
             try:
+                # 图片模板导出时内嵌图片数据，在其他电脑上也能导入
                 template_data = {
                     'name': self.template_var.get(),
-                    **self.current_template
+                    **get_blob_store().inline(self.current_template)
                 }
                 
                 with open(file_path, 'w', encoding='utf-8') as f:
@@ -887,9 +862,22 @@ class LegalResearchDrawingTool:
             except Exception as e:
                 messagebox.showerror("错误", f"导出模板失败: {str(e)}")
                 
+    def invalidate_render_key(self, ax=None):
+        """画布内容与缓存不再一致（缩放、平移或清空）"""
+        self.last_render_key = None
+        
+    def on_close(self):
+        """关闭窗口"""
+        self.preview_debouncer.cancel()
+        self.job_executor.shutdown()
+        self.export_pipeline.shutdown()
+        self.root.destroy()
+        
     def clear_canvas(self):
         """清空画布"""
+        self.invalidate_render_key()
         if self.ax:
+            self.live_preview.reset()
             self.ax.clear()
             self.ax.set_xlim(0, 10)
             self.ax.set_ylim(0, 10)
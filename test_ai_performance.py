@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试AI服务性能相关功能
+验证LLM响应缓存和连接池，使用本地模拟服务器，不访问真实的阿里云接口
+"""
+
+import os
+import sys
+import time
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """本地模拟的LLM接口，按预设状态码序列依次响应"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length))
+        server.client_ports.append(self.client_address[1])
+
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+
+        status = server.statuses.pop(0) if server.statuses else 200
+        if status == 200:
+            prompt = request['input']['messages'][0]['content']
+            text = server.reply if server.reply is not None else f'回复: {prompt}'
+            body = json.dumps({'output': {'text': text}}, ensure_ascii=False)
+        else:
+            body = json.dumps({'message': 'error'})
+        body = body.encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(statuses=None):
+    """启动本地模拟服务器，返回服务器和接口地址"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubLLMHandler)
+    server.statuses = list(statuses or [])
+    server.client_ports = []
+    server.delay = 0
+    server.reply = None
+    server.lock = threading.Lock()
+    server.active = 0
+    server.max_active = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+
+def test_llm_cache_ttl_and_eviction():
+    """测试缓存过期和容量淘汰"""
+    print("=== 测试LLM响应缓存 ===")
+    from llm_cache import LLMResponseCache
+
+    cache = LLMResponseCache(':memory:', ttl=60, max_entries=2)
+    key_a = cache.make_key('qwen-turbo', '提示词A', {'temperature': 0.7})
+    key_b = cache.make_key('qwen-turbo', '提示词B', {'temperature': 0.7})
+    key_c = cache.make_key('qwen-turbo', '提示词C', {'temperature': 0.7})
+
+    assert key_a != cache.make_key('qwen-turbo', '提示词A', {'temperature': 0.9})
+    assert key_a != cache.make_key('qwen-plus', '提示词A', {'temperature': 0.7})
+
+    cache.put(key_a, 'qwen-turbo', '响应A')
+    time.sleep(0.01)
+    cache.put(key_b, 'qwen-turbo', '响应B')
+    time.sleep(0.01)
+    assert cache.get(key_a) == '响应A'  # A 变为最近访问
+    time.sleep(0.01)
+    cache.put(key_c, 'qwen-turbo', '响应C')
+
+    assert cache.get(key_b) is None
+    assert cache.get(key_a) == '响应A'
+    assert cache.stats()['entries'] == 2
+    print("✓ 超出条目上限时淘汰最久未访问的响应")
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get(key_a) is None
+    print("✓ 过期响应不再返回")
+
+
+def test_service_uses_persistent_cache():
+    """测试AI服务重复分析时命中持久缓存"""
+    print("\n=== 测试AI服务缓存集成 ===")
+    from ai_service import AlibabaCloudAIService
+    from llm_cache import LLMResponseCache
+
+    calls = []
+
+    def fake_request(prompt, **kwargs):
+        calls.append(prompt)
+        return '{"concepts": ["宪法"], "suggested_type": "hierarchy"}'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'llm.sqlite3')
+
+        service = AlibabaCloudAIService("test-key", cache=LLMResponseCache(db_path))
+        service._request_llm = fake_request
+        first = service.analyze_text_structure("宪法\n基本法")
+        second = service.analyze_text_structure("宪法\n基本法")
+        assert first == second
+        assert len(calls) == 1
+
+        # 新的服务实例（模拟程序重启）仍然命中
+        cache = LLMResponseCache(db_path)
+        restarted = AlibabaCloudAIService("test-key", cache=cache)
+        restarted._request_llm = fake_request
+        assert restarted.analyze_text_structure("宪法\n基本法") == first
+        assert len(calls) == 1
+        cache.close()
+
+        # 可用性检查不读缓存
+        service.is_available()
+        assert len(calls) == 2
+        service.cache.close()
+    print("✓ 重复分析直接读取本地缓存")
+
+
+def test_session_reuse_and_retry():
+    """测试连接复用、限流重试和延迟统计"""
+    print("\n=== 测试连接池与重试 ===")
+    from ai_service import AlibabaCloudAIService
+
+    server, base_url = start_stub_server(statuses=[429, 503])
+    try:
+        service = AlibabaCloudAIService("test-key", base_url=base_url,
+                                        max_retries=3, backoff_factor=0.01)
+        assert service._call_llm_api("你好") == "回复: 你好"
+        assert service._call_llm_api("再见") == "回复: 再见"
+
+        # 两次调用共4个请求（含2次重试），全部复用同一个连接
+        assert len(server.client_ports) == 4
+        assert len(set(server.client_ports)) == 1
+        print(f"✓ 4个请求复用同一连接，客户端端口: {server.client_ports[0]}")
+
+        metrics = service.get_metrics()
+        assert metrics['calls'] == 2 and metrics['retries'] == 2 and metrics['errors'] == 0
+        print(f"✓ 延迟统计: {metrics}")
+
+        # 非重试状态码立即失败
+        server.statuses = [400]
+        assert service._call_llm_api("错误请求") is None
+        assert len(server.client_ports) == 5
+
+        # 重试次数用尽后返回None
+        server.statuses = [500, 500]
+        service.max_retries = 1
+        assert service._call_llm_api("服务端错误") is None
+        assert service.get_metrics()['errors'] == 2
+        print("✓ 重试次数用尽后放弃")
+        service.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_async_concurrent_analysis():
+    """测试异步服务并发分析多个文本"""
+    print("\n=== 测试异步并发分析 ===")
+    import asyncio
+    from async_ai_service import AsyncAlibabaCloudAIService
+
+    server, base_url = start_stub_server()
+    server.delay = 0.2
+    server.reply = json.dumps({'concepts': ['宪法'], 'suggested_type': 'network'})
+    try:
+        service = AsyncAlibabaCloudAIService("test-key", max_concurrency=4, base_url=base_url)
+        texts = [f"文档{i}" for i in range(8)]
+
+        start = time.perf_counter()
+        results = asyncio.run(service.analyze_many(texts))
+        elapsed = time.perf_counter() - start
+
+        assert len(results) == 8
+        assert all(r['suggested_type'] == 'network' for r in results)
+        assert server.max_active == 4
+        # 串行需要1.6秒，并发4路约0.4秒
+        assert elapsed < 1.2, elapsed
+        print(f"✓ 8个文档并发分析用时 {elapsed:.2f} 秒，最大并发 {server.max_active}")
+
+        # 接口返回非JSON时与同步服务一样回退到备用分析
+        server.delay = 0
+        server.reply = '不是JSON'
+        result = asyncio.run(service.analyze_text_structure("宪法\n基本法"))
+        assert [c['text'] for c in result['concepts']] == ['宪法', '基本法']
+        print("✓ 解析失败时使用备用分析")
+        service.close()
+
+        # 限速器：每秒10个请求、突发1个时，5次获取至少需要0.4秒
+        from async_ai_service import AsyncRateLimiter
+
+        async def acquire_five():
+            limiter = AsyncRateLimiter(10, burst=1)
+            for _ in range(5):
+                await limiter.acquire()
+
+        start = time.perf_counter()
+        asyncio.run(acquire_five())
+        assert time.perf_counter() - start >= 0.35
+        print("✓ 令牌桶限速生效")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_circuit_breaker_and_async_probe():
+    """测试后台可用性检测和熔断器"""
+    print("\n=== 测试可用性检测与熔断 ===")
+    from ai_service import AlibabaCloudAIService
+
+    server, base_url = start_stub_server(statuses=[500, 500, 500])
+    try:
+        service = AlibabaCloudAIService("test-key", base_url=base_url, max_retries=0)
+        service.circuit_breaker.reset_timeout = 0.2
+
+        # 后台检测立即返回Future
+        future = service.probe_availability_async()
+        assert future.result(timeout=5) is False
+        assert service.health_status is False
+        print("✓ 后台检测完成，结果已缓存")
+
+        # 连续3次失败后熔断，熔断期间不再发出请求
+        service._call_llm_api("请求")
+        service._call_llm_api("请求")
+        assert service.circuit_breaker.state == 'open'
+        requests_sent = len(server.client_ports)
+        assert service._call_llm_api("请求") is None
+        assert len(server.client_ports) == requests_sent
+        print("✓ 连续失败后熔断，请求被直接拒绝")
+
+        # 冷却后放行试探请求，成功则恢复
+        time.sleep(0.25)
+        assert service.is_available() is True
+        assert service.circuit_breaker.state == 'closed'
+        print("✓ 冷却后试探成功，熔断恢复")
+        service.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # 400、401等请求错误说明服务可以访问，不计入熔断
+    server, base_url = start_stub_server(statuses=[401, 401, 400, 401])
+    try:
+        service = AlibabaCloudAIService("test-key", base_url=base_url, max_retries=0)
+        for _ in range(4):
+            assert service._call_llm_api("请求") is None
+        assert service.circuit_breaker.state == 'closed'
+        assert service.circuit_breaker.failures == 0
+        assert len(server.client_ports) == 4
+        print("✓ 请求错误不触发熔断")
+        service.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    """主测试函数"""
+    test_llm_cache_ttl_and_eviction()
+    test_service_uses_persistent_cache()
+    test_session_reuse_and_retry()
+    test_async_concurrent_analysis()
+    test_circuit_breaker_and_async_probe()
+    print("\n✅ AI服务性能测试全部通过")
+
+
+if __name__ == "__main__":
+    main()
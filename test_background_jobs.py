@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务执行器测试
+使用模拟的Tk根窗口，在测试中手动驱动after回调
+"""
+
+import os
+import sys
+import time
+import threading
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+
+from job_executor import BackgroundJobExecutor
+
+
+class FakeRoot:
+    """模拟Tk根窗口，after回调保存到列表中由测试执行"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+
+    def pump(self, timeout=5):
+        """执行after回调直到没有待执行的回调"""
+        deadline = time.time() + timeout
+        while self.callbacks and time.time() < deadline:
+            callback = self.callbacks.pop(0)
+            callback()
+            time.sleep(0.005)
+
+
+def test_result_and_progress_on_main_thread():
+    """测试结果和进度回调在主线程中执行"""
+    print("测试结果和进度回调...")
+
+    root = FakeRoot()
+    executor = BackgroundJobExecutor(root)
+    main_thread = threading.current_thread()
+    events = []
+
+    def job(token, progress):
+        events.append(('worker', threading.current_thread() is main_thread))
+        progress(0.5, "处理中")
+        return 42
+
+    executor.submit(job,
+                    on_success=lambda result: events.append(('success', result, threading.current_thread() is main_thread)),
+                    on_progress=lambda fraction, message: events.append(('progress', fraction, message)))
+    root.pump()
+    executor.shutdown()
+
+    assert events[0] == ('worker', False)
+    assert ('progress', 0.5, "处理中") in events
+    assert events[-1] == ('success', 42, True)
+    assert not executor.busy
+    print("✓ 任务在工作线程执行，回调在主线程执行")
+
+
+def test_new_job_cancels_previous():
+    """测试提交新任务会取消旧任务，旧任务结果不再回调"""
+    print("测试任务取消...")
+
+    root = FakeRoot()
+    executor = BackgroundJobExecutor(root)
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+    cancelled = []
+
+    def slow_job(token, progress):
+        started.set()
+        release.wait(5)
+        token.raise_if_cancelled()
+        return 'slow'
+
+    executor.submit(slow_job, on_success=results.append, on_cancel=lambda: cancelled.append('slow'))
+    started.wait(5)
+    executor.submit(lambda token, progress: 'fast', on_success=results.append)
+    release.set()
+    root.pump()
+
+    assert cancelled == ['slow']
+    assert results == ['fast']
+
+    # 显式取消
+    executor.submit(lambda token, progress: 'ignored', on_success=results.append,
+                    on_cancel=lambda: cancelled.append('explicit'))
+    executor.cancel()
+    root.pump()
+    executor.shutdown()
+
+    assert results == ['fast']
+    assert cancelled == ['slow', 'explicit']
+    print("✓ 旧任务被取消，只有最新任务的结果生效")
+
+
+def test_blocked_job_does_not_delay_new_job():
+    """测试旧任务阻塞在网络请求等阶段中时，新任务不必等待"""
+    print("测试阻塞任务不影响新任务...")
+
+    root = FakeRoot()
+    executor = BackgroundJobExecutor(root)
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def blocked_job(token, progress):
+        started.set()
+        release.wait(10)  # 模拟无法中断的AI请求
+        return 'stale'
+
+    executor.submit(blocked_job, on_success=results.append)
+    started.wait(5)
+    executor.submit(lambda token, progress: 'fresh', on_success=results.append)
+    root.pump()
+    assert results == ['fresh'] and not executor.busy
+
+    # 旧任务结束后结果被丢弃
+    release.set()
+    time.sleep(0.05)
+    root.pump()
+    executor.shutdown()
+    assert results == ['fresh']
+    print("✓ 新任务立即执行，被取消任务的结果被丢弃")
+
+
+def test_error_callback():
+    """测试任务异常交给错误回调"""
+    print("测试任务异常...")
+
+    root = FakeRoot()
+    executor = BackgroundJobExecutor(root)
+    errors = []
+
+    def failing_job(token, progress):
+        raise ValueError("解析失败")
+
+    executor.submit(failing_job, on_success=lambda result: None, on_error=errors.append)
+    root.pump()
+    executor.shutdown()
+
+    assert len(errors) == 1
+    assert isinstance(errors[0], ValueError)
+    print("✓ 异常通过错误回调返回主线程")
+
+
+def main():
+    """主测试函数"""
+    test_result_and_progress_on_main_thread()
+    test_new_job_cancels_previous()
+    test_blocked_job_does_not_delay_new_job()
+    test_error_callback()
+    print("\n✅ 后台任务执行器测试全部通过")
+
+
+if __name__ == "__main__":
+    main()
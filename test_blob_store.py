@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片模板存储测试
+验证图片按内容哈希保存、模板只记录哈希，以及缩放后的图片按画布尺寸缓存
+"""
+
+import io
+import json
+import os
+import sys
+import base64
+import tempfile
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+
+from PIL import Image
+
+from blob_store import BlobStore, get_blob_store
+from diagram_renderer import DiagramRenderer
+
+
+def make_image_bytes(size=(400, 300)):
+    """生成一张PNG测试图片"""
+    image = Image.new('RGB', size, 'white')
+    for x in range(0, size[0], 20):
+        for y in range(size[1]):
+            image.putpixel((x, y), (30, 90, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_content_addressed_storage():
+    """相同内容只保存一份，读取内容与写入一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = BlobStore(os.path.join(temp_dir, 'blobs'))
+        data = make_image_bytes()
+        digest = store.put(data)
+        assert digest == BlobStore.digest(data)
+        assert store.put(data) == digest
+        assert digest in store
+        assert store.read(digest) == data
+        assert store.image_size(digest) == (400, 300)
+        assert len(os.listdir(os.path.join(temp_dir, 'blobs', digest[:2]))) == 1
+
+        try:
+            store.path('../legal_templates')
+            assert False, "应拒绝无效的哈希"
+        except ValueError:
+            pass
+        store.close()
+        print("✓ 图片按内容哈希保存")
+
+
+def test_template_size():
+    """模板只记录哈希，导出时可以恢复内嵌数据"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = BlobStore(os.path.join(temp_dir, 'blobs'))
+        data = make_image_bytes()
+        legacy = {'type': 'image_template',
+                  'image_base64': base64.b64encode(data).decode('utf-8')}
+
+        template = store.externalize(legacy)
+        assert 'image_base64' not in template and 'image_base64' in legacy
+        assert len(json.dumps(template)) * 10 < len(json.dumps(legacy))
+        assert store.inline(template)['image_base64'] == legacy['image_base64']
+        assert store.externalize(template) is template
+        store.close()
+        print("✓ 模板中只记录图片哈希")
+
+
+def test_cached_variants():
+    """同一画布尺寸只解码一次，结果与内嵌base64的旧版模板一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data = make_image_bytes()
+        renderer = DiagramRenderer(templates={}, template_dir=temp_dir, figsize=(6, 4), dpi=50)
+        store = get_blob_store(os.path.join(temp_dir, 'blobs'))
+        template = {'type': 'image_template', 'image_blob': store.put(data)}
+        legacy = {'type': 'image_template',
+                  'image_base64': base64.b64encode(data).decode('utf-8')}
+        content = {'title': '图片模板', 'nodes': [], 'connections': []}
+
+        first = renderer.render_data(content, template)
+        second = renderer.render_data(content, template)
+        assert first == second
+        assert store.decodes == 1
+        assert renderer.render_data(content, legacy) == first
+
+        # 画布尺寸不同时重新缩放
+        DiagramRenderer(templates={}, template_dir=temp_dir, figsize=(6, 6),
+                        dpi=50).render_data(content, template)
+        assert store.decodes == 2
+        store.close()
+        print("✓ 缩放后的图片按画布尺寸缓存")
+
+
+def test_bounded_maps():
+    """打开的内存映射按LRU淘汰并关闭，with 退出时全部关闭"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with BlobStore(os.path.join(temp_dir, 'blobs'), max_maps=2) as store:
+            digests = [store.put(make_image_bytes((40 + i, 30))) for i in range(3)]
+            maps = [store.open(digest) for digest in digests[:2]]
+            store.open(digests[0])  # 最近使用，不被淘汰
+            maps.append(store.open(digests[2]))
+            assert [mapped.closed for mapped in maps] == [False, True, False]
+            assert store.image_size(digests[1]) == (41, 30)
+            assert store.read(digests[0]) == make_image_bytes((40, 30))
+        assert all(mapped.closed for mapped in maps)
+        print("✓ 内存映射数量有上限，关闭存储时全部释放")
+
+
+def main():
+    """主测试函数"""
+    test_content_addressed_storage()
+    test_template_size()
+    test_cached_variants()
+    test_bounded_maps()
+    print("\n✅ 图片模板存储测试全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试图模型
+验证节点索引、连接关系解析和大规模连线时的线性耗时，稀疏邻接表的查询，以及流式解析和连接符号分词
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+
+
+def test_graph_indexes():
+    """测试按文本和ID查找节点"""
+    print("\n=== 测试图模型索引 ===")
+    from graph_model import DiagramGraph
+
+    graph = DiagramGraph('法律体系')
+    graph.add_node('node_1', '宪法', level=1)
+    graph.add_node('node_2', '民法典', level=2)
+    graph.add_node('node_3', '民法典', level=3)
+    graph.add_connection('宪法', '民法典', type='thick')
+    graph.add_connection('node_1', 'node_3')
+    graph.add_connection('宪法', '不存在的节点')
+
+    assert graph.resolve('宪法') == 'node_1'
+    assert graph.resolve('node_2') == 'node_2'
+    assert graph.resolve('民法典') == 'node_2'
+    assert graph.resolve('刑法') is None
+    assert graph.index_of('node_3') == 2
+    assert graph.get_node('node_3')['level'] == 3
+    assert '宪法' in graph and len(graph) == 3
+
+    assert graph.edge_pairs() == [('node_1', 'node_2'), ('node_1', 'node_3')]
+    assert graph.resolved_connections()[0][2]['type'] == 'thick'
+
+    data = graph.to_data()
+    assert DiagramGraph.from_data(data).to_data() == data
+    assert DiagramGraph(nodes=data['nodes']).edge_pairs() == \
+        [('node_1', 'node_2'), ('node_2', 'node_3')]
+    print("✓ 文本和ID都能解析，无法解析的连线被跳过")
+
+
+def test_parsing_uses_graph():
+    """测试解析结果结构不变"""
+    print("\n=== 测试文本解析 ===")
+    from diagram_renderer import DiagramRenderer
+
+    data = DiagramRenderer.parse_text_content("法律体系\n宪法\n基本法\n宪法 -> 基本法")
+    assert data == {
+        'title': '法律体系',
+        'nodes': [{'id': 'node_1', 'text': '宪法', 'level': 1},
+                  {'id': 'node_2', 'text': '基本法', 'level': 2}],
+        'connections': [{'from': '宪法', 'to': '基本法'}]
+    }
+
+    data = DiagramRenderer.parse_ai_analysis({
+        'concepts': [{'id': 'c1', 'text': '合同'}, '要约'],
+        'connections': [{'from': '合同', 'to': '要约', 'label': '包括'}]
+    })
+    assert [node['id'] for node in data['nodes']] == ['c1', 'node_1']
+    assert data['connections'][0] == {'from': '合同', 'to': '要约', 'type': 'simple', 'label': '包括'}
+    print("✓ 文本和AI分析结果解析正确")
+
+
+def test_large_connection_resolution():
+    """测试数万条连线的解析和连接矩阵保持线性"""
+    print("\n=== 测试大规模连线解析 ===")
+    from graph_model import DiagramGraph
+    from drawing_utils import DrawingUtils
+
+    n = 20000
+    nodes = [{'id': f'node_{i}', 'text': f'第{i}条', 'level': 1} for i in range(n)]
+    connections = [{'from': f'第{i}条', 'to': f'第{(i * 7) % n}条'} for i in range(n)]
+
+    start = time.time()
+    graph = DiagramGraph(nodes=nodes, connections=connections)
+    pairs = graph.edge_pairs()
+    elapsed = time.time() - start
+    assert len(pairs) == n and pairs[3] == ('node_3', 'node_21')
+    assert elapsed < 1.0
+
+    small = nodes[:2000]
+    matrix, node_ids = DrawingUtils.create_connection_matrix(small)
+    id_connections = [{'from': f'node_{i}', 'to': f'node_{(i + 1) % 2000}'} for i in range(2000)]
+    id_connections.append({'from': 'node_0', 'to': 'missing'})
+    start = time.time()
+    DrawingUtils.apply_connections_to_matrix(matrix, node_ids, id_connections)
+    assert time.time() - start < 0.5
+    assert matrix[0][1] == 1 and matrix[1999][0] == 1 and sum(map(sum, matrix)) == 2000
+    print(f"✓ {n}条连线解析耗时 {elapsed:.3f}s")
+
+
+def test_sparse_adjacency():
+    """测试稀疏邻接表的度数、可达性和连通分量"""
+    print("\n=== 测试稀疏邻接表 ===")
+    import numpy as np
+    from drawing_utils import DrawingUtils
+
+    nodes = [{'id': f'n{i}', 'text': text, 'level': 1}
+             for i, text in enumerate(['宪法', '民法', '刑法', '合同法', '物权法', '国际法'])]
+    connections = [
+        {'from': '宪法', 'to': '民法'},
+        {'from': '宪法', 'to': '刑法'},
+        {'from': '民法', 'to': '合同法'},
+        {'from': '民法', 'to': '合同法'},
+        {'from': '物权法', 'to': '民法'},
+    ]
+    adjacency = DrawingUtils.create_sparse_adjacency(nodes, connections)
+
+    assert adjacency.edge_count == 4
+    assert adjacency.out_degree().tolist() == [2, 1, 0, 0, 1, 0]
+    assert adjacency.in_degree().tolist() == [0, 2, 1, 1, 0, 0]
+    assert adjacency.has_edge('n0', 'n1') and not adjacency.has_edge('n1', 'n0')
+
+    reachable = adjacency.reachable('n0')
+    assert np.flatnonzero(reachable).tolist() == [0, 1, 2, 3]
+    assert np.flatnonzero(adjacency.reachable('n3', directed=False)).tolist() == [0, 1, 2, 3, 4]
+
+    count, labels = adjacency.connected_components()
+    assert count == 2 and labels[0] == labels[4] and labels[5] != labels[0]
+
+    matrix, node_ids = DrawingUtils.create_connection_matrix(nodes)
+    id_connections = [{'from': f'n{a}', 'to': f'n{b}'} for a, b in [(0, 1), (0, 2), (1, 3), (4, 1)]]
+    DrawingUtils.apply_connections_to_matrix(matrix, node_ids, id_connections)
+    assert adjacency.to_dense().tolist() == matrix
+    print("✓ 度数、可达性、连通分量与稠密矩阵一致")
+
+    # 不存在的节点报出节点ID，而不是之后的 IndexError
+    for missing in ('n99', 99, -1):
+        try:
+            adjacency.neighbors(missing)
+            assert False, "应拒绝不存在的节点"
+        except KeyError as e:
+            assert str(missing) in str(e)
+    assert adjacency.has_edge(0, 'n1')
+
+    # 3万个节点的链和环
+    n = 30000
+    sources = np.arange(n - 1)
+    from sparse_graph import SparseAdjacency
+    chain = SparseAdjacency.from_edges(n, np.append(sources, n - 1), np.append(sources + 1, 5000))
+    start = time.time()
+    count, _ = chain.connected_components()
+    assert count == 1
+    assert chain.reachable(n - 1).sum() == n - 5000
+    assert chain.degree().sum() == 2 * n
+    print(f"✓ {n}个节点的查询耗时 {time.time() - start:.2f}s")
+
+
+def test_stream_parser():
+    """测试流式解析文件和行迭代器"""
+    print("\n=== 测试流式解析 ===")
+    from stream_parser import StreamParser, parse_file, layout_file
+    from drawing_utils import DrawingUtils
+    from layout_engine import LayeredLayout
+
+    text = "法律体系\n\n宪法\n基本法\n宪法 -> 基本法\n宪法 => 民法 [基础]\n"
+    events = list(StreamParser().events(iter(text.split('\n'))))
+    assert events[0] == ('title', '法律体系')
+    assert events[1] == ('node', {'id': 'node_1', 'text': '宪法', 'level': 1})
+    assert [kind for kind, _ in events] == ['title', 'node', 'node', 'edge', 'edge']
+    assert StreamParser().parse("").title == "法学研究图表"
+
+    advanced = DrawingUtils.parse_advanced_connections(text)
+    assert advanced[1] == {'from': '宪法', 'to': '民法', 'type': 'thick', 'label': '基础'}
+    assert DrawingUtils.parse_connections(text) == [{'from': '宪法', 'to': '基本法'},
+                                                    {'from': '宪法', 'to': '民法'}]
+
+    # 约20万行的大纲文件
+    n = 100000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'outline.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("大纲\n")
+            for i in range(1, n + 1):
+                f.write(f"第{i}条\n")
+            for i in range(1, n):
+                f.write(f"第{i}条 -> 第{i + 1}条\n")
+
+        start = time.time()
+        graph = parse_file(path)
+        elapsed = time.time() - start
+        assert len(graph) == n and len(graph.connections) == n - 1
+        assert graph.get_node(f'第{n}条')['id'] == f'node_{n}'
+        assert elapsed < 3.0
+
+        small = os.path.join(temp_dir, 'small.txt')
+        with open(small, 'w', encoding='utf-8') as f:
+            f.write(text)
+        graph, positions = layout_file(small, LayeredLayout(), advanced=True)
+        assert set(positions) == {'node_1', 'node_2'} and len(graph.connections) == 2
+    print(f"✓ {n}个节点的文件流式解析耗时 {elapsed:.2f}s")
+
+
+def test_connection_tokenizer():
+    """测试连接符号分词：类型、标签和链式连接"""
+    print("\n=== 测试连接符号分词 ===")
+    from drawing_utils import DrawingUtils
+    from stream_parser import StreamParser
+
+    text = "\n".join([
+        "概念A -> 概念B",
+        "概念B => 概念C",
+        "概念C --> 概念D[重要]",
+        "概念D ==> 概念E",
+        "概念E ---> 概念F",
+        "甲 → 乙 ⇒ 丙 [适用]",
+        "大于号 > 不是连接",
+        "-> 缺少起点",
+    ])
+    connections = DrawingUtils.parse_advanced_connections(text)
+    assert [(c['from'], c['to'], c['type']) for c in connections] == [
+        ('概念A', '概念B', 'simple'),
+        ('概念B', '概念C', 'thick'),
+        ('概念C', '概念D', 'dashed'),
+        ('概念D', '概念E', 'double'),
+        ('概念E', '概念F', 'dashed'),
+        ('甲', '乙', 'simple'),
+        ('乙', '丙', 'thick'),
+    ]
+    assert connections[2]['label'] == '重要' and connections[6]['label'] == '适用'
+
+    # 逐行流式解析与整段分词结果一致，非连接行仍作为节点
+    parser = StreamParser(advanced=True)
+    assert list(parser.iter_connections(iter(text.split("\n")))) == connections
+    graph = parser.parse("标题\n" + text)
+    assert [node['text'] for node in graph.nodes] == ["大于号 > 不是连接"]
+    assert graph.connections == connections
+
+    # 默认模式使用同样的符号识别，只是不带连接类型和标签
+    simple = StreamParser()
+    expected = [{'from': c['from'], 'to': c['to']} for c in connections]
+    assert list(simple.iter_connections(text)) == expected
+    assert simple.parse("标题\n" + text).connections == expected
+    print("✓ --> 和 ==> 不再被识别为 -> 和 =>，链式连接逐段生成")
+
+
+def main():
+    """主测试函数"""
+    test_graph_indexes()
+    test_parsing_uses_graph()
+    test_large_connection_resolution()
+    test_sparse_adjacency()
+    test_stream_parser()
+    test_connection_tokenizer()
+    print("\n✅ 图模型测试全部通过")
+
+
+if __name__ == "__main__":
+    main()
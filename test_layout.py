@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试布局引擎
+验证大规模层级图的分层布局不重叠、减少交叉并自动计算坐标范围，
+以及力导向网络布局的可重复性和扩展性
+"""
+
+import os
+import sys
+import time
+import random
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+
+
+def count_crossings(positions, edges):
+    """统计相邻两层之间的连线交叉数"""
+    by_layer = {}
+    for a, b in edges:
+        (x1, y1), (x2, y2) = positions[a], positions[b]
+        by_layer.setdefault((y1, y2), []).append((x1, x2))
+    crossings = 0
+    for segments in by_layer.values():
+        for i in range(len(segments)):
+            for j in range(i + 1, len(segments)):
+                (a1, a2), (b1, b2) = segments[i], segments[j]
+                if (a1 - b1) * (a2 - b2) < 0:
+                    crossings += 1
+    return crossings
+
+
+def test_layered_layout_no_overlap():
+    """测试数千个节点的法条树布局不重叠"""
+    print("\n=== 测试大规模层级布局 ===")
+    from drawing_utils import DrawingUtils
+    from layout_engine import LayeredLayout
+
+    rng = random.Random(7)
+    nodes = [{'id': 'node_0', 'text': '法律', 'level': 1}]
+    connections = []
+    for i in range(1, 3000):
+        parent = nodes[rng.randrange(max(0, i - 100), i)]
+        nodes.append({'id': f'node_{i}', 'text': f'第{i}条', 'level': parent['level'] + 1})
+        connections.append({'from': parent['text'], 'to': f'第{i}条'})
+
+    layout = LayeredLayout()
+    start = time.time()
+    positions = DrawingUtils.calculate_hierarchy_positions(
+        nodes, connections=connections, layout=layout)
+    elapsed = time.time() - start
+    assert len(positions) == len(nodes)
+
+    separation = layout.node_width + layout.h_gap
+    rows = {}
+    for x, y in positions.values():
+        rows.setdefault(y, []).append(x)
+    for xs in rows.values():
+        xs.sort()
+        assert all(b - a >= separation - 1e-6 for a, b in zip(xs, xs[1:]))
+
+    xmin, xmax, ymin, ymax = layout.extents(positions)
+    assert all(xmin < x < xmax and ymin < y < ymax for x, y in positions.values())
+    print(f"✓ {len(nodes)}个节点布局耗时 {elapsed:.2f}s，无重叠且全部在坐标范围内")
+
+
+def test_crossing_minimization():
+    """测试重心法排序消除可以避免的交叉"""
+    print("\n=== 测试交叉最小化 ===")
+    from layout_engine import LayeredLayout
+
+    # 子节点输入顺序与父节点相反，不排序时每对连线都会交叉
+    node_ids = ['a', 'b', 'c', 'c1', 'b1', 'a1']
+    edges = [('a', 'a1'), ('b', 'b1'), ('c', 'c1')]
+    positions = LayeredLayout().layout(node_ids, edges)
+    assert count_crossings(positions, edges) == 0
+    assert positions['a'][1] > positions['a1'][1]
+
+    # 有环时仍能完成分层
+    positions = LayeredLayout().layout(['x', 'y', 'z'], [('x', 'y'), ('y', 'z'), ('z', 'x')])
+    assert len(positions) == 3
+    print("✓ 交叉已消除，有环的图也能布局")
+
+
+def test_rank_from_connections():
+    """测试解析得到的文本按连接关系分层，而不是按行号或统一的level"""
+    print("\n=== 测试按连接关系分层 ===")
+    from drawing_utils import DrawingUtils
+    from diagram_renderer import DiagramRenderer
+
+    # 解析文本时 level 为行号，不能让每个节点各占一层
+    data = DiagramRenderer.parse_text_content(
+        "法律体系\n宪法\n民法\n刑法\n宪法 -> 民法\n宪法 -> 刑法")
+    positions = DrawingUtils.calculate_hierarchy_positions(
+        data['nodes'], connections=data['connections'])
+    root, civil, criminal = (positions[f'node_{i}'] for i in range(1, 4))
+    assert civil[1] == criminal[1] < root[1]
+    assert civil[0] != criminal[0]
+
+    # AI分析结果的 level 都是1，按连线分层后仍能消除交叉
+    concepts = ['甲', '乙', '丙', '丙1', '乙1', '甲1']
+    data = DiagramRenderer.parse_ai_analysis({
+        'concepts': concepts,
+        'connections': [{'from': a, 'to': a + '1'} for a in '甲乙丙']})
+    positions = DrawingUtils.calculate_hierarchy_positions(
+        data['nodes'], connections=data['connections'])
+    positions = {concepts[int(node_id[5:])]: xy for node_id, xy in positions.items()}
+    edges = [(a, a + '1') for a in '甲乙丙']
+    assert positions['甲'][1] > positions['甲1'][1]
+    assert count_crossings(positions, edges) == 0
+
+    # 没有连线时仍按 level 分层
+    nodes = [{'id': i, 'text': i, 'level': level} for i, level in zip('abc', (1, 2, 2))]
+    positions = DrawingUtils.calculate_hierarchy_positions(nodes)
+    assert positions['a'][1] > positions['b'][1] == positions['c'][1]
+    print("✓ 有连线时按连线分层，没有连线时按level分层")
+
+
+def test_render_large_hierarchy():
+    """测试大层级图渲染时坐标范围自动扩展"""
+    print("\n=== 测试大层级图渲染 ===")
+    import warnings
+    warnings.filterwarnings('ignore', message='Glyph .* missing from')
+    from diagram_renderer import DiagramRenderer
+
+    nodes = [{'id': 'root', 'text': '宪法', 'level': 1}]
+    nodes += [{'id': f'n{i}', 'text': f'法律{i}', 'level': 2} for i in range(40)]
+    connections = [{'from': '宪法', 'to': f'法律{i}'} for i in range(40)]
+    data = {'title': '法律体系', 'nodes': nodes, 'connections': connections}
+
+    renderer = DiagramRenderer(templates={}, figsize=(8, 6), dpi=30)
+    template = {'type': 'hierarchy'}
+    assert renderer.render_data(data, template, 'png').startswith(b'\x89PNG')
+
+    ax = renderer.get_figure().axes[0]
+    xmin, xmax = ax.get_xlim()
+    assert xmax - xmin > 40 * 2.4
+    print(f"✓ 40个同层节点的横向范围 {xmax - xmin:.1f}")
+
+
+def test_force_layout_deterministic_and_scalable():
+    """测试力导向布局结果可重复、节点不重叠且耗时接近线性增长"""
+    print("\n=== 测试力导向布局 ===")
+    import numpy as np
+    from layout_engine import ForceLayout
+
+    def build(n):
+        rng = random.Random(3)
+        node_ids = [f'c{i}' for i in range(n)]
+        edges = [(node_ids[i], node_ids[rng.randrange(i)]) for i in range(1, n)]
+        edges += [(node_ids[rng.randrange(n)], node_ids[rng.randrange(n)]) for _ in range(n // 4)]
+        return node_ids, edges
+
+    node_ids, edges = build(500)
+    layout = ForceLayout(seed=11)
+    positions = layout.layout(node_ids, edges)
+    assert positions == ForceLayout(seed=11).layout(node_ids, edges)
+    assert positions != ForceLayout(seed=12).layout(node_ids, edges)
+
+    coords = np.array([positions[node_id] for node_id in node_ids])
+    distance = np.sqrt(((coords[:, None] - coords[None]) ** 2).sum(axis=2))
+    np.fill_diagonal(distance, np.inf)
+    assert distance.min() >= 2 * layout.node_radius
+    print("✓ 相同seed结果一致，节点互不重叠")
+
+    timings = []
+    for n in (1000, 4000):
+        node_ids, edges = build(n)
+        start = time.time()
+        ForceLayout(iterations=20).layout(node_ids, edges)
+        timings.append(time.time() - start)
+    # 节点数增加4倍，两两计算会慢16倍
+    assert timings[1] < timings[0] * 10 + 0.5
+    print(f"✓ 1000/4000个节点耗时 {timings[0]:.2f}s / {timings[1]:.2f}s")
+
+
+def test_network_positions():
+    """测试网络图位置计算的各种布局"""
+    print("\n=== 测试网络图布局选项 ===")
+    from drawing_utils import DrawingUtils
+
+    nodes = [{'id': f'n{i}', 'text': f'概念{i}', 'level': 1} for i in range(10)]
+    connections = [{'from': '概念0', 'to': f'概念{i}'} for i in range(1, 10)]
+    for layout in ('circular', 'grid', 'force'):
+        positions = DrawingUtils.calculate_network_positions(
+            nodes, layout=layout, connections=connections)
+        assert set(positions) == {node['id'] for node in nodes}
+        assert len(set(positions.values())) == len(nodes)
+    print("✓ circular/grid/force 布局均可用")
+
+
+def main():
+    """主测试函数"""
+    test_layered_layout_no_overlap()
+    test_crossing_minimization()
+    test_rank_from_connections()
+    test_render_large_hierarchy()
+    test_force_layout_deterministic_and_scalable()
+    test_network_positions()
+    print("\n✅ 布局引擎测试全部通过")
+
+
+if __name__ == "__main__":
+    main()
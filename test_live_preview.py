@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时预览测试
+验证编辑文本后只增删或移动变化的图形、防抖只执行最后一次触发，以及拖动节点
+"""
+
+import os
+import sys
+import time
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backend_bases import MouseEvent
+
+from diagram_renderer import DiagramRenderer
+from live_preview import LivePreview, Debouncer
+from node_dragger import NodeDragger
+
+
+class FakeRoot:
+    """模拟Tk根窗口，after回调按编号保存，由测试手动执行"""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.next_id = 0
+
+    def after(self, delay, callback):
+        self.next_id += 1
+        self.callbacks[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.callbacks.pop(after_id, None)
+
+    def pump(self):
+        """执行全部待执行的回调"""
+        while self.callbacks:
+            after_id = min(self.callbacks)
+            self.callbacks.pop(after_id)()
+
+
+def make_axes():
+    """创建无界面的坐标轴"""
+    figure = Figure(figsize=(14, 10))
+    FigureCanvasAgg(figure)
+    return figure.add_subplot()
+
+
+def outline(n, edited=None):
+    """生成 n 个节点的大纲文本，edited 为 {行号: 新文本}"""
+    lines = ["法律体系"] + [f"第{i}条" for i in range(n)]
+    lines += [f"第{i}条 -> 第{(i * 3) % n}条" for i in range(1, n)]
+    for index, text in (edited or {}).items():
+        lines[index] = text
+    return '\n'.join(lines)
+
+
+def artist_counts(ax):
+    return len(ax.patches), len(ax.texts), len(ax.lines)
+
+
+def test_incremental_update():
+    """测试编辑一个节点时只修改该节点"""
+    print("\n=== 测试增量更新 ===")
+    renderer = DiagramRenderer(templates={})
+    ax = make_axes()
+    preview = LivePreview(ax)
+
+    def scene_for(text):
+        return renderer.build_scene(ax, renderer.parse_text_content(text), 'hierarchy')
+
+    n = 500
+    stats = preview.update(scene_for(outline(n)))
+    assert stats['added'] == n + n - 1
+
+    # 只修改一个节点的文字（引用它的连接行一起修改）：该节点和它的连线之外全部保留
+    renamed = {101: "第100条（修订）", n + 100: "第100条（修订） -> 第300条",
+               n + 200: "第200条 -> 第100条（修订）"}
+    scene = scene_for(outline(n, renamed))
+    start = time.time()
+    stats = preview.update(scene)
+    incremental = time.time() - start
+    assert stats['changed'] == 1 and stats['moved'] == 0
+    assert stats['added'] + stats['removed'] <= 4
+    assert any(text.get_text() == "第100条（修订）" for text in ax.texts)
+
+    # 与整体重绘的图形数量一致
+    counts = artist_counts(ax)
+    fresh = make_axes()
+    start = time.time()
+    LivePreview(fresh).update(scene)
+    full = time.time() - start
+    assert counts == artist_counts(fresh)
+    assert incremental < full
+    print(f"✓ 增量更新 {incremental * 1000:.1f}ms，整体重绘 {full * 1000:.1f}ms")
+
+    # 删除节点行：对应的图形被移除
+    stats = preview.update(scene_for(outline(n - 1)))
+    assert stats['removed'] >= 1
+    assert len(ax.patches) == n - 1
+    print("✓ 删除节点后图形同步移除")
+
+
+def test_move_and_restyle():
+    """测试节点移动、改变形状和重置"""
+    print("\n=== 测试移动和样式变化 ===")
+    renderer = DiagramRenderer(templates={})
+    ax = make_axes()
+    preview = LivePreview(ax)
+
+    data = renderer.parse_text_content("决策\n是否成立\n成立\n不成立")
+    preview.update(renderer.build_scene(ax, data, 'decision_tree'))
+    diamond = ax.patches[0]
+
+    # 流程图中同一节点位置和样式都变化
+    stats = preview.update(renderer.build_scene(ax, data, 'flowchart'))
+    assert stats['changed'] == 3 and diamond not in ax.patches
+
+    # 只有位置变化时移动原有图形
+    box = ax.patches[0]
+    scene = renderer.build_scene(ax, data, 'flowchart')
+    for node in scene.nodes:
+        node.x += 1
+    stats = preview.update(scene)
+    assert stats['moved'] == 3 and box in ax.patches
+    assert box.get_x() == scene.nodes[0].x - scene.nodes[0].width / 2
+
+    # 图片模板没有场景
+    assert renderer.build_scene(ax, data, 'image_template') is None
+
+    # 坐标轴被清空后重新绘制全部图形
+    ax.clear()
+    preview.reset()
+    stats = preview.update(scene)
+    assert stats['added'] == preview.artist_count and len(ax.patches) == 3
+    print("✓ 移动、样式变化和重置正确")
+
+
+def test_debouncer():
+    """测试连续触发只执行一次"""
+    print("\n=== 测试防抖 ===")
+    root = FakeRoot()
+    calls = []
+    debouncer = Debouncer(root, 300, lambda: calls.append(len(calls)))
+
+    for _ in range(10):
+        debouncer.trigger()
+    assert debouncer.pending and len(root.callbacks) == 1
+    root.pump()
+    assert calls == [0] and not debouncer.pending
+
+    debouncer.trigger()
+    debouncer.cancel()
+    root.pump()
+    assert calls == [0]
+
+    debouncer.trigger()
+    debouncer.flush()
+    assert calls == [0, 1] and not root.callbacks
+    print("✓ 连续输入合并为一次更新")
+
+
+def test_drag_node():
+    """测试拖动节点：连线跟随、位置回写并在重新生成时生效"""
+    print("\n=== 测试拖动节点 ===")
+    renderer = DiagramRenderer(templates={})
+    ax = make_axes()
+    canvas = ax.figure.canvas
+    preview = LivePreview(ax)
+
+    extra = "\n".join(f"第{i}条" for i in range(80))
+    data = renderer.parse_text_content(f"法律体系\n宪法\n民法\n刑法\n{extra}\n宪法 -> 民法\n宪法 -> 刑法")
+    data['connections'][0]['label'] = '基础'
+    preview.update(renderer.build_scene(ax, data, 'hierarchy'))
+    canvas.draw()
+
+    moved = []
+    dragger = NodeDragger(canvas, preview, on_moved=lambda node_id, pos: moved.append((node_id, pos)))
+    dragger.connect()
+
+    def mouse(name, x, y):
+        px, py = ax.transData.transform((x, y))
+        canvas.callbacks.process(name, MouseEvent(name, canvas, px, py, button=1))
+
+    node, patch, _ = preview.nodes[('node_1', 0)]
+    x0, y0 = node.x, node.y
+    start = time.time()
+    mouse('button_press_event', x0, y0)
+    press = time.time() - start
+    assert dragger.dragging and patch.get_animated()
+
+    start = time.time()
+    for step in range(1, 11):
+        mouse('motion_notify_event', x0 + step * 0.1, y0 - step * 0.05)
+    frame = (time.time() - start) / 10
+    mouse('button_release_event', x0 + 1, y0 - 0.5)
+    assert not dragger.dragging and not patch.get_animated()
+
+    # 节点、文字和两条连线的起点都已移动
+    assert moved[0][0] == 'node_1'
+    x1, y1 = moved[0][1]
+    assert abs(x1 - (x0 + 1)) < 1e-6 and abs(y1 - (y0 - 0.5)) < 1e-6
+    assert abs(patch.get_x() - (x1 - node.width / 2)) < 1e-6
+    incident = preview.incident_edges('node_1')
+    assert len(incident) == 2
+    for edge, arrow, label in incident:
+        assert edge.points[0] == (x1, y1) and arrow.xyann == (x1, y1)
+    assert any(label is not None and label.get_position()[1] < y1 for _, _, label in incident)
+    assert frame < press
+    print(f"✓ 拖动每帧 {frame * 1000:.1f}ms（按下时整体绘制 {press * 1000:.0f}ms）")
+
+    # 位置保存到图表数据后重新生成，画布无需任何修改
+    data['positions'] = {'node_1': [x1, y1]}
+    scene = renderer.build_scene(ax, data, 'hierarchy')
+    assert (scene.nodes[0].x, scene.nodes[0].y) == (x1, y1)
+    stats = preview.update(scene)
+    assert stats['added'] == stats['removed'] == stats['moved'] == 0
+
+    # 拖到坐标范围之外时范围随之扩展
+    data['positions'] = {'node_2': [100, -50]}
+    scene = renderer.build_scene(ax, data, 'hierarchy')
+    assert scene.xlim[1] > 100 and scene.ylim[0] < -50
+    print("✓ 位置保存后重新生成结果一致")
+
+
+def test_drag_hierarchy_child():
+    """测试拖动层次连接的子节点：折线拐点随之重算，各段保持横平竖直"""
+    print("\n=== 测试拖动层次连接的节点 ===")
+    renderer = DiagramRenderer(templates={})
+    ax = make_axes()
+    preview = LivePreview(ax)
+    data = renderer.parse_text_content("法律体系\n宪法\n民法\n刑法")
+    preview.update(renderer.build_scene(ax, data, 'hierarchy'))
+
+    def axis_aligned(points):
+        return all(abs(xa - xb) < 1e-9 or abs(ya - yb) < 1e-9
+                   for (xa, ya), (xb, yb) in zip(points, points[1:]))
+
+    node, _, _ = preview.nodes[('node_2', 0)]
+    x, y = node.x + 1.5, node.y - 0.7
+    preview.move_node(('node_2', 0), x, y)
+    elbows = [(edge, line) for edge, line, _ in preview.incident_edges('node_2')
+              if edge.routing == 'elbow']
+    assert len(elbows) == 2  # 父节点到它、它到下一个节点
+    for edge, line in elbows:
+        assert axis_aligned(edge.points)
+        assert list(zip(*line.get_data())) == edge.points
+    assert (x, y) in [edge.points[-1] for edge, _ in elbows]
+    assert (x, y) in [edge.points[0] for edge, _ in elbows]
+
+    # 保存位置后重新生成的场景同样横平竖直
+    data['positions'] = {'node_2': [x, y]}
+    scene = renderer.build_scene(ax, data, 'hierarchy')
+    assert all(axis_aligned(edge.points) for edge in scene.edges if edge.routing == 'elbow')
+    print("✓ 层次连接折线跟随节点且保持横平竖直")
+
+
+def main():
+    """主测试函数"""
+    test_incremental_update()
+    test_move_and_restyle()
+    test_debouncer()
+    test_drag_node()
+    test_drag_hierarchy_child()
+    print("\n✅ 实时预览测试全部通过")
+
+
+if __name__ == "__main__":
+    main()
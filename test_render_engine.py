@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试无界面渲染引擎
+验证Agg后端渲染、多格式输出和批量渲染命令行
+"""
+
+import os
+import sys
+import json
+import tempfile
+import time
+import warnings
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+
+# 测试环境可能缺少中文字体，忽略缺字警告
+warnings.filterwarnings('ignore', message='Glyph .* missing from')
+warnings.filterwarnings('ignore', message='findfont')
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+SAMPLE_TEXT = "法律体系\n宪法\n基本法\n行政法规\n宪法 -> 基本法"
+
+
+def test_render_formats():
+    """测试各种输出格式"""
+    print("=== 测试渲染输出格式 ===")
+    from diagram_renderer import DiagramRenderer
+
+    renderer = DiagramRenderer(template_dir=TEMPLATE_DIR, dpi=50)
+    signatures = {
+        'png': b'\x89PNG',
+        'pdf': b'%PDF',
+        'svg': b'<?xml',
+        'jpg': b'\xff\xd8'
+    }
+    for fmt, signature in signatures.items():
+        data = renderer.render(SAMPLE_TEXT, '法律条文关系图', fmt)
+        assert data.startswith(signature), fmt
+        print(f"✓ {fmt} 渲染成功，{len(data)} 字节")
+
+
+def test_render_all_template_types():
+    """测试所有内置模板类型都能渲染"""
+    print("\n=== 测试模板类型渲染 ===")
+    from diagram_renderer import DiagramRenderer
+
+    renderer = DiagramRenderer(template_dir=TEMPLATE_DIR, dpi=30)
+    rendered_types = set()
+    for name, template in renderer.templates.items():
+        if template.get('type') in rendered_types:
+            continue
+        data = renderer.render(template.get('default_text', name), name, 'png')
+        assert data.startswith(b'\x89PNG')
+        rendered_types.add(template.get('type'))
+    print(f"✓ 已渲染模板类型: {sorted(rendered_types)}")
+
+
+def test_unknown_template_and_format():
+    """测试未知模板和格式的错误处理"""
+    print("\n=== 测试错误处理 ===")
+    from diagram_renderer import DiagramRenderer
+
+    renderer = DiagramRenderer(template_dir=TEMPLATE_DIR, dpi=30)
+    try:
+        renderer.render(SAMPLE_TEXT, '不存在的模板')
+        assert False, "未知模板应抛出异常"
+    except KeyError:
+        print("✓ 未知模板抛出KeyError")
+
+    try:
+        renderer.render(SAMPLE_TEXT, '法律条文关系图', 'bmp')
+        assert False, "未知格式应抛出异常"
+    except ValueError:
+        print("✓ 未知格式抛出ValueError")
+
+
+def test_batch_cli_jsonl():
+    """测试JSONL批量渲染命令行"""
+    print("\n=== 测试批量渲染命令行 ===")
+    import batch_render
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_path = os.path.join(tmp_dir, 'jobs.jsonl')
+        with open(jobs_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'name': 'a', 'text': SAMPLE_TEXT}, ensure_ascii=False) + '\n')
+            f.write(json.dumps({'name': 'b', 'text': SAMPLE_TEXT, 'format': 'svg'}, ensure_ascii=False) + '\n')
+            f.write(json.dumps({'name': 'c', 'text': SAMPLE_TEXT, 'template': '不存在的模板'}, ensure_ascii=False) + '\n')
+            # 无法解析的行、缺少 text 的行和带路径的名称
+            f.write('{"name": "d", "text": \n')
+            f.write(json.dumps({'name': 'e'}) + '\n')
+            f.write(json.dumps({'name': '../x', 'text': SAMPLE_TEXT}, ensure_ascii=False) + '\n')
+
+        for workers in ('1', '2'):
+            output_dir = os.path.join(tmp_dir, f'out{workers}')
+            exit_code = batch_render.main([jobs_path, '-o', output_dir, '--dpi', '30',
+                                           '--template-dir', TEMPLATE_DIR, '-j', workers])
+
+            assert exit_code == 1  # 任务c和两行无效输入失败
+            assert sorted(os.listdir(output_dir)) == ['_x.png', 'a.png', 'b.svg']
+        assert not os.path.exists(os.path.join(tmp_dir, 'x.png'))
+        print("✓ JSONL批量渲染成功，失败任务和无效输入行不影响其他任务")
+
+
+def test_parallel_render_order_and_isolation():
+    """测试进程池渲染的结果顺序和错误隔离"""
+    print("\n=== 测试并行渲染 ===")
+    from parallel_renderer import ParallelRenderer
+
+    jobs = [
+        {'name': f'job_{i}', 'text': SAMPLE_TEXT, 'template': '法律条文关系图'}
+        for i in range(6)
+    ]
+    jobs[2]['template'] = '不存在的模板'
+
+    renderer = ParallelRenderer(workers=2, template_dir=TEMPLATE_DIR, dpi=30)
+    results = list(renderer.render_batch(jobs))
+
+    assert [r['name'] for r in results] == [job['name'] for job in jobs]
+    assert [r['ok'] for r in results] == [True, True, False, True, True, True]
+    assert 'KeyError' in results[2]['error']
+    assert results[0]['data'].startswith(b'\x89PNG')
+    print("✓ 结果按输入顺序返回，单个任务失败不影响整批")
+
+    # 缓存由主进程读写：第二批全部命中，磁盘上每个不同的图表只有一份
+    with tempfile.TemporaryDirectory() as cache_dir:
+        jobs[3]['text'] = SAMPLE_TEXT + "\n补充条款"
+        first = list(ParallelRenderer(workers=2, template_dir=TEMPLATE_DIR, dpi=30,
+                                      cache_dir=cache_dir).render_batch(jobs))
+        renderer = ParallelRenderer(workers=2, template_dir=TEMPLATE_DIR, dpi=30,
+                                    cache_dir=cache_dir)
+        second = list(renderer.render_batch(jobs))
+        assert [r['ok'] for r in second] == [r['ok'] for r in first] == \
+            [True, True, False, True, True, True]
+        assert [r['data'] for r in second] == [r['data'] for r in first]
+        stats = renderer.cache.stats()
+        assert stats['hits'] == 5 and stats['disk_entries'] == 2
+    print("✓ 并行渲染共用主进程的缓存")
+
+
+def test_render_cache():
+    """测试渲染缓存的命中、持久化和容量淘汰"""
+    print("\n=== 测试渲染缓存 ===")
+    from diagram_renderer import DiagramRenderer
+    from render_cache import RenderCache
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = RenderCache(cache_dir)
+        renderer = DiagramRenderer(template_dir=TEMPLATE_DIR, dpi=30, cache=cache)
+
+        first = renderer.render(SAMPLE_TEXT, '法律条文关系图')
+        second = renderer.render(SAMPLE_TEXT, '法律条文关系图')
+        assert first == second
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+        # 格式或分辨率不同时不应命中
+        renderer.render(SAMPLE_TEXT, '法律条文关系图', dpi=40)
+        assert cache.stats()['misses'] == 2
+        print(f"✓ 内存缓存命中: {cache.stats()}")
+
+        # 新实例从磁盘读取
+        disk_cache = RenderCache(cache_dir)
+        renderer.cache = disk_cache
+        assert renderer.render(SAMPLE_TEXT, '法律条文关系图') == first
+        assert disk_cache.stats()['disk_hits'] == 1
+        print("✓ 磁盘缓存命中")
+
+    small = RenderCache(max_memory_bytes=10)
+    small.put('a', b'12345')
+    small.put('b', b'12345')
+    small.put('c', b'12345')
+    assert small.get('a') is None and small.get('c') == b'12345'
+    assert small.stats()['evictions'] == 1
+    print("✓ 超出容量时按LRU淘汰")
+
+
+def test_batch_drawing():
+    """测试批量绘制用少量集合代替逐个图形对象和文字"""
+    print("\n=== 测试批量绘制 ===")
+    from matplotlib.collections import LineCollection, PathCollection, PolyCollection
+    from diagram_renderer import DiagramRenderer
+
+    nodes = [{'id': f'n{i}', 'text': f'概念{i}', 'level': 1 + i % 4} for i in range(300)]
+    connections = [{'from': f'概念{i}', 'to': f'概念{i // 2}', 'type': 'curved',
+                    'label': '包含' if i % 3 == 0 else ''} for i in range(1, 300)]
+    data = {'title': '批量绘制', 'nodes': nodes, 'connections': connections}
+
+    counts = {}
+    for batched in (False, True):
+        renderer = DiagramRenderer(templates={}, dpi=30, batched=batched)
+        assert renderer.render_data(data, {'type': 'hierarchy'}, 'png').startswith(b'\x89PNG')
+        ax = renderer.get_figure().axes[0]
+        counts[batched] = len(ax.patches) + len(ax.lines) + len(ax.collections) + \
+            len(ax.texts)
+        if batched:
+            assert not ax.patches and not ax.texts
+            assert sum(isinstance(c, PolyCollection) for c in ax.collections) == 1
+            assert sum(isinstance(c, LineCollection) for c in ax.collections) == 1
+            # 文字轮廓一个、连线标签底框一个
+            labels = [c for c in ax.collections if isinstance(c, PathCollection)]
+            assert len(labels) == 2
+            assert len(labels[1].get_paths()) == len(nodes) + len(connections) // 3
+
+    assert counts[True] <= 4 and counts[False] >= 2 * len(nodes) + len(connections)
+    print(f"✓ 节点、连线和文字图形对象: 逐个绘制{counts[False]}个，批量绘制{counts[True]}个")
+
+    # 自动模式按图形元素数量选择
+    from scene import Scene
+    from scene_drawer import BATCH_THRESHOLD, draw_scene
+    renderer = DiagramRenderer(templates={}, dpi=30)
+    ax = renderer.get_figure().add_subplot()
+    scene = Scene('自动', (0, 10), (0, 10))
+    for i in range(BATCH_THRESHOLD + 1):
+        scene.add_node(f'n{i}', 'circle', i % 10, i // 10, 0.5, 0.5)
+    draw_scene(ax, scene)
+    assert not ax.patches and len(ax.collections) == 1
+    print("✓ 图形元素超过阈值时自动批量绘制")
+
+
+def test_export_pipeline():
+    """测试一次生成场景、后台并行导出多种格式"""
+    print("\n=== 测试导出流水线 ===")
+    from diagram_renderer import DiagramRenderer
+    from export_pipeline import ExportPipeline, atomic_write, targets_for
+
+    renderer = DiagramRenderer(templates={}, dpi=30)
+    data = renderer.parse_text_content(SAMPLE_TEXT)
+    scene = renderer.scene_for(data, 'hierarchy')
+    signatures = {'png': b'\x89PNG', 'pdf': b'%PDF', 'svg': b'<?xml', 'jpg': b'\xff\xd8'}
+
+    pipeline = ExportPipeline(workers=2, dpi=30)
+    with tempfile.TemporaryDirectory() as output_dir:
+        base_path = os.path.join(output_dir, 'diagram')
+        job = pipeline.export(targets_for(base_path, signatures), scene=scene)
+        results = job.results(timeout=120)
+        assert job.done() and all(r['ok'] for r in results)
+        assert [r['format'] for r in results] == list(signatures)
+        for result in results:
+            with open(result['path'], 'rb') as f:
+                assert f.read().startswith(signatures[result['format']])
+        print(f"✓ 同一场景并行导出: {', '.join(r['format'] for r in results)}")
+
+        # 已渲染的字节直接写入；某个格式失败不影响其他格式
+        targets = {'png': base_path + '_cached.png',
+                   'svg': os.path.join(base_path + '.png', 'nested.svg')}
+        results = pipeline.export(targets, scene=scene,
+                                  prerendered={'png': b'cached'}).results(timeout=120)
+        assert results[0]['ok'] and results[0]['size'] == len(b'cached')
+        assert not results[1]['ok'] and results[1]['error']
+        print("✓ 缓存图片直接写入，单个格式失败不影响其他格式")
+
+        # 图片模板没有场景，由工作进程渲染
+        result = pipeline.export({'png': base_path + '_image.png'}, data=data,
+                                 template={'type': 'hierarchy'},
+                                 template_type='hierarchy').results(timeout=120)[0]
+        assert result['ok']
+
+        # 原子写入：覆盖时不留下临时文件
+        atomic_write(base_path + '.png', b'new')
+        with open(base_path + '.png', 'rb') as f:
+            assert f.read() == b'new'
+        assert not [name for name in os.listdir(output_dir) if name.endswith('.tmp')]
+        print("✓ 文件原子替换，没有残留临时文件")
+
+        # 工作进程异常退出后，下一次导出重建进程池
+        broken = pipeline._executor
+        for process in list(broken._processes.values()):
+            process.kill()
+        deadline = time.time() + 30
+        while not broken._broken and time.time() < deadline:
+            time.sleep(0.05)
+        result = pipeline.export({'svg': base_path + '_again.svg'},
+                                 scene=scene).results(timeout=120)[0]
+        assert result['ok'] and pipeline._executor is not broken
+        print("✓ 进程池损坏后自动重建")
+    pipeline.shutdown(wait=True)
+
+    try:
+        pipeline.export({'bmp': 'x.bmp'}, scene=scene)
+        assert False, "应当拒绝不支持的格式"
+    except ValueError:
+        pass
+    pipeline.shutdown(wait=True)
+
+
+def test_native_vector_writer():
+    """测试原生SVG/PDF输出：内容完整、比matplotlib快且文件更小"""
+    print("\n=== 测试原生矢量输出 ===")
+    import time
+    import xml.etree.ElementTree as ET
+    from diagram_renderer import DiagramRenderer
+    from export_pipeline import render_scene
+    from vector_writer import write_vector, PageLayout
+
+    renderer = DiagramRenderer(templates={})
+    nodes = [{'id': f'n{i}', 'text': f'概念{i}', 'level': 1 + i % 4} for i in range(300)]
+    connections = [{'from': f'概念{i}', 'to': f'概念{i // 2}',
+                    'type': ('curved', 'dashed', 'double')[i % 3],
+                    'label': '引用' if i % 5 == 0 else ''} for i in range(1, 300)]
+    scene = renderer.scene_for({'title': '矢量输出', 'nodes': nodes,
+                                'connections': connections}, 'network')
+
+    start = time.perf_counter()
+    svg = write_vector(scene, 'svg')
+    native_time = time.perf_counter() - start
+    start = time.perf_counter()
+    reference = render_scene(scene, 'svg')
+    matplotlib_time = time.perf_counter() - start
+
+    # 每个节点一个图形，文字保留为文本
+    root = ET.fromstring(svg)
+    tags = [element.tag.split('}')[1] for element in root.iter()]
+    assert tags.count('ellipse') == len(scene.nodes)
+    texts = [element.text for element in root.iter() if element.tag.endswith('text')]
+    assert '矢量输出' in texts
+    assert all(line in texts for node in scene.nodes for line in node.text.split('\n'))
+    assert svg.count(b'stroke-dasharray') >= len([e for e in scene.edges if e.linestyle == '--'])
+    assert native_time < matplotlib_time and len(svg) < len(reference)
+    print(f"✓ SVG: 原生 {native_time * 1000:.0f}ms/{len(svg) // 1024}KB，"
+          f"matplotlib {matplotlib_time * 1000:.0f}ms/{len(reference) // 1024}KB")
+
+    pdf = write_vector(scene, 'pdf')
+    assert pdf.startswith(b'%PDF') and pdf.rstrip().endswith(b'%%EOF')
+    print(f"✓ PDF: {len(pdf) // 1024}KB")
+
+    # 页面坐标与matplotlib的显示坐标一致（去掉子图左下角的偏移）
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from scene_drawer import finish_axes
+    figure = Figure(figsize=(14, 10), dpi=72)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    finish_axes(ax, scene)
+    layout = PageLayout(scene)
+    node = scene.nodes[5]
+    display = ax.transData.transform((node.x, node.y)) - ax.transAxes.transform((0, 0))
+    page = layout.point(node.x, node.y)
+    assert abs(page[0] - 10 - display[0]) < 1e-6 and abs(page[1] - 10 - display[1]) < 1e-6
+
+    # 导出流水线选择原生后端；位图格式不受影响
+    assert render_scene(scene, 'svg', backend='native') == svg
+    assert render_scene(scene, 'png', dpi=10, backend='native').startswith(b'\x89PNG')
+    from export_pipeline import ExportPipeline
+    pipeline = ExportPipeline(processes=False, backend='native')
+    with tempfile.TemporaryDirectory() as output_dir:
+        path = os.path.join(output_dir, 'native.svg')
+        assert pipeline.export({'svg': path}, scene=scene).results(timeout=60)[0]['ok']
+        with open(path, 'rb') as f:
+            assert f.read() == svg
+    pipeline.shutdown(wait=True)
+    try:
+        write_vector(scene, 'png')
+        assert False, "原生后端只支持矢量格式"
+    except ValueError:
+        pass
+    from vector_writer import VectorWriter
+    try:
+        VectorWriter()
+        assert False, "VectorWriter 是抽象基类"
+    except TypeError:
+        pass
+    print("✓ 页面坐标与matplotlib一致，可作为导出后端")
+
+
+def test_tile_pyramid():
+    """测试瓦片金字塔：层级结构、瓦片尺寸、按范围筛选和细节层次"""
+    print("\n=== 测试瓦片金字塔 ===")
+    from PIL import Image
+    from diagram_renderer import DiagramRenderer
+    from tile_renderer import TileRenderer
+    import batch_render
+
+    renderer = DiagramRenderer(templates={})
+    nodes = [{'id': f'n{i}', 'text': f'概念{i}', 'level': 1 + i % 4} for i in range(60)]
+    connections = [{'from': f'概念{i}', 'to': f'概念{i // 2}', 'type': 'curved',
+                    'label': '引用' if i % 5 == 0 else ''} for i in range(1, 60)]
+    scene = renderer.scene_for({'title': '瓦片', 'nodes': nodes,
+                                'connections': connections}, 'network')
+    tiles = TileRenderer(scene, tile_size=128)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        dzi_path = tiles.render(output_dir, 'network')
+        with open(dzi_path, encoding='utf-8') as f:
+            descriptor = f.read()
+        assert f'Width="{tiles.width}"' in descriptor and 'TileSize="128"' in descriptor
+
+        # 每个层级的瓦片齐全，尺寸不超过瓦片边长加两侧重叠
+        files_dir = os.path.join(output_dir, 'network_files')
+        assert sorted(map(int, os.listdir(files_dir))) == list(range(tiles.max_level + 1))
+        for level, col, row in tiles.iter_tiles():
+            path = tiles.tile_path(files_dir, level, col, row)
+            with Image.open(path) as tile:
+                x0, y0, x1, y1 = tiles.tile_bounds(level, col, row)
+                assert tile.size == (x1 - x0, y1 - y0) and max(tile.size) <= 128 + 2
+        assert tiles.level_size(0) == (1, 1) and tiles.level_size(tiles.max_level) == \
+            (tiles.width, tiles.height)
+        print(f"✓ {tiles.max_level + 1}个层级共{tiles.total_tiles}块瓦片，"
+              f"最大层级 {tiles.width}×{tiles.height}")
+
+    # 最大层级只绘制与瓦片相交的图形，文字完整
+    level = tiles.max_level
+    cols, rows = tiles.tile_count(level)
+    tile_scene = tiles.tile_scene(level, cols // 2, rows // 2)
+    assert 0 < len(tile_scene.nodes) < len(scene.nodes)
+    assert all(node.text for node in tile_scene.nodes)
+
+    # 缩小后隐藏文字和连线标签，原场景不受影响
+    overview = tiles.tile_scene(level - 4, 0, 0)
+    assert len(overview.nodes) == len(scene.nodes)
+    assert not any(node.text for node in overview.nodes)
+    assert not any(edge.label for edge in overview.edges)
+    assert all(node.text for node in scene.nodes)
+    print("✓ 瓦片只包含相交的图形，缩小时隐藏文字")
+
+    # 网格索引的查询结果与逐个比较所有外接矩形一致
+    import numpy as np
+    from tile_renderer import GridIndex
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 1000, size=(5000, 2))
+    sizes = rng.exponential(3, size=(5000, 2))
+    sizes[:20] = 300  # 少量跨越很多网格的长连线
+    boxes = np.stack([centers[:, 0] - sizes[:, 0], centers[:, 0] + sizes[:, 0],
+                      centers[:, 1] - sizes[:, 1], centers[:, 1] + sizes[:, 1]], axis=1)
+    index = GridIndex(boxes)
+    assert len(index.large) >= 20
+    for x, y, size in rng.uniform([-100, -100, 1], [1100, 1100, 400], size=(200, 3)):
+        xlim, ylim = (x, x + size), (y, y + size)
+        expected = np.flatnonzero((boxes[:, 1] >= xlim[0]) & (boxes[:, 0] <= xlim[1]) &
+                                  (boxes[:, 3] >= ylim[0]) & (boxes[:, 2] <= ylim[1]))
+        assert np.array_equal(index.query(xlim, ylim), expected)
+    assert len(GridIndex(np.zeros((0, 4))).query((0, 1), (0, 1))) == 0
+    print("✓ 瓦片查询使用网格索引，结果与逐个比较一致")
+
+    # 命令行输出瓦片金字塔
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_path = os.path.join(tmp_dir, 'jobs.jsonl')
+        with open(jobs_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'name': 'a', 'text': SAMPLE_TEXT}, ensure_ascii=False) + '\n')
+        output_dir = os.path.join(tmp_dir, 'out')
+        assert batch_render.main([jobs_path, '-o', output_dir, '--tiles',
+                                  '--template-dir', TEMPLATE_DIR]) == 0
+        assert sorted(os.listdir(output_dir)) == ['a.dzi', 'a_files']
+    print("✓ 命令行 --tiles 输出 DeepZoom 金字塔")
+
+
+def test_compiled_style():
+    """测试模板样式编译一次并用于绘制"""
+    print("\n=== 测试模板样式 ===")
+    from diagram_renderer import DiagramRenderer
+    from drawing_utils import DrawingUtils
+    from style_compiler import compile_style
+
+    style = compile_style({'type': 'framework', 'style': {'box_color': '#F5F5DC',
+                                                          'border_color': '#8B4513',
+                                                          'font_size': 11}})
+    assert compile_style({'style': {'font_size': 11, 'border_color': '#8B4513',
+                                    'box_color': '#F5F5DC'}}, 'framework') is style
+    assert not hasattr(style, '__dict__')
+    try:
+        style.box_color = 'red'
+        assert False, "编译后的样式应不可修改"
+    except AttributeError:
+        pass
+    print("✓ 相同样式共用同一个只读的编译结果")
+
+    # 没有样式或值无效时使用原来的默认值，层级配色回退到调色板
+    default = compile_style(template_type='network')
+    assert (default.node_color, default.font_size, default.line_width) == ('#FFD700', 9, 1)
+    invalid = compile_style({'style': {'node_color': '不是颜色', 'font_size': -1}}, 'network')
+    assert (invalid.node_color, invalid.font_size) == ('#FFD700', 9)
+    legal = compile_style({'style': {'palette': 'legal'}}, 'hierarchy')
+    assert legal.colors == tuple(DrawingUtils.get_color_palette('legal'))
+    for colors in ('red', {'#FF0000': 1}):
+        assert compile_style({'style': {'colors': colors}}, 'hierarchy').colors == \
+            tuple(DrawingUtils.get_color_palette('default'))
+    print("✓ 默认值和调色板回退")
+
+    # 注册表按模板名称缓存编译结果，模板变化后重新编译
+    from template_registry import TemplateRegistry
+    with tempfile.TemporaryDirectory() as temp_dir:
+        registry = TemplateRegistry(temp_dir)
+        registry.register('框架', {'type': 'framework', 'style': {'box_color': '#F5F5DC',
+                                                                'border_color': '#8B4513',
+                                                                'font_size': 11}})
+        assert registry.style('框架') is registry.style('框架') is style
+        registry.register('框架', {'type': 'framework', 'style': {'font_size': 12}})
+        assert registry.style('框架').font_size == 12
+    print("✓ 注册表缓存编译后的样式")
+
+    renderer = DiagramRenderer(templates={}, dpi=30)
+    data = renderer.parse_text_content(SAMPLE_TEXT)
+    scene = renderer.scene_for(data, 'framework', style)
+    assert {node.facecolor for node in scene.nodes} == {'#F5F5DC'}
+    assert {node.edgecolor for node in scene.nodes} == {'#8B4513'}
+    assert {node.fontsize for node in scene.nodes} == {11}
+
+    network = compile_style({'style': {'line_color': '#4682B4', 'line_width': 3,
+                                       'connection_style': 'curved'}}, 'network')
+    scene = renderer.scene_for(data, 'network', network)
+    assert scene.edges and {edge.color for edge in scene.edges} == {'#4682B4'}
+    assert {edge.linewidth for edge in scene.edges} == {3}
+    assert {edge.rad for edge in scene.edges} == {0.2}
+
+    # 未指定样式时与原来的固定颜色一致
+    scene = renderer.scene_for(data, 'flowchart')
+    assert [node.facecolor for node in scene.nodes][::len(scene.nodes) - 1] == \
+        ['#90EE90', '#FFB6C1']
+    print("✓ 绘制使用模板样式")
+
+
+def test_text_metrics():
+    """测试文字度量缓存、中文换行和节点框自动大小"""
+    print("\n=== 测试文字度量和节点框 ===")
+    from diagram_renderer import DiagramRenderer, FONT_FAMILIES
+    from drawing_utils import DrawingUtils
+    from text_metrics import TextMetrics, get_text_metrics
+
+    metrics = TextMetrics(FONT_FAMILIES)
+    width = metrics.line_width('宪法和基本法', 10, 'bold')
+    measured = metrics.measured
+    assert metrics.line_width('宪法和基本法', 20, 'bold') == 2 * width
+    metrics.line_width('基本法和宪法', 10, 'bold')
+    assert metrics.measured == measured == 5
+    print("✓ 每个字符只测量一次")
+
+    # 字体中没有的字符不按缺字占位符测量，按东亚宽度估算
+    import warnings
+    western = TextMetrics(['DejaVu Sans'])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        assert western.char_width('法') == 1.0 and not western.has_glyph('法')
+    assert not [w for w in caught if 'missing' in str(w.message)]
+    assert western.has_glyph('A') and western.char_width('A') != 0.55
+    print("✓ 缺字时按东亚宽度估算")
+
+    # 中文按字符宽度换行，标点不在行首，西文单词不断开
+    text = "这是一个很长的文本需要被格式化处理，并且包含标点。"
+    lines = metrics.wrap(text, 100, 10).split('\n')
+    assert len(lines) > 1 and ''.join(lines) == text
+    assert all(line[0] not in '，。' for line in lines)
+    assert all(metrics.line_width(line.rstrip('，。'), 10) <= 100 for line in lines)
+    english = metrics.wrap("constitutional review of administrative regulations", 100, 10)
+    assert set(english.split()) == {'constitutional', 'review', 'of', 'administrative',
+                                    'regulations'}
+    assert '\n' in DrawingUtils.format_text("这是一个很长的文本需要被格式化处理", max_length=10)
+    print("✓ 中文按字符宽度换行")
+
+    # 节点框随文字大小变化，文字不超出框
+    renderer = DiagramRenderer(templates={}, dpi=30)
+    data = {'title': '节点框', 'connections': [], 'nodes': [
+        {'id': 'a', 'text': '宪法', 'level': 1},
+        {'id': 'b', 'text': '全国人民代表大会常务委员会关于法律解释的决定', 'level': 2}]}
+    for template_type in ('hierarchy', 'flowchart', 'framework'):
+        figure = renderer.get_figure()
+        figure.clf()
+        ax = figure.add_subplot()
+        scene = renderer.build_scene(ax, data, template_type)
+        short, long = scene.nodes
+        assert short.width < long.width or short.height < long.height, template_type
+        scale_x, _ = renderer.points_per_unit(ax, scene.xlim, scene.ylim)
+        for node in scene.nodes:
+            text_width, _ = get_text_metrics(FONT_FAMILIES).text_size(node.text, node.fontsize,
+                                                                      'bold')
+            assert text_width <= node.width * scale_x, template_type
+    print("✓ 节点框按文字自动调整大小")
+
+
+def main():
+    """主测试函数"""
+    test_render_formats()
+    test_render_all_template_types()
+    test_unknown_template_and_format()
+    test_batch_cli_jsonl()
+    test_parallel_render_order_and_isolation()
+    test_render_cache()
+    test_batch_drawing()
+    test_export_pipeline()
+    test_native_vector_writer()
+    test_tile_pyramid()
+    test_compiled_style()
+    test_text_metrics()
+    print("\n✅ 渲染引擎测试全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板注册表测试
+验证模板文件只解析一次、按名称/类型/标签查找、只重新加载修改过的文件、大字段延迟附加，
+以及多个进程同时保存模板
+"""
+
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加utils目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+
+from drawing_utils import DrawingUtils
+from template_registry import TemplateRegistry, get_registry, DEFAULT_TEMPLATES
+from template_store import TemplateJournal
+
+
+def write_json(path, data, mtime):
+    """写入JSON文件并设置修改时间（避免同一时钟刻度内的修改被忽略）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.utime(path, (mtime, mtime))
+
+
+def test_builtin_templates():
+    """内置模板只解析一次，可按名称、类型和标签查找"""
+    registry = get_registry()
+    assert registry is get_registry('templates')
+    loads = registry.loads
+    assert loads == 2
+
+    # 学术论文模板文件中的模板也能按名称取到
+    assert DrawingUtils.load_template('论文结构图')['type'] == 'hierarchy'
+    assert '案例分析流程图' in DrawingUtils.load_all_templates()
+    assert registry.loads == loads
+    print("✓ 模板文件只解析一次")
+
+    assert '论文结构图' in registry.names_by_type('hierarchy')
+    assert '案例分析流程图' in registry.names_by_tag('法学模板')
+    assert '学术论文模板' in registry.tags_of('论文结构图')
+    assert set(registry.types) >= {'hierarchy', 'flowchart', 'network'}
+    print("✓ 按类型和标签查找模板")
+
+
+def test_reload_changed_file():
+    """刷新时只重新解析修改过的文件，导入的模板保留"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        legal = os.path.join(temp_dir, 'legal_templates.json')
+        academic = os.path.join(temp_dir, 'academic_templates.json')
+        write_json(legal, {"甲": {"type": "hierarchy"}}, 1000000000)
+        write_json(academic, {"乙": {"type": "network", "tags": ["图谱"]}}, 1000000000)
+
+        registry = TemplateRegistry(temp_dir)
+        assert registry.loads == 2 and sorted(registry) == ['乙', '甲']
+        assert registry.names_by_tag('图谱') == ['乙']
+        assert not registry.refresh()
+
+        registry.register('导入', {"type": "flowchart"})
+        write_json(academic, {"乙": {"type": "flowchart"}, "丙": {}}, 1000000100)
+        assert registry.refresh()
+        assert registry.loads == 3
+        assert set(registry) == {'甲', '乙', '丙', '导入'}
+        assert registry.names_by_type('flowchart') == ['乙', '导入']
+        assert registry.names_by_type('hierarchy') == ['甲', '丙']
+        assert registry.tags_of('导入') == ('导入模板',)
+        print("✓ 只重新加载修改过的文件")
+
+        # 模板文件都删除后使用默认模板
+        os.remove(legal)
+        os.remove(academic)
+        assert registry.refresh()
+        assert set(registry) == set(DEFAULT_TEMPLATES) | {'导入'}
+        assert registry.tags_of('法律条文关系图') == ('默认模板',)
+        print("✓ 没有模板文件时使用默认模板")
+
+
+def test_heavy_fields():
+    """图片数据不出现在摘要中，完整模板中包含"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        registry = TemplateRegistry(temp_dir)
+        registry.register('图片', {"type": "image_template", "image_base64": "QUJD"})
+
+        assert 'image_base64' not in registry.summary('图片')
+        template = registry['图片']
+        assert template['image_base64'] == "QUJD"
+        assert registry['图片'] is template
+        assert registry.names_by_type('image_template') == ['图片']
+        print("✓ 大字段不出现在摘要中")
+
+
+def save_many(args):
+    """在工作进程中连续保存模板"""
+    template_dir, worker, count = args
+    for i in range(count):
+        DrawingUtils.save_template(f"模板{worker}-{i}", {"type": "hierarchy", "index": i},
+                                   template_dir=template_dir)
+    return count
+
+
+def test_concurrent_save():
+    """多个进程同时保存模板不丢失，其他注册表刷新后只读取新记录"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        registry = TemplateRegistry(temp_dir)
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            tasks = [(temp_dir, worker, 25) for worker in range(4)]
+            assert sum(executor.map(save_many, tasks)) == 100
+
+        assert registry.refresh()
+        saved = registry.names_by_tag('已保存模板')
+        assert len(saved) == 100
+        assert registry['模板3-24']['index'] == 24
+        assert registry.journal.records == 100
+        print("✓ 多个进程同时保存模板不丢失")
+
+        # 覆盖和删除只追加记录，整理后只保留有效模板
+        journal = registry.journal
+        size = os.path.getsize(journal.path)
+        registry.save('模板0-0', {"type": "network"})
+        registry.delete('模板0-1')
+        assert registry.names_by_type('network') == ['模板0-0']
+        assert '模板0-1' not in registry
+        assert journal.records == 102 and os.path.getsize(journal.path) > size
+
+        other = TemplateRegistry(temp_dir)
+        journal.compact()
+        assert journal.records == 99 and os.path.getsize(journal.path) < size
+        assert other.refresh()
+        assert other.journal.records == 99
+        assert other['模板0-0']['type'] == 'network'
+        print("✓ 模板日志整理后原子替换")
+
+
+def test_torn_write():
+    """写入中断留下的半行被跳过，后续保存不受影响"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        journal = TemplateJournal(os.path.join(temp_dir, 'saved_templates.jsonl'))
+        journal.put('甲', {"type": "hierarchy"})
+        with open(journal.path, 'ab') as f:
+            f.write('{"op": "put", "name": "乙", "templ'.encode('utf-8'))
+
+        journal.put('丙', {"type": "flowchart"})
+        reader = TemplateJournal(journal.path)
+        reader.refresh()
+        assert sorted(reader.templates) == ['丙', '甲']
+        print("✓ 写入中断的记录被跳过")
+
+
+def main():
+    """主测试函数"""
+    test_builtin_templates()
+    test_reload_changed_file()
+    test_heavy_fields()
+    test_concurrent_save()
+    test_torn_write()
+    print("\n✅ 模板注册表测试全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,21 +11,143 @@ import time
 import hashlib
 import base64
 import hmac
+import random
+import threading
+from collections import deque
+from concurrent.futures import Future
 from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
 import logging
 
+# 需要重试的HTTP状态码（限流和服务端错误）
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class APICallMetrics:
+    """API调用延迟统计"""
+    
+    def __init__(self, window=1000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+    
+    def record(self, latency, ok, retries=0):
+        """记录一次调用（包含重试在内的总耗时）"""
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            self.total_latency += latency
+            self._latencies.append(latency)
+            if not ok:
+                self.errors += 1
+    
+    def snapshot(self):
+        """返回统计结果，延迟单位为毫秒"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors, retries = self.calls, self.errors, self.retries
+            total_latency = self.total_latency
+        
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+        
+        return {
+            'calls': calls,
+            'errors': errors,
+            'retries': retries,
+            'avg_ms': total_latency / calls * 1000 if calls else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': latencies[-1] * 1000 if latencies else 0.0
+        }
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后暂停请求，冷却后放行一次试探请求
+
+    只有服务不可用（连接错误、超时、429和5xx）才算失败；400、401等请求本身的错误
+    说明服务可以访问，不计入失败。
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def allow_request(self):
+        """是否允许发出请求"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            # 半开状态只放行一个试探请求
+            return self.state == self.CLOSED
+    
+    def record_success(self):
+        """记录成功，恢复正常状态"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+    
+    def record_failure(self):
+        """记录失败，达到阈值或试探失败时熔断"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
 class AlibabaCloudAIService:
     """阿里云AI服务类"""
     
-    def __init__(self, api_key, region='cn-hangzhou'):
+    def __init__(self, api_key, region='cn-hangzhou', cache=None, base_url=None,
+                 pool_size=10, max_retries=3, backoff_factor=0.5, max_backoff=8.0,
+                 timeout=30, probe_timeout=10):
         self.api_key = api_key
         self.region = region
-        self.base_url = f"https://dashscope.aliyuncs.com/api/v1"
+        self.base_url = base_url or "https://dashscope.aliyuncs.com/api/v1"
+        self.model = "qwen-turbo"
+        self.parameters = {
+            "temperature": 0.7,
+            "max_tokens": 2000
+        }
+        # 可选的响应缓存（LLMResponseCache），相同请求直接返回本地结果
+        self.cache = cache
         self.headers = {
             'Authorization': f'Bearer {api_key}',
             'Content-Type': 'application/json'
         }
         
+        # 复用连接池，避免每次请求重新建立TCP+TLS连接
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.metrics = APICallMetrics()
+        
+        # 可用性状态缓存（None表示尚未检测）和熔断器
+        self.probe_timeout = probe_timeout
+        self.health_status = None
+        self.health_checked_at = None
+        self.circuit_breaker = CircuitBreaker()
+        
         # 设置日志
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
@@ -33,7 +155,37 @@ class AlibabaCloudAIService:
     def analyze_text_structure(self, text):
         """分析文本结构，提取层次关系和逻辑连接"""
         try:
-            prompt = f"""
+            response = self._call_llm_api(self._build_analysis_prompt(text))
+            return self._parse_analysis_response(response, text)
+                
+        except Exception as e:
+            self.logger.error(f"AI分析失败: {e}")
+            return self._fallback_analysis(text)
+    
+    def enhance_diagram_content(self, original_text, diagram_type):
+        """增强图表内容，添加更多细节和逻辑关系"""
+        try:
+            response = self._call_llm_api(self._build_enhance_prompt(original_text, diagram_type))
+            return self._parse_enhance_response(response, original_text)
+                
+        except Exception as e:
+            self.logger.error(f"内容增强失败: {e}")
+            return original_text
+    
+    def suggest_diagram_type(self, text):
+        """根据文本内容建议合适的图表类型"""
+        try:
+            response = self._call_llm_api(self._build_suggest_prompt(text))
+            return self._parse_suggest_response(response)
+                
+        except Exception as e:
+            self.logger.error(f"图表类型建议失败: {e}")
+            return "hierarchy"
+    
+    @staticmethod
+    def _build_analysis_prompt(text):
+        """构造文本结构分析提示词"""
+        return f"""
 请分析以下文本的结构和逻辑关系，提取出：
 1. 主要概念和节点
 2. 概念之间的层次关系
@@ -52,21 +204,11 @@ class AlibabaCloudAIService:
     "enhanced_text": "优化后的文本内容"
 }}
 """
-            
-            response = self._call_llm_api(prompt)
-            if response:
-                return json.loads(response)
-            else:
-                return self._fallback_analysis(text)
-                
-        except Exception as e:
-            self.logger.error(f"AI分析失败: {e}")
-            return self._fallback_analysis(text)
     
-    def enhance_diagram_content(self, original_text, diagram_type):
-        """增强图表内容，添加更多细节和逻辑关系"""
-        try:
-            prompt = f"""
+    @staticmethod
+    def _build_enhance_prompt(original_text, diagram_type):
+        """构造内容增强提示词"""
+        return f"""
 请基于以下原始文本和图表类型，生成更详细和结构化的内容：
 
 原始文本：{original_text}
@@ -81,21 +223,11 @@ class AlibabaCloudAIService:
 
 请返回优化后的文本内容。
 """
-            
-            response = self._call_llm_api(prompt)
-            if response:
-                return response.strip()
-            else:
-                return original_text
-                
-        except Exception as e:
-            self.logger.error(f"内容增强失败: {e}")
-            return original_text
     
-    def suggest_diagram_type(self, text):
-        """根据文本内容建议合适的图表类型"""
-        try:
-            prompt = f"""
+    @staticmethod
+    def _build_suggest_prompt(text):
+        """构造图表类型建议提示词"""
+        return f"""
 请分析以下文本内容，建议最合适的图表类型：
 
 文本内容：{text}
@@ -109,55 +241,139 @@ class AlibabaCloudAIService:
 
 请返回图表类型名称。
 """
-            
-            response = self._call_llm_api(prompt)
-            if response:
-                return response.strip().lower()
-            else:
-                return "hierarchy"
-                
-        except Exception as e:
-            self.logger.error(f"图表类型建议失败: {e}")
+    
+    def _parse_analysis_response(self, response, text):
+        """解析结构分析响应，无响应时使用备用分析"""
+        if response:
+            return json.loads(response)
+        else:
+            return self._fallback_analysis(text)
+    
+    @staticmethod
+    def _parse_enhance_response(response, original_text):
+        """解析内容增强响应"""
+        if response:
+            return response.strip()
+        else:
+            return original_text
+    
+    @staticmethod
+    def _parse_suggest_response(response):
+        """解析图表类型建议响应"""
+        if response:
+            return response.strip().lower()
+        else:
             return "hierarchy"
     
-    def _call_llm_api(self, prompt):
-        """调用阿里云LLM API"""
-        try:
-            url = f"{self.base_url}/services/aigc/text-generation/generation"
-            
-            data = {
-                "model": "qwen-turbo",
-                "input": {
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ]
-                },
-                "parameters": {
-                    "temperature": 0.7,
-                    "max_tokens": 2000
-                }
-            }
-            
-            response = requests.post(url, headers=self.headers, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if 'output' in result and 'text' in result['output']:
-                    return result['output']['text']
-                else:
-                    self.logger.error(f"API响应格式错误: {result}")
-                    return None
-            else:
+    def _call_llm_api(self, prompt, use_cache=True):
+        """调用阿里云LLM API，优先读取响应缓存"""
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = self.cache.make_key(self.model, prompt, self.parameters)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        response = self._request_llm(prompt)
+        if response is not None and cache_key is not None:
+            self.cache.put(cache_key, self.model, response)
+        return response
+    
+    def _request_llm(self, prompt, max_retries=None, timeout=None):
+        """发送LLM请求，遇到限流或服务端错误时指数退避重试"""
+        # 熔断期间直接失败，不再等待超时
+        if not self.circuit_breaker.allow_request():
+            self.logger.warning("AI服务熔断中，跳过请求")
+            return None
+        
+        url = f"{self.base_url}/services/aigc/text-generation/generation"
+        
+        data = {
+            "model": self.model,
+            "input": {
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ]
+            },
+            "parameters": self.parameters
+        }
+        
+        if max_retries is None:
+            max_retries = self.max_retries
+        if timeout is None:
+            timeout = self.timeout
+        
+        start = time.perf_counter()
+        attempt = 0
+        text = None
+        while True:
+            retry_after = None
+            # 本次尝试是否因服务不可用失败（只有这类失败计入熔断）
+            unavailable = False
+            try:
+                response = self.session.post(url, json=data, timeout=timeout)
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    if 'output' in result and 'text' in result['output']:
+                        text = result['output']['text']
+                    else:
+                        self.logger.error(f"API响应格式错误: {result}")
+                    break
+                
                 self.logger.error(f"API调用失败: {response.status_code} - {response.text}")
-                return None
+                if response.status_code not in RETRY_STATUS_CODES:
+                    break
+                unavailable = True
+                retry_after = self._parse_retry_after(response)
                 
-        except Exception as e:
-            self.logger.error(f"API调用异常: {e}")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # 网络错误可以重试
+                unavailable = True
+                self.logger.error(f"API调用异常: {e}")
+            except Exception as e:
+                self.logger.error(f"API调用异常: {e}")
+                break
+            
+            if attempt >= max_retries:
+                break
+            time.sleep(self._backoff_delay(attempt, retry_after))
+            attempt += 1
+        
+        self.metrics.record(time.perf_counter() - start, text is not None, attempt)
+        if unavailable:
+            self.circuit_breaker.record_failure()
+        else:
+            # 服务有响应（包括请求本身的错误），半开状态的试探也随之结束
+            self.circuit_breaker.record_success()
+        return text
+    
+    def _backoff_delay(self, attempt, retry_after=None):
+        """计算退避时间：指数增长并加入随机抖动，服务端给出Retry-After时优先遵守"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+    
+    @staticmethod
+    def _parse_retry_after(response):
+        """解析Retry-After响应头（秒）"""
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
             return None
     
+    def get_metrics(self):
+        """获取API调用延迟统计"""
+        return self.metrics.snapshot()
+    
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+    
     def _fallback_analysis(self, text):
         """备用分析方法，当AI服务不可用时使用"""
         lines = text.strip().split('\n')
@@ -180,10 +396,28 @@ class AlibabaCloudAIService:
         }
     
     def is_available(self):
-        """检查AI服务是否可用"""
+        """检查AI服务是否可用，并缓存检测结果"""
         try:
             test_prompt = "测试连接"
-            response = self._call_llm_api(test_prompt)
-            return response is not None
+            # 可用性检查必须真实请求，不读取缓存，也不重试
+            response = self._request_llm(test_prompt, max_retries=0, timeout=self.probe_timeout)
+            available = response is not None
         except:
-            return False 
\ No newline at end of file
+            available = False
+        
+        self.health_status = available
+        self.health_checked_at = time.time()
+        return available
+    
+    def probe_availability_async(self):
+        """在后台线程中检查可用性，立即返回Future，不阻塞调用方"""
+        future = Future()
+        
+        def probe():
+            try:
+                future.set_result(self.is_available())
+            except Exception as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=probe, name='ai-health-probe', daemon=True).start()
+        return future
\ No newline at end of file
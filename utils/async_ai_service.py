@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步AI服务模块
+基于asyncio并发分析大量文本，使用信号量限制并发数并按速率限流
+"""
+
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_service import AlibabaCloudAIService
+
+
+class AsyncRateLimiter:
+    """令牌桶限速器，限制每秒发出的请求数"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """获取一个令牌，令牌不足时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncAlibabaCloudAIService:
+    """阿里云AI服务的异步版本
+
+    与同步服务使用相同的提示词、缓存和备用分析。HTTP请求在线程池中通过
+    同步服务的连接池发出，因此N个文档的总耗时接近最慢的一次请求，
+    而不是所有请求耗时之和。
+    """
+
+    def __init__(self, api_key, max_concurrency=8, requests_per_second=None, **service_options):
+        service_options.setdefault('pool_size', max_concurrency)
+        self.service = AlibabaCloudAIService(api_key, **service_options)
+        self.max_concurrency = max_concurrency
+        self.logger = self.service.logger
+
+        self.requests_per_second = requests_per_second
+        self._loop = None
+        self._semaphore = None
+        self._rate_limiter = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix='ai-request')
+
+    async def analyze_text_structure(self, text):
+        """分析文本结构，提取层次关系和逻辑连接"""
+        try:
+            response = await self._call_llm_api(self.service._build_analysis_prompt(text))
+            return self.service._parse_analysis_response(response, text)
+
+        except Exception as e:
+            self.logger.error(f"AI分析失败: {e}")
+            return self.service._fallback_analysis(text)
+
+    async def enhance_diagram_content(self, original_text, diagram_type):
+        """增强图表内容，添加更多细节和逻辑关系"""
+        try:
+            prompt = self.service._build_enhance_prompt(original_text, diagram_type)
+            response = await self._call_llm_api(prompt)
+            return self.service._parse_enhance_response(response, original_text)
+
+        except Exception as e:
+            self.logger.error(f"内容增强失败: {e}")
+            return original_text
+
+    async def suggest_diagram_type(self, text):
+        """根据文本内容建议合适的图表类型"""
+        try:
+            response = await self._call_llm_api(self.service._build_suggest_prompt(text))
+            return self.service._parse_suggest_response(response)
+
+        except Exception as e:
+            self.logger.error(f"图表类型建议失败: {e}")
+            return "hierarchy"
+
+    async def analyze_many(self, texts):
+        """并发分析多个文本，结果顺序与输入一致"""
+        return await asyncio.gather(*(self.analyze_text_structure(text) for text in texts))
+
+    async def _call_llm_api(self, prompt):
+        """在并发上限和速率限制内调用LLM接口"""
+        loop = asyncio.get_running_loop()
+        self._bind_loop(loop)
+        async with self._semaphore:
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire()
+            return await loop.run_in_executor(self._executor, self.service._call_llm_api, prompt)
+
+    def _bind_loop(self, loop):
+        """信号量和限速器与事件循环绑定，每个事件循环创建一组"""
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.requests_per_second:
+            self._rate_limiter = AsyncRateLimiter(self.requests_per_second)
+
+    def get_metrics(self):
+        """获取API调用延迟统计"""
+        return self.service.get_metrics()
+
+    def close(self):
+        """关闭线程池和连接池"""
+        self._executor.shutdown(wait=True)
+        self.service.close()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片模板存储模块
+图片按内容的SHA-256保存在 templates/blobs 下，模板中只记录哈希（image_blob）；
+读取时内存映射文件，解码并缩放后的图片按目标尺寸缓存，重复生成不再解码
+"""
+
+import base64
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+BLOB_DIR = os.path.join('templates', 'blobs')
+
+_DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# 按目录共享的存储
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_blob_store(root=BLOB_DIR):
+    """获取目录对应的共享存储，同一进程中缩放结果只缓存一份"""
+    key = os.path.abspath(root)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = BlobStore(root)
+        return _stores[key]
+
+
+class BlobStore:
+    """按内容寻址的图片存储，缩放后的图片按 (哈希, 尺寸) 做LRU缓存
+
+    打开的内存映射同样按LRU保留最多 max_maps 个，被淘汰的映射随即关闭；
+    可以用 with 语句使用，退出时关闭全部映射。
+    """
+
+    def __init__(self, root=BLOB_DIR, max_variants=32, max_maps=32):
+        self.root = root
+        self.max_variants = max_variants
+        self.max_maps = max_maps
+        self._maps = OrderedDict()
+        self._sizes = {}
+        self._variants = OrderedDict()
+        self._lock = threading.RLock()
+        # 解码图片的次数
+        self.decodes = 0
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, digest):
+        """文件路径，按哈希前两位分目录；哈希来自模板文件，先检查格式"""
+        if not isinstance(digest, str) or not _DIGEST_PATTERN.fullmatch(digest):
+            raise ValueError(f"无效的图片哈希: {digest}")
+        return os.path.join(self.root, digest[:2], digest)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """保存图片字节，返回哈希；相同内容只保存一份"""
+        digest = self.digest(data)
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest
+
+    def put_file(self, file_path):
+        """保存图片文件，返回哈希"""
+        with open(file_path, 'rb') as f:
+            return self.put(f.read())
+
+    def open(self, digest):
+        """只读内存映射的图片内容
+
+        映射可能在之后被淘汰关闭，调用方应在持有 self._lock 时使用。
+        """
+        with self._lock:
+            mapped = self._maps.get(digest)
+            if mapped is not None:
+                self._maps.move_to_end(digest)
+                return mapped
+
+            with open(self.path(digest), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[digest] = mapped
+            while len(self._maps) > self.max_maps:
+                _, evicted = self._maps.popitem(last=False)
+                evicted.close()
+            return mapped
+
+    def read(self, digest):
+        """图片字节"""
+        with self._lock:
+            return bytes(self.open(digest))
+
+    def image_size(self, digest):
+        """图片尺寸，只读取文件头"""
+        with self._lock:
+            size = self._sizes.get(digest)
+            if size is None:
+                mapped = self.open(digest)
+                mapped.seek(0)
+                with Image.open(mapped) as image:
+                    size = image.size
+                self._sizes[digest] = size
+            return size
+
+    def image(self, digest, size):
+        """缩放到 size 的图片（调用方不应修改），同一尺寸只解码和缩放一次"""
+        key = (digest, tuple(size))
+        with self._lock:
+            image = self._variants.get(key)
+            if image is not None:
+                self._variants.move_to_end(key)
+                return image
+
+            # 内存映射对象的读取位置是共享的，解码在锁内完成
+            mapped = self.open(digest)
+            mapped.seek(0)
+            with Image.open(mapped) as source:
+                image = source.resize(key[1], Image.Resampling.LANCZOS)
+            self.decodes += 1
+
+            self._variants[key] = image
+            while len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+            return image
+
+    def externalize(self, template):
+        """把模板中内嵌的 image_base64 存入存储，返回只记录哈希的模板"""
+        if 'image_base64' not in template:
+            return template
+        template = dict(template)
+        data = base64.b64decode(template.pop('image_base64'))
+        template['image_blob'] = self.put(data)
+        return template
+
+    def inline(self, template):
+        """返回内嵌 image_base64 的模板，用于导出到其他电脑"""
+        if 'image_blob' not in template:
+            return template
+        template = dict(template)
+        template['image_base64'] = base64.b64encode(
+            self.read(template['image_blob'])).decode('utf-8')
+        return template
+
+    def close(self):
+        """关闭内存映射并清空缓存"""
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._sizes.clear()
+            self._variants.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
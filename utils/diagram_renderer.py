@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无界面渲染模块
+基于Agg后端绘制图表，不依赖Tk，可在没有显示器的服务器上批量渲染
+"""
+
+import io
+import os
+import base64
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+
+from drawing_utils import DrawingUtils
+from layout_engine import LayeredLayout, ForceLayout
+from graph_model import DiagramGraph
+from stream_parser import StreamParser
+from scene import Scene
+from scene_drawer import draw_scene
+from render_cache import RenderCache
+from template_registry import get_registry
+from blob_store import get_blob_store
+from style_compiler import compile_style
+from text_metrics import get_text_metrics
+
+# 中文字体候选列表，Linux服务器上依次回退到常见的开源中文字体
+FONT_FAMILIES = ['SimHei', 'Microsoft YaHei', 'Noto Sans CJK SC',
+                 'WenQuanYi Micro Hei', 'DejaVu Sans']
+
+SUPPORTED_FORMATS = ('png', 'pdf', 'svg', 'jpg')
+
+# 网络图节点数超过该值时使用力导向布局
+FORCE_LAYOUT_THRESHOLD = 30
+
+
+class DiagramRenderer:
+    """图表渲染器，所有绘制方法只依赖传入的坐标轴"""
+
+    def __init__(self, templates=None, template_dir='templates',
+                 figsize=(14, 10), dpi=300, cache=None, batched=None):
+        self.template_dir = template_dir
+        self.cache = cache
+        self.figsize = figsize
+        self.dpi = dpi
+        # 批量绘制：None 按图形元素数量自动选择，True/False 强制指定
+        self.batched = batched
+        # 未指定模板时使用模板目录共享的注册表（文件只在修改后重新解析）
+        if templates is None:
+            templates = get_registry(template_dir)
+            templates.refresh()
+        self.templates = templates
+        self._figure = None
+
+        self.setup_fonts()
+
+    @staticmethod
+    def setup_fonts():
+        """设置中文字体"""
+        matplotlib.rcParams['font.sans-serif'] = FONT_FAMILIES
+        matplotlib.rcParams['axes.unicode_minus'] = False
+
+    def get_template(self, template_name):
+        """按名称获取模板"""
+        template = self.templates.get(template_name)
+        if template is None:
+            raise KeyError(f"模板不存在: {template_name}")
+        return template
+
+    def render(self, text, template_name, fmt='png', dpi=None):
+        """渲染文本为图表，返回图片字节"""
+        template = self.get_template(template_name)
+        data = self.parse_text_content(text)
+        return self.render_data(data, template, fmt=fmt, dpi=dpi)
+
+    def render_data(self, data, template, fmt='png', dpi=None, template_type=None):
+        """渲染已解析的图表数据，返回图片字节"""
+        fmt = fmt.lower()
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的输出格式: {fmt}")
+        dpi = dpi or self.dpi
+
+        # 相同输入直接返回缓存的字节，不经过matplotlib
+        cache_key = None
+        if self.cache is not None:
+            cache_key = RenderCache.make_key(data, template, fmt, dpi,
+                                             template_type, self.figsize, self.batched)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # 复用同一个Figure，避免每次渲染重新创建画布
+        figure = self.get_figure()
+        figure.clf()
+        ax = figure.add_subplot()
+
+        self.draw(ax, data, template, template_type)
+
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight',
+                       facecolor='white', edgecolor='none')
+        image_bytes = buffer.getvalue()
+
+        if cache_key is not None:
+            self.cache.put(cache_key, image_bytes)
+        return image_bytes
+
+    def get_figure(self):
+        """获取渲染用的Figure（同一渲染器实例不可跨线程并发使用）"""
+        if self._figure is None:
+            self._figure = Figure(figsize=self.figsize)
+            FigureCanvasAgg(self._figure)
+        return self._figure
+
+    def warm_up(self):
+        """预热：创建画布并完成一次小尺寸渲染，提前加载字体缓存"""
+        template_name = next(iter(self.templates), None)
+        if template_name is None:
+            return
+        self.render("预热\n宪法\n基本法", template_name, fmt='png', dpi=10)
+
+    def draw(self, ax, data, template, template_type=None):
+        """根据模板类型绘制图表"""
+        if template_type is None:
+            template_type = template.get('type', 'hierarchy')
+        style = compile_style(template, template_type)
+
+        if template_type == "image_template":
+            self.draw_image_template(ax, data, template)
+        elif template_type == "hierarchy":
+            self.draw_hierarchy(ax, data, style)
+        elif template_type == "flowchart":
+            self.draw_flowchart(ax, data, style)
+        elif template_type == "network":
+            self.draw_network(ax, data, style)
+        elif template_type == "decision_tree":
+            self.draw_decision_tree(ax, data, style)
+        elif template_type == "framework":
+            self.draw_framework(ax, data, style)
+        else:
+            self.draw_hierarchy(ax, data, style)
+
+    def build_scene(self, ax, data, template_type='hierarchy', style=None):
+        """根据模板类型生成场景；图片模板没有场景，返回None
+
+        style 为 compile_style() 的结果，未指定时使用该类型的默认样式
+        """
+        builders = {
+            'hierarchy': self.hierarchy_scene,
+            'flowchart': self.flowchart_scene,
+            'network': self.network_scene,
+            'decision_tree': self.decision_tree_scene,
+            'framework': self.framework_scene
+        }
+        if template_type == "image_template":
+            return None
+        return builders.get(template_type, self.hierarchy_scene)(ax, data, style)
+
+    def scene_for(self, data, template_type='hierarchy', style=None):
+        """在渲染用的Figure上生成场景，字号与 render_data 的输出一致"""
+        figure = self.get_figure()
+        figure.clf()
+        return self.build_scene(figure.add_subplot(), data, template_type, style)
+
+    @staticmethod
+    def parse_text_content(text):
+        """解析文本内容（逐行流式解析，text 也可以是文件对象）"""
+        return StreamParser().parse(text).to_data()
+
+    @staticmethod
+    def parse_ai_analysis(ai_analysis):
+        """解析AI分析结果"""
+        graph = DiagramGraph("AI智能分析图表")
+
+        # 处理AI分析的概念
+        concepts = ai_analysis.get('concepts', [])
+        for i, concept in enumerate(concepts):
+            if isinstance(concept, dict):
+                graph.add_node(concept.get('id', f'node_{i}'),
+                               concept.get('text', str(concept)),
+                               level=concept.get('level', 1))
+            else:
+                graph.add_node(f'node_{i}', str(concept), level=1)
+
+        # 处理连接关系
+        connections = ai_analysis.get('connections', [])
+        for conn in connections:
+            if isinstance(conn, dict):
+                graph.add_connection(conn.get('from', ''), conn.get('to', ''),
+                                     type=conn.get('type', 'simple'),
+                                     label=conn.get('label', ''))
+
+        return graph.to_data()
+
+    def draw_scene(self, ax, scene):
+        """按渲染器的绘制方式输出场景"""
+        draw_scene(ax, scene, self.batched)
+
+    def draw_hierarchy(self, ax, data, style=None):
+        """绘制层级关系图"""
+        ax.clear()
+        self.draw_scene(ax, self.hierarchy_scene(ax, data, style))
+
+    def hierarchy_scene(self, ax, data, style=None):
+        """层级关系图的场景（ax 只用于估算字号）"""
+        style = style or compile_style(template_type='hierarchy')
+        nodes = data['nodes']
+        connections = data['connections']
+
+        # 分层布局计算节点位置，坐标范围随节点数量自动扩展
+        layout = LayeredLayout()
+        node_positions = DrawingUtils.calculate_hierarchy_positions(
+            nodes, connections=connections, layout=layout)
+        xmin, xmax, ymin, ymax = layout.extents(node_positions)
+        fontsize = self.fit_fontsize(ax, xmax - xmin, ymax - ymin, layout.node_height,
+                                     max_size=style.font_size)
+        scene = Scene(data['title'], (xmin, xmax), (ymin, ymax))
+        graph = DiagramGraph.from_data(data)
+
+        # 绘制节点
+        colors = style.colors
+        edgecolor = style.border_color
+        line_color = style.line_color
+        linewidth = style.line_width
+        arrow_type = style.connection_style
+
+        # 节点框随文字换行，宽度不超过布局中的节点宽度，高度不超过层间距
+        scale = self.points_per_unit(ax, (xmin, xmax), (ymin, ymax))
+        size = (layout.node_width, layout.node_height)
+        max_size = (layout.node_width, layout.node_height + 0.6 * layout.v_gap)
+
+        for node in nodes:
+            level = node.get('level', 1)
+            x, y = node_positions[node['id']]
+            text, width, height = self.fit_node(node['text'], fontsize, scale, size, max_size)
+
+            # 节点框和文本
+            scene.add_node(node['id'], 'box', x, y, width, height, text,
+                           facecolor=colors[level % len(colors)], edgecolor=edgecolor,
+                           fontsize=fontsize)
+
+        # 绘制连接线，两端通过图模型的索引查找
+        for from_id, to_id, conn in graph.resolved_connections():
+            x1, y1 = node_positions[from_id]
+            x2, y2 = node_positions[to_id]
+            scene.add_arrow(x1, y1, x2, y2, arrow_type=conn.get('type', arrow_type),
+                            color=line_color, linewidth=linewidth,
+                            label=conn.get('label', ''), source=from_id, target=to_id)
+
+        # 如果没有明确的连接关系，使用层次连接
+        if not connections and len(nodes) > 1:
+            for i in range(len(nodes) - 1):
+                pos1 = node_positions.get(nodes[i]['id'])
+                pos2 = node_positions.get(nodes[i+1]['id'])
+                if pos1 and pos2:
+                    scene.add_hierarchical_connection(pos1, pos2, color=line_color,
+                                                      linewidth=linewidth,
+                                                      source=nodes[i]['id'],
+                                                      target=nodes[i+1]['id'])
+
+        # 用户拖动过的节点使用保存的位置
+        scene.move_nodes(data.get('positions', {}))
+        return scene
+
+    @staticmethod
+    def fit_fontsize(ax, width, height, node_height, max_size=10, min_size=2):
+        """根据坐标范围估算字号，节点很多时缩小文字避免溢出节点框"""
+        fig_width, fig_height = ax.figure.get_size_inches()
+        points_per_unit = min(fig_width * 72 / max(width, 1e-6),
+                              fig_height * 72 / max(height, 1e-6))
+        return max(min_size, min(max_size, node_height * points_per_unit * 0.4))
+
+    @staticmethod
+    def points_per_unit(ax, xlim, ylim):
+        """坐标轴上每个数据单位对应的磅数 (横向, 纵向)"""
+        fig_width, fig_height = ax.figure.get_size_inches()
+        box = ax.get_position()
+        return (fig_width * box.width * 72 / max(abs(xlim[1] - xlim[0]), 1e-6),
+                fig_height * box.height * 72 / max(abs(ylim[1] - ylim[0]), 1e-6))
+
+    @staticmethod
+    def fit_node(text, fontsize, scale, size, max_size, shape='box'):
+        """按文字确定节点框，返回 (换行后的文字, 宽, 高)，宽高为数据坐标
+
+        文字按 max_size 的宽度换行（中文按字符宽度），框的宽度随文字在默认宽度的一半到
+        max_size 之间变化，高度随行数增加，不小于默认高度、不超过 max_size；
+        菱形中能放文字的区域只有框的一半。
+        """
+        scale_x, scale_y = scale
+        inner = 0.5 if shape == 'diamond' else 1.0
+        pad_x, pad_y = fontsize, fontsize * 0.6
+        wrapped, width, height = get_text_metrics(FONT_FAMILIES).fit(
+            text, fontsize, max(max_size[0] * scale_x * inner - pad_x, fontsize), 'bold')
+        width = min(max_size[0], max(size[0] * 0.5, (width + pad_x) / scale_x / inner))
+        height = min(max_size[1], max(size[1], (height + pad_y) / scale_y / inner))
+        return wrapped, width, height
+
+    def draw_flowchart(self, ax, data, style=None):
+        """绘制流程图"""
+        ax.clear()
+        self.draw_scene(ax, self.flowchart_scene(ax, data, style))
+
+    def flowchart_scene(self, ax, data, style=None):
+        """流程图的场景"""
+        style = style or compile_style(template_type='flowchart')
+        nodes = data['nodes']
+        scene = Scene(data['title'], (-5, 5), (0, 12))
+        start_color, process_color, end_color = \
+            style.start_color, style.process_color, style.end_color
+        edgecolor = style.border_color
+        fontsize = style.font_size
+        line_color = style.line_color
+        linewidth = style.line_width
+        scale = self.points_per_unit(ax, scene.xlim, scene.ylim)
+
+        # 绘制流程图
+        for i, node in enumerate(nodes):
+            x = 0
+            y = 10 - i * 2
+
+            # 绘制流程框
+            if i == 0:  # 开始
+                facecolor = start_color
+            elif i == len(nodes) - 1:  # 结束
+                facecolor = end_color
+            else:  # 过程
+                facecolor = process_color
+
+            text, width, height = self.fit_node(node['text'], fontsize, scale, (3, 1), (8, 1.6))
+            scene.add_node(node['id'], 'box', x, y, width, height, text,
+                           facecolor=facecolor, edgecolor=edgecolor, fontsize=fontsize)
+
+            # 绘制箭头
+            if i < len(nodes) - 1:
+                scene.add_arrow(x, y+0.5, x, y-0.5, arrow_type='simple', color=line_color,
+                                linewidth=linewidth, source=node['id'], target=node['id'])
+
+        scene.move_nodes(data.get('positions', {}))
+        return scene
+
+    def draw_network(self, ax, data, style=None):
+        """绘制网络图"""
+        ax.clear()
+        self.draw_scene(ax, self.network_scene(ax, data, style))
+
+    def network_scene(self, ax, data, style=None):
+        """网络图的场景（ax 只用于估算字号）"""
+        style = style or compile_style(template_type='network')
+        nodes = data['nodes']
+        connections = data.get('connections', [])
+
+        # 有连接关系或节点较多时使用力导向布局，否则沿用圆形布局
+        if connections or len(nodes) > FORCE_LAYOUT_THRESHOLD:
+            layout = ForceLayout()
+            node_positions = DrawingUtils.calculate_network_positions(
+                nodes, layout='force', connections=connections)
+            xmin, xmax, ymin, ymax = layout.extents(node_positions)
+            fontsize = self.fit_fontsize(ax, xmax - xmin, ymax - ymin, 2 * layout.node_radius,
+                                         max_size=style.font_size)
+        else:
+            node_positions = DrawingUtils.calculate_network_positions(nodes)
+            xmin, xmax, ymin, ymax = -8, 8, -8, 8
+            fontsize = style.font_size
+        scene = Scene(data['title'], (xmin, xmax), (ymin, ymax))
+        facecolor, edgecolor = style.node_color, style.border_color
+        line_color, linewidth = style.line_color, style.line_width
+        arrow_type = style.connection_style
+
+        # 圆形节点大小由布局决定，文字只按圆内的宽度换行
+        scale = self.points_per_unit(ax, (xmin, xmax), (ymin, ymax))
+        metrics = get_text_metrics(FONT_FAMILIES)
+        max_width = 2 * 0.9 * scale[0]
+
+        for node in nodes:
+            x, y = node_positions[node['id']]
+            text = metrics.wrap(node['text'], max_width, fontsize, 'bold')
+
+            # 节点和文本
+            scene.add_node(node['id'], 'circle', x, y, 2, 2, text,
+                           facecolor=facecolor, edgecolor=edgecolor, fontsize=fontsize)
+
+        # 绘制连接线（没有连接关系时按节点顺序相连）
+        for from_id, to_id in DiagramGraph(nodes=nodes, connections=connections).edge_pairs():
+            x, y = node_positions[from_id]
+            next_x, next_y = node_positions[to_id]
+            scene.add_arrow(x, y, next_x, next_y, arrow_type=arrow_type, color=line_color,
+                            linewidth=linewidth, source=from_id, target=to_id)
+
+        scene.move_nodes(data.get('positions', {}))
+        return scene
+
+    def draw_decision_tree(self, ax, data, style=None):
+        """绘制决策树"""
+        ax.clear()
+        self.draw_scene(ax, self.decision_tree_scene(ax, data, style))
+
+    def decision_tree_scene(self, ax, data, style=None):
+        """决策树的场景"""
+        style = style or compile_style(template_type='decision_tree')
+        nodes = data['nodes']
+        scene = Scene(data['title'], (-5, 5), (0, 12))
+        decision_color, result_color = style.decision_color, style.result_color
+        edgecolor = style.border_color
+        fontsize = style.font_size
+        line_color = style.line_color
+        linewidth = style.line_width
+        scale = self.points_per_unit(ax, scene.xlim, scene.ylim)
+
+        # 绘制决策树
+        for i, node in enumerate(nodes):
+            x = 0
+            y = 10 - i * 1.5
+
+            # 菱形为决策节点，矩形为结果节点
+            if i % 2 == 0:
+                text, width, height = self.fit_node(node['text'], fontsize, scale,
+                                                    (2, 1), (8, 1.2), 'diamond')
+                scene.add_node(node['id'], 'diamond', x, y, width, height, text,
+                               facecolor=decision_color, edgecolor=edgecolor,
+                               fontsize=fontsize)
+            else:
+                text, width, height = self.fit_node(node['text'], fontsize, scale,
+                                                    (2, 1), (8, 1.2))
+                scene.add_node(node['id'], 'box', x, y, width, height, text,
+                               facecolor=result_color, edgecolor=edgecolor,
+                               fontsize=fontsize)
+
+            # 绘制连接线
+            if i < len(nodes) - 1:
+                scene.add_edge([(x, y+0.5), (x, y-0.5)], color=line_color,
+                               linewidth=linewidth, source=node['id'], target=node['id'])
+
+        scene.move_nodes(data.get('positions', {}))
+        return scene
+
+    def draw_framework(self, ax, data, style=None):
+        """绘制框架图"""
+        ax.clear()
+        self.draw_scene(ax, self.framework_scene(ax, data, style))
+
+    def framework_scene(self, ax, data, style=None):
+        """框架图的场景"""
+        style = style or compile_style(template_type='framework')
+        nodes = data['nodes']
+        scene = Scene(data['title'], (-6, 6), (0, 10))
+        facecolor, edgecolor = style.box_color, style.border_color
+        fontsize = style.font_size
+        scale = self.points_per_unit(ax, scene.xlim, scene.ylim)
+
+        # 网格布局
+        cols = 3
+
+        for i, node in enumerate(nodes):
+            row = i // cols
+            col = i % cols
+
+            x = (col - 1) * 4
+            y = 8 - row * 2
+
+            # 框架框和文本
+            text, width, height = self.fit_node(node['text'], fontsize, scale, (3, 1), (3.6, 1.6))
+            scene.add_node(node['id'], 'box', x, y, width, height, text,
+                           facecolor=facecolor, edgecolor=edgecolor, fontsize=fontsize)
+
+        scene.move_nodes(data.get('positions', {}))
+        return scene
+
+    def draw_image_template(self, ax, data, template):
+        """绘制图片模板图表"""
+        image_blob = template.get('image_blob')
+        image_base64 = template.get('image_base64')
+        if image_blob:
+            # 图片存储中的模板：缩放结果按画布尺寸缓存，重复生成不再解码
+            store = get_blob_store(os.path.join(self.template_dir, 'blobs'))
+            size = self.image_display_size(ax, store.image_size(image_blob))
+            image = store.image(image_blob, size)
+        elif image_base64:
+            # 旧版模板内嵌base64图片数据，每次解码
+            image = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+            size = self.image_display_size(ax, image.size)
+            image = image.resize(size, Image.Resampling.LANCZOS)
+        else:
+            raise ValueError("图片模板数据不完整")
+
+        # 显示图片
+        ax.imshow(image, extent=[-6, 6, -4, 4])
+
+        # 添加标题
+        title = data.get('title', '图片模板图表')
+        ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+
+        # 如果有文本内容，在图片下方显示
+        if data.get('nodes'):
+            text_content = '\n'.join([node['text'] for node in data['nodes']])
+            ax.text(0, -5, text_content, ha='center', va='top',
+                    fontsize=10, bbox=dict(boxstyle="round,pad=0.5",
+                                           facecolor='lightblue', alpha=0.7))
+
+        ax.set_xlim(-6, 6)
+        ax.set_ylim(-6, 6)
+        ax.axis('off')
+
+    @staticmethod
+    def image_display_size(ax, image_size):
+        """图片缩放到画布80%范围内的像素尺寸，保持宽高比"""
+        fig_width, fig_height = ax.figure.get_size_inches()
+        dpi = ax.figure.dpi
+        canvas_width = fig_width * dpi
+        canvas_height = fig_height * dpi
+
+        img_width, img_height = image_size
+        aspect_ratio = img_width / img_height
+        canvas_aspect = canvas_width / canvas_height
+
+        if aspect_ratio > canvas_aspect:
+            # 图片更宽，以宽度为准
+            display_width = canvas_width * 0.8
+            display_height = display_width / aspect_ratio
+        else:
+            # 图片更高，以高度为准
+            display_height = canvas_height * 0.8
+            display_width = display_height * aspect_ratio
+        return max(1, int(display_width)), max(1, int(display_height))
+
+
+_default_renderer = None
+
+
+def render(text, template_name, fmt='png'):
+    """使用默认渲染器将文本渲染为图片字节"""
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = DiagramRenderer()
+    return _default_renderer.render(text, template_name, fmt)
@@ -9,8 +9,13 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.patches import FancyBboxPatch, ConnectionPatch
 import numpy as np
-import json
-import os
+
+from layout_engine import LayeredLayout, ForceLayout
+from graph_model import DiagramGraph
+from sparse_graph import SparseAdjacency
+from stream_parser import StreamParser, tokenize_connections
+from template_registry import DEFAULT_TEMPLATES, get_registry
+from text_metrics import get_text_metrics
 
 class DrawingUtils:
     """绘图工具类"""
@@ -69,26 +74,27 @@ class DrawingUtils:
         ax.plot([x1, x2], [y1, y2], color=color, linewidth=linewidth, linestyle=linestyle)
     
     @staticmethod
-    def calculate_hierarchy_positions(nodes, max_width=10, max_height=12):
-        """计算层级图节点位置"""
-        positions = {}
-        levels = {}
-        
-        # 按层级分组
-        for node in nodes:
-            level = node.get('level', 1)
-            if level not in levels:
-                levels[level] = []
-            levels[level].append(node)
-        
-        # 计算位置
-        for level, level_nodes in levels.items():
-            y = max_height - level * 2
-            for i, node in enumerate(level_nodes):
-                x = (i - len(level_nodes) / 2) * (max_width / max(len(levels), 1))
-                positions[node['id']] = (x, y)
-        
-        return positions
+    def calculate_hierarchy_positions(nodes, max_width=10, max_height=12, connections=None,
+                                      layout=None):
+        """计算层级图节点位置
+        
+        使用分层布局引擎，有连接关系时按连线分层，否则按节点的 level 分层；
+        同层节点保持最小间距并尽量减少连线交叉，节点再多也不会重叠。第一层位于 y = max_height - 2，横向范围随节点数增长，
+        max_width 仅为兼容旧接口保留。
+        """
+        if not nodes:
+            return {}
+        
+        layout = layout or LayeredLayout()
+        graph = DiagramGraph(nodes=nodes, connections=connections)
+        # 解析文本得到的 level 是行号、AI分析结果的 level 都是1，有连接关系时按连线分层
+        levels = None
+        if not graph.connections:
+            levels = {node['id']: node.get('level', 1) for node in nodes}
+        positions = layout.layout(graph.node_ids(), graph.edge_pairs(), levels)
+        
+        top = max_height - 2
+        return {node_id: (x, y + top) for node_id, (x, y) in positions.items()}
     
     @staticmethod
     def calculate_flowchart_positions(nodes, direction='vertical'):
@@ -109,12 +115,21 @@ class DrawingUtils:
         return positions
     
     @staticmethod
-    def calculate_network_positions(nodes, layout='circular'):
-        """计算网络图节点位置"""
+    def calculate_network_positions(nodes, layout='circular', connections=None, seed=0,
+                                    iterations=60):
+        """计算网络图节点位置
+        
+        layout 可选 'circular'、'grid'、'force'。力导向布局按连接关系（没有时按节点
+        顺序相连）计算，seed 相同时结果相同。
+        """
         positions = {}
         n = len(nodes)
         
-        if layout == 'circular':
+        if layout == 'force':
+            force_layout = ForceLayout(iterations=iterations, seed=seed)
+            graph = DiagramGraph(nodes=nodes, connections=connections)
+            return force_layout.layout(graph.node_ids(), graph.edge_pairs())
+        elif layout == 'circular':
             radius = 5
             for i, node in enumerate(nodes):
                 angle = 2 * np.pi * i / n
@@ -123,6 +138,7 @@ class DrawingUtils:
                 positions[node['id']] = (x, y)
         elif layout == 'grid':
             cols = int(np.ceil(np.sqrt(n)))
+            rows = (n + cols - 1) // cols if cols else 0
             for i, node in enumerate(nodes):
                 row = i // cols
                 col = i % cols
@@ -162,53 +178,27 @@ class DrawingUtils:
     @staticmethod
     def parse_connections(text):
         """解析连接关系"""
-        connections = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if '->' in line or '→' in line:
-                parts = line.replace('→', '->').split('->')
-                if len(parts) == 2:
-                    connections.append({
-                        'from': parts[0].strip(),
-                        'to': parts[1].strip()
-                    })
-        
-        return connections
+        return list(StreamParser().iter_connections(text))
     
     @staticmethod
-    def load_template(template_name):
-        """加载模板"""
-        template_path = os.path.join('templates', 'legal_templates.json')
-        
-        if os.path.exists(template_path):
-            with open(template_path, 'r', encoding='utf-8') as f:
-                templates = json.load(f)
-                return templates.get(template_name)
-        
-        return None
-    
+    def load_template(template_name, template_dir='templates'):
+        """加载模板（法学模板和学术论文模板），不存在时返回None"""
+        return get_registry(template_dir).get(template_name)
+
     @staticmethod
-    def save_template(template_name, template_data):
-        """保存模板"""
-        template_path = os.path.join('templates', 'legal_templates.json')
-        
-        # 确保目录存在
-        os.makedirs(os.path.dirname(template_path), exist_ok=True)
-        
-        # 加载现有模板
-        templates = {}
-        if os.path.exists(template_path):
-            with open(template_path, 'r', encoding='utf-8') as f:
-                templates = json.load(f)
-        
-        # 添加新模板
-        templates[template_name] = template_data
-        
-        # 保存
-        with open(template_path, 'w', encoding='utf-8') as f:
-            json.dump(templates, f, ensure_ascii=False, indent=2)
+    def load_all_templates(template_dir='templates'):
+        """加载全部内置模板（法学模板 + 学术论文模板），没有模板文件时使用默认模板
+
+        模板由共享的注册表缓存，文件未修改时不会重新解析。
+        """
+        registry = get_registry(template_dir)
+        registry.refresh()
+        return dict(registry)
+
+    @staticmethod
+    def save_template(template_name, template_data, template_dir='templates'):
+        """保存模板（追加到模板日志，多个进程同时保存也不会丢失）"""
+        get_registry(template_dir).save(template_name, template_data)
     
     @staticmethod
     def get_color_palette(palette_name='default'):
@@ -224,27 +214,11 @@ class DrawingUtils:
     
     @staticmethod
     def format_text(text, max_length=20):
-        """格式化文本，处理长文本"""
-        if len(text) <= max_length:
-            return text
-        
-        # 简单的文本换行处理
-        words = text.split()
-        lines = []
-        current_line = ""
-        
-        for word in words:
-            if len(current_line + word) <= max_length:
-                current_line += word + " "
-            else:
-                if current_line:
-                    lines.append(current_line.strip())
-                current_line = word + " "
-        
-        if current_line:
-            lines.append(current_line.strip())
+        """格式化文本，处理长文本
         
-        return '\n'.join(lines)
+        max_length 为每行的宽度，以一个汉字的宽度为单位；中文按字符宽度换行，西文按单词换行
+        """
+        return get_text_metrics().wrap(text, max_length, 1, 'bold')
     
     @staticmethod
     def draw_advanced_arrow(ax, x1, y1, x2, y2, arrow_type='simple', 
@@ -344,55 +318,11 @@ class DrawingUtils:
     @staticmethod
     def parse_advanced_connections(text):
         """解析高级连接关系，支持多种连接类型"""
-        connections = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # 支持多种连接符号
-            connection_symbols = ['->', '→', '=>', '⇒', '-->', '--->', '==>']
-            connection_type = 'simple'
-            
-            for symbol in connection_symbols:
-                if symbol in line:
-                    parts = line.split(symbol)
-                    if len(parts) == 2:
-                        # 检测连接类型
-                        if symbol in ['=>', '⇒']:
-                            connection_type = 'thick'
-                        elif symbol in ['-->', '--->']:
-                            connection_type = 'dashed'
-                        elif symbol in ['==>']:
-                            connection_type = 'double'
-                        
-                        # 提取标签
-                        label = ''
-                        from_text = parts[0].strip()
-                        to_text = parts[1].strip()
-                        
-                        # 检查是否有标签
-                        if '[' in to_text and ']' in to_text:
-                            label_start = to_text.find('[')
-                            label_end = to_text.find(']')
-                            label = to_text[label_start+1:label_end]
-                            to_text = to_text[:label_start].strip()
-                        
-                        connections.append({
-                            'from': from_text,
-                            'to': to_text,
-                            'type': connection_type,
-                            'label': label
-                        })
-                    break
-        
-        return connections
+        return tokenize_connections(text)
     
     @staticmethod
     def create_connection_matrix(nodes):
-        """创建连接矩阵"""
+        """创建连接矩阵（n×n 稠密矩阵，大图请使用 create_sparse_adjacency）"""
         n = len(nodes)
         matrix = [[0] * n for _ in range(n)]
         node_ids = [node['id'] for node in nodes]
@@ -402,12 +332,21 @@ class DrawingUtils:
     @staticmethod
     def apply_connections_to_matrix(matrix, node_ids, connections):
         """将连接关系应用到矩阵"""
+        # ID到序号的索引，ID重复时与 list.index 一样取第一个
+        index = {}
+        for i, node_id in enumerate(node_ids):
+            index.setdefault(node_id, i)
+        
         for conn in connections:
-            try:
-                from_idx = node_ids.index(conn['from'])
-                to_idx = node_ids.index(conn['to'])
-                matrix[from_idx][to_idx] = 1
-            except ValueError:
+            from_idx = index.get(conn['from'])
+            to_idx = index.get(conn['to'])
+            if from_idx is None or to_idx is None:
                 continue
+            matrix[from_idx][to_idx] = 1
         
-        return matrix 
\ No newline at end of file
+        return matrix
+    
+    @staticmethod
+    def create_sparse_adjacency(nodes, connections):
+        """创建稀疏邻接表（CSR），连接两端可以是节点文本或ID，支持度数、可达性和连通分量查询"""
+        return SparseAdjacency.from_connections(nodes, connections)
\ No newline at end of file
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导出模块
+图表只生成一次场景，PNG/PDF/SVG/JPG 在后台进程中由同一场景并行输出，
+文件先写临时文件再原子替换，调用方通过 Future 获取完成情况，不阻塞界面。
+SVG/PDF 可以选择 native 后端，由 vector_writer 直接输出，不经过matplotlib
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from diagram_renderer import DiagramRenderer, SUPPORTED_FORMATS
+from scene_drawer import draw_scene
+from vector_writer import VECTOR_FORMATS, write_vector
+
+# matplotlib：所有格式都用matplotlib绘制；native：SVG/PDF 直接由场景输出
+EXPORT_BACKENDS = ('matplotlib', 'native')
+
+# 每个工作进程内的渲染器，只用于没有场景的图片模板
+_worker_renderer = None
+
+
+def atomic_write(path, data):
+    """先写同目录下的临时文件再替换，读者不会看到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def render_scene(scene, fmt='png', dpi=300, figsize=(14, 10), batched=None,
+                 backend='matplotlib'):
+    """把场景绘制为图片字节，每次使用新的Figure，可在任意线程或进程中调用
+
+    backend 为 'native' 时SVG/PDF由 vector_writer 直接输出，位图格式仍使用matplotlib。
+    """
+    if backend == 'native' and fmt in VECTOR_FORMATS:
+        return write_vector(scene, fmt, figsize)
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    draw_scene(ax, scene, batched)
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight',
+                   facecolor='white', edgecolor='none')
+    return buffer.getvalue()
+
+
+def targets_for(base_path, formats):
+    """由不含扩展名的路径生成 {格式: 文件路径}"""
+    return {fmt: f"{base_path}.{fmt}" for fmt in formats}
+
+
+def _init_worker():
+    """工作进程初始化：设置中文字体"""
+    global _worker_renderer
+    _worker_renderer = DiagramRenderer(templates={})
+
+
+def _export_task(task):
+    """在工作进程中输出一种格式，异常只影响当前格式"""
+    try:
+        image_bytes = task.get('image_bytes')
+        if image_bytes is None:
+            if task['scene'] is not None:
+                image_bytes = render_scene(task['scene'], task['format'], task['dpi'],
+                                           task['figsize'], task['batched'], task['backend'])
+            else:
+                renderer = _worker_renderer or DiagramRenderer(templates={})
+                image_bytes = renderer.render_data(task['data'], task['template'],
+                                                   task['format'], task['dpi'],
+                                                   task['template_type'])
+        atomic_write(task['path'], image_bytes)
+        return _export_result(task, True, size=len(image_bytes))
+    except Exception as e:
+        return _export_result(task, False, error=f"{type(e).__name__}: {e}")
+
+
+def _export_result(task, ok, size=0, error=None):
+    """构造单个格式的导出结果"""
+    return {
+        'format': task['format'],
+        'path': task['path'],
+        'ok': ok,
+        'size': size,
+        'error': error
+    }
+
+
+class ExportJob:
+    """一次导出中各格式的 Future"""
+
+    def __init__(self, futures):
+        self.futures = futures
+
+    def done(self):
+        """全部格式是否都已完成"""
+        return all(future.done() for future in self.futures.values())
+
+    def results(self, timeout=None):
+        """按提交顺序返回各格式的结果（未完成时等待）"""
+        return [future.result(timeout) for future in self.futures.values()]
+
+    @property
+    def paths(self):
+        return [result['path'] for result in self.results() if result['ok']]
+
+
+class ExportPipeline:
+    """多格式导出流水线
+
+    export() 立即返回 ExportJob；每种格式作为独立任务提交到常驻的进程池，
+    进程池在第一次导出时创建并保持，避免每次导出重新加载matplotlib。
+    工作进程以 spawn 方式启动，不继承界面进程（Tk）的状态；进程池因工作进程异常退出
+    而损坏时，下一次导出丢弃并重建进程池。
+    processes=False 时使用线程池（每个任务使用独立的Figure）。
+    backend 为默认的导出后端，见 EXPORT_BACKENDS。
+    """
+
+    def __init__(self, workers=None, dpi=300, figsize=(14, 10), batched=None, processes=True,
+                 backend='matplotlib'):
+        self.workers = workers or min(len(SUPPORTED_FORMATS), os.cpu_count() or 1)
+        self.dpi = dpi
+        self.figsize = figsize
+        self.batched = batched
+        self.processes = processes
+        self.backend = self.check_backend(backend)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def export(self, targets, scene=None, data=None, template=None, template_type=None,
+               dpi=None, prerendered=None, backend=None):
+        """导出到 targets（{格式: 文件路径}），返回 ExportJob
+
+        scene 为 DiagramRenderer.build_scene 的结果，所有格式共用；图片模板没有场景时
+        传入 data、template 和 template_type 由工作进程渲染。prerendered 为
+        {格式: 已渲染的字节}（例如渲染缓存中的PNG），这些格式只需写文件。
+        backend 指定本次导出的后端，默认使用 self.backend。
+        """
+        backend = self.check_backend(backend or self.backend)
+        prerendered = prerendered or {}
+        futures = {}
+        for fmt, path in targets.items():
+            fmt = fmt.lower()
+            if fmt not in SUPPORTED_FORMATS:
+                raise ValueError(f"不支持的输出格式: {fmt}")
+            task = {
+                'format': fmt,
+                'path': path,
+                'dpi': dpi or self.dpi,
+                'figsize': self.figsize,
+                'batched': self.batched,
+                'backend': backend,
+                'image_bytes': prerendered.get(fmt)
+            }
+            if task['image_bytes'] is None:
+                task.update(scene=scene, data=data, template=template,
+                            template_type=template_type)
+            futures[fmt] = self._submit(task)
+        return ExportJob(futures)
+
+    @staticmethod
+    def check_backend(backend):
+        """检查导出后端名称"""
+        if backend not in EXPORT_BACKENDS:
+            raise ValueError(f"不支持的导出后端: {backend}")
+        return backend
+
+    def _submit(self, task):
+        """提交导出任务；进程池在检查之后才损坏时重建一次再提交"""
+        try:
+            return self._get_executor().submit(_export_task, task)
+        except BrokenProcessPool:
+            return self._get_executor(discard_broken=True).submit(_export_task, task)
+
+    def _get_executor(self, discard_broken=False):
+        """第一次使用时创建进程池（或线程池），已损坏的进程池被丢弃并重建"""
+        with self._lock:
+            if self._executor is not None and (discard_broken or
+                                               getattr(self._executor, '_broken', False)):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._executor is None:
+                if self.processes:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, initializer=_init_worker,
+                        mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='export')
+            return self._executor
+
+    def shutdown(self, wait=False):
+        """关闭工作进程，未开始的导出任务被取消"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图模型模块
+节点表带文本→ID、ID→序号两个哈希索引，解析和绘制共用，
+连接关系按文本或ID解析都是O(1)，大量连线时整体保持线性
+"""
+
+
+class DiagramGraph:
+    """图表的节点表和连线表
+
+    节点和连线仍然是解析结果中的字典，可以直接通过 to_data() 还原为
+    {'title', 'nodes', 'connections'} 结构，用于缓存键、JSON和批量渲染。
+    """
+
+    def __init__(self, title='', nodes=None, connections=None):
+        self.title = title
+        self.nodes = []
+        self.connections = []
+        self._id_index = {}
+        self._text_index = {}
+
+        for node in nodes or []:
+            self.add_node_dict(node)
+        for conn in connections or []:
+            self.add_connection_dict(conn)
+
+    @classmethod
+    def from_data(cls, data):
+        """从解析结果构建"""
+        return cls(data.get('title', ''), data.get('nodes', []), data.get('connections', []))
+
+    def to_data(self):
+        """转换为解析结果结构"""
+        return {
+            'title': self.title,
+            'nodes': self.nodes,
+            'connections': self.connections
+        }
+
+    def add_node(self, node_id, text, level=1, **attrs):
+        """添加节点，返回节点字典"""
+        node = {'id': node_id, 'text': text, 'level': level}
+        node.update(attrs)
+        return self.add_node_dict(node)
+
+    def add_node_dict(self, node):
+        """添加已有的节点字典；文本重复时按文本查找返回第一个节点"""
+        self._id_index.setdefault(node['id'], len(self.nodes))
+        self._text_index.setdefault(node['text'], node['id'])
+        self.nodes.append(node)
+        return node
+
+    def add_connection(self, from_ref, to_ref, **attrs):
+        """添加连线，两端可以是节点文本或节点ID"""
+        conn = {'from': from_ref, 'to': to_ref}
+        conn.update(attrs)
+        return self.add_connection_dict(conn)
+
+    def add_connection_dict(self, conn):
+        """添加已有的连线字典"""
+        self.connections.append(conn)
+        return conn
+
+    def resolve(self, ref):
+        """把节点文本或ID解析为节点ID，找不到返回None（文本优先）"""
+        node_id = self._text_index.get(ref)
+        if node_id is None and ref in self._id_index:
+            return ref
+        return node_id
+
+    def index_of(self, node_id):
+        """节点ID在节点表中的序号"""
+        return self._id_index.get(node_id)
+
+    def get_node(self, ref):
+        """按文本或ID获取节点字典"""
+        node_id = self.resolve(ref)
+        if node_id is None:
+            return None
+        return self.nodes[self._id_index[node_id]]
+
+    def __contains__(self, ref):
+        return self.resolve(ref) is not None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def node_ids(self):
+        """全部节点ID"""
+        return [node['id'] for node in self.nodes]
+
+    def resolved_connections(self):
+        """两端都能解析的连线，返回 (from_id, to_id, 连线字典) 列表"""
+        resolved = []
+        for conn in self.connections:
+            from_id = self.resolve(conn.get('from', ''))
+            to_id = self.resolve(conn.get('to', ''))
+            if from_id is not None and to_id is not None:
+                resolved.append((from_id, to_id, conn))
+        return resolved
+
+    def edge_pairs(self, chain_if_empty=True):
+        """连线的节点ID对；没有连接关系时按节点顺序依次相连
+
+        与层级图、网络图的默认连线一致。
+        """
+        if not self.connections and chain_if_empty:
+            return [(self.nodes[i]['id'], self.nodes[i + 1]['id'])
+                    for i in range(len(self.nodes) - 1)]
+        return [(from_id, to_id) for from_id, to_id, _ in self.resolved_connections()]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务执行模块
+在后台线程中执行耗时任务，通过Tk的after轮询把进度和结果交回主线程
+"""
+
+import queue
+import itertools
+import threading
+from concurrent.futures import Future
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class CancelToken:
+    """取消标记，任务在各阶段之间检查"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """请求取消"""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        """是否已请求取消"""
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """已取消时抛出JobCancelled"""
+        if self._event.is_set():
+            raise JobCancelled()
+
+
+class BackgroundJob:
+    """一次提交的后台任务"""
+
+    def __init__(self, job_id, token, on_success, on_error, on_progress, on_cancel):
+        self.job_id = job_id
+        self.token = token
+        self.future = None
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.progress = queue.Queue()
+
+    def cancel(self):
+        """取消任务（正在执行的阶段结束后生效，结果不会再回调）"""
+        self.token.cancel()
+
+
+class BackgroundJobExecutor:
+    """后台任务执行器
+
+    同一时间只保留一个有效任务，提交新任务会取消旧任务。每个任务在自己的
+    后台线程中执行，新任务不必等待旧任务结束。
+
+    取消的粒度是阶段：取消只设置标记，任务在阶段之间检查，正在进行的阶段
+    （例如一次AI网络请求）不会被中断，旧任务的线程会执行到下一次检查或结束，
+    但轮询只分发当前任务，旧任务的结果、异常和进度都不会回调。
+    任务之间共享渲染器等非线程安全对象时，相应阶段需要在 lock 内执行。
+    所有回调都在主线程中通过 root.after 调用，可以直接操作Tk控件。
+    任务线程为守护线程，关闭窗口时不会等待进行中的网络请求。
+    """
+
+    def __init__(self, root, poll_interval=50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.current_job = None
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._polling = False
+
+    def submit(self, func, on_success, on_error=None, on_progress=None, on_cancel=None):
+        """提交任务
+
+        func(token, report_progress) 在新的后台线程中执行，report_progress(fraction, message)
+        报告进度；返回值交给 on_success(result)。
+        """
+        self.cancel()
+
+        job = BackgroundJob(next(self._ids), CancelToken(), on_success,
+                            on_error, on_progress, on_cancel)
+
+        def report_progress(fraction, message=''):
+            job.progress.put((fraction, message))
+
+        def run():
+            job.token.raise_if_cancelled()
+            return func(job.token, report_progress)
+
+        job.future = Future()
+        self.current_job = job
+        threading.Thread(target=self._run_job, args=(job.future, run),
+                         name=f'diagram-job-{job.job_id}', daemon=True).start()
+        self._schedule_poll()
+        return job
+
+    def cancel(self):
+        """取消当前任务"""
+        job = self.current_job
+        if job is None:
+            return
+        job.cancel()
+        self.current_job = None
+        if job.on_cancel:
+            job.on_cancel()
+
+    @property
+    def busy(self):
+        """是否有正在执行的任务"""
+        return self.current_job is not None
+
+    def shutdown(self):
+        """取消当前任务（仍在执行的任务线程结束后自行退出）"""
+        self.cancel()
+
+    @staticmethod
+    def _run_job(future, run):
+        """任务线程：执行任务并把结果写入 future"""
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(run())
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _schedule_poll(self):
+        """启动轮询（已在轮询时不重复启动）"""
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """在主线程中分发进度和结果"""
+        job = self.current_job
+        if job is None:
+            self._polling = False
+            return
+
+        while True:
+            try:
+                fraction, message = job.progress.get_nowait()
+            except queue.Empty:
+                break
+            if job.on_progress:
+                job.on_progress(fraction, message)
+
+        if not job.future.done():
+            self.root.after(self.poll_interval, self._poll)
+            return
+
+        self._polling = False
+        self.current_job = None
+        # 已被新任务取代的任务结果直接丢弃
+        if job.token.cancelled:
+            return
+
+        error = job.future.exception()
+        if error is None:
+            job.on_success(job.future.result())
+        elif isinstance(error, JobCancelled):
+            return
+        elif job.on_error:
+            job.on_error(error)
+        else:
+            raise error
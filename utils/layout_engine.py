@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+布局引擎模块
+Sugiyama式分层布局：分层、重心法减少交叉、按父子关系居中并保证最小间距，
+布局范围根据节点数量自动计算，可处理数千个节点的法条树；
+力导向布局：NumPy向量化计算，斥力按网格近邻截断，适合数千节点的概念网络
+"""
+
+import numpy as np
+
+
+class LayeredLayout:
+    """分层布局引擎
+
+    1. 分层：优先使用节点的level，否则按最长路径分层（环中的边会被忽略）
+    2. 排序：上下交替扫描，按相邻层邻居的重心排序以减少连线交叉
+    3. 定位：父节点居中于子节点上方、子节点靠近父节点，同层节点保持最小间距
+
+    每轮扫描是 O(E + n log n)，适合数千个节点的层级图。
+    """
+
+    def __init__(self, node_width=2.4, node_height=1.0, h_gap=0.6, v_gap=1.0,
+                 sweeps=4, rounds=3):
+        self.node_width = node_width
+        self.node_height = node_height
+        self.h_gap = h_gap
+        self.v_gap = v_gap
+        self.sweeps = sweeps
+        self.rounds = rounds
+
+    def layout(self, node_ids, edges, levels=None):
+        """计算节点位置
+
+        node_ids: 节点ID列表；edges: (from_id, to_id) 列表；
+        levels: 可选的 {节点ID: 层级}，传入时按层级分层、不再按连线分层（按行号编号的
+        level 不代表层级关系，调用方只在没有连接关系时传入）。返回 {节点ID: (x, y)}，第一层在最上方。
+        """
+        node_ids = list(dict.fromkeys(node_ids))
+        if not node_ids:
+            return {}
+
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        edge_pairs = [(index[a], index[b]) for a, b in edges
+                      if a in index and b in index and a != b]
+
+        ranks = self._assign_ranks(node_ids, edge_pairs, levels)
+        upper, lower = self._neighbors(len(node_ids), edge_pairs, ranks)
+        layers = self._order_layers(ranks, upper, lower)
+        xs = self._assign_x(layers, upper, lower, len(node_ids))
+
+        layer_height = self.node_height + self.v_gap
+        positions = {}
+        for rank, layer in enumerate(layers):
+            y = -rank * layer_height
+            for i in layer:
+                positions[node_ids[i]] = (float(xs[i]), y)
+        return positions
+
+    def extents(self, positions, margin=1.0):
+        """根据节点位置计算坐标轴范围 (xmin, xmax, ymin, ymax)"""
+        return layout_extents(positions, self.node_width / 2 + margin,
+                              self.node_height / 2 + margin)
+
+    def _assign_ranks(self, node_ids, edge_pairs, levels):
+        """分层，返回每个节点的层号（从0开始连续编号）"""
+        n = len(node_ids)
+        if levels:
+            raw = [levels.get(node_id, 0) for node_id in node_ids]
+            order = {level: rank for rank, level in enumerate(sorted(set(raw)))}
+            return [order[level] for level in raw]
+
+        # 最长路径分层（Kahn拓扑排序），遇到环时按输入顺序强制断开
+        successors = [[] for _ in range(n)]
+        in_degree = [0] * n
+        for a, b in edge_pairs:
+            successors[a].append(b)
+            in_degree[b] += 1
+
+        ranks = [0] * n
+        done = [False] * n
+        queue = [i for i in range(n) if in_degree[i] == 0]
+        next_unvisited = 0
+        processed = 0
+        while processed < n:
+            if not queue:
+                while done[next_unvisited]:
+                    next_unvisited += 1
+                queue.append(next_unvisited)
+            i = queue.pop()
+            if done[i]:
+                continue
+            done[i] = True
+            processed += 1
+            for j in successors[i]:
+                if done[j]:
+                    continue
+                ranks[j] = max(ranks[j], ranks[i] + 1)
+                in_degree[j] -= 1
+                if in_degree[j] == 0:
+                    queue.append(j)
+        return ranks
+
+    @staticmethod
+    def _neighbors(n, edge_pairs, ranks):
+        """按层级方向拆分邻居：upper为上方各层的邻居，lower为下方各层的邻居"""
+        upper = [[] for _ in range(n)]
+        lower = [[] for _ in range(n)]
+        for a, b in edge_pairs:
+            if ranks[a] < ranks[b]:
+                upper[b].append(a)
+                lower[a].append(b)
+            elif ranks[b] < ranks[a]:
+                upper[a].append(b)
+                lower[b].append(a)
+        return upper, lower
+
+    def _order_layers(self, ranks, upper, lower):
+        """重心法排序，上下交替扫描"""
+        layers = [[] for _ in range(max(ranks) + 1)]
+        for i, rank in enumerate(ranks):
+            layers[rank].append(i)
+
+        # 节点在本层中的相对位置（0~1），不同宽度的层之间可以比较
+        position = [0.0] * len(ranks)
+
+        def update(layer):
+            size = len(layer)
+            for k, i in enumerate(layer):
+                position[i] = (k + 0.5) / size
+
+        for layer in layers:
+            update(layer)
+
+        for sweep in range(self.sweeps):
+            downward = sweep % 2 == 0
+            sequence = layers[1:] if downward else layers[-2::-1]
+            neighbors = upper if downward else lower
+            for layer in sequence:
+                keys = {}
+                for i in layer:
+                    adjacent = neighbors[i]
+                    if adjacent:
+                        keys[i] = sum(position[j] for j in adjacent) / len(adjacent)
+                    else:
+                        keys[i] = position[i]
+                layer.sort(key=keys.__getitem__)
+                update(layer)
+        return layers
+
+    def _assign_x(self, layers, upper, lower, n):
+        """横坐标：向邻居重心靠拢，同层保持最小间距"""
+        separation = self.node_width + self.h_gap
+        xs = np.zeros(n)
+        for layer in layers:
+            xs[layer] = (np.arange(len(layer)) - (len(layer) - 1) / 2) * separation
+
+        for _ in range(self.rounds):
+            # 自上而下：子节点靠近父节点；自下而上：父节点居中于子节点
+            for layer in layers[1:]:
+                self._place_layer(layer, upper, xs, separation)
+            for layer in layers[-2::-1]:
+                self._place_layer(layer, lower, xs, separation)
+
+        # 整体居中到0
+        xs -= (xs.min() + xs.max()) / 2
+        return xs
+
+    @staticmethod
+    def _place_layer(layer, neighbors, xs, separation):
+        """把一层节点移向期望位置，同时满足最小间距约束
+
+        向右推和向左推各得到一组满足间距的解，取平均后仍满足约束，
+        且不会整体偏向一侧。两次推挤都是前缀最大/最小值，可以向量化。
+        """
+        if not layer:
+            return
+        desired = np.array([
+            xs[neighbors[i]].mean() if neighbors[i] else xs[i]
+            for i in layer
+        ])
+        steps = np.arange(len(layer)) * separation
+        shifted = desired - steps
+        pushed_right = np.maximum.accumulate(shifted) + steps
+        pushed_left = np.minimum.accumulate(shifted[::-1])[::-1] + steps
+        xs[layer] = (pushed_right + pushed_left) / 2
+
+
+class ForceLayout:
+    """力导向布局引擎（Fruchterman-Reingold）
+
+    引力沿连线计算；斥力按网格近似：近处的节点对精确计算，远处按格子的
+    质量中心整体计算，每轮迭代的主要开销是分桶排序，接近 O(n log n)，
+    而不是两两计算的 O(n²)。收敛后再推开仍然重叠的节点。
+    相同的 seed 得到相同的布局。
+    """
+
+    def __init__(self, ideal_length=3.0, iterations=60, seed=0, cutoff=2.0,
+                 cell_capacity=4, max_grid=32, gravity=0.05, node_radius=1.0):
+        self.ideal_length = ideal_length
+        self.iterations = iterations
+        self.seed = seed
+        self.cutoff = cutoff
+        self.cell_capacity = cell_capacity
+        self.max_grid = max_grid
+        self.gravity = gravity
+        self.node_radius = node_radius
+
+    def layout(self, node_ids, edges):
+        """计算节点位置，返回 {节点ID: (x, y)}，布局中心在原点"""
+        node_ids = list(dict.fromkeys(node_ids))
+        n = len(node_ids)
+        if n == 0:
+            return {}
+        if n == 1:
+            return {node_ids[0]: (0.0, 0.0)}
+
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        pairs = np.array([(index[a], index[b]) for a, b in edges
+                          if a in index and b in index and a != b], dtype=np.intp)
+        pairs = pairs.reshape(-1, 2)
+
+        k = self.ideal_length
+        rng = np.random.default_rng(self.seed)
+        side = np.sqrt(n) * k
+        pos = rng.uniform(-side / 2, side / 2, size=(n, 2))
+
+        # 温度从布局边长的1/10降到1/10000
+        temperature = side / 10
+        cooling = 0.001 ** (1 / max(self.iterations, 1))
+        for _ in range(self.iterations):
+            displacement = self._repulsion(pos, k)
+
+            # 引力：沿连线方向，大小为 d²/k
+            if len(pairs):
+                delta = pos[pairs[:, 0]] - pos[pairs[:, 1]]
+                distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1e-9)
+                force = delta * (distance / k)[:, None]
+                for axis in (0, 1):
+                    displacement[:, axis] -= np.bincount(pairs[:, 0], force[:, axis], minlength=n)
+                    displacement[:, axis] += np.bincount(pairs[:, 1], force[:, axis], minlength=n)
+
+            # 向心力，避免不连通的部分无限远离
+            displacement -= self.gravity * pos
+
+            # 每轮位移不超过当前温度
+            length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 1e-9)
+            pos += displacement * (np.minimum(length, temperature) / length)[:, None]
+            temperature *= cooling
+
+        self._remove_overlaps(pos)
+        pos -= (pos.min(axis=0) + pos.max(axis=0)) / 2
+        return {node_id: (float(pos[i, 0]), float(pos[i, 1]))
+                for i, node_id in enumerate(node_ids)}
+
+    def extents(self, positions, margin=1.0):
+        """根据节点位置计算坐标轴范围 (xmin, xmax, ymin, ymax)"""
+        half = self.node_radius + margin
+        return layout_extents(positions, half, half)
+
+    def _repulsion(self, pos, k):
+        """网格近似斥力，大小为 k²/d
+
+        节点按网格分桶（每格约 cell_capacity 个节点、每边不超过 max_grid 格，格子边长
+        不小于 cutoff*k）：近场为相邻9格内的全部节点对，精确计算；远场为相邻9格以外的
+        格子，按格子的质量中心整体计算（一层的Barnes-Hut近似）。两部分互不重叠，
+        每个节点对只计算一次。
+        节点少、不足3×3格时只计算距离小于 cutoff*k 的节点对。
+        """
+        n = len(pos)
+        grid = int(np.clip(np.sqrt(n / self.cell_capacity), 1, self.max_grid))
+        extent = float((pos.max(axis=0) - pos.min(axis=0)).max())
+        cell_size = max(extent / grid, self.cutoff * k)
+        if extent < 2 * cell_size:
+            return self._near_repulsion(pos, k, self.cutoff * k)
+
+        # 分格方式与 _near_pairs 相同，近场恰好是相邻9格
+        displacement = self._near_repulsion(pos, k, cell_size, within=False)
+        cells = np.floor(pos / cell_size).astype(np.int64)
+        cells -= cells.min(axis=0)
+        width = int(cells[:, 0].max()) + 1
+        keys, cell_index = np.unique(cells[:, 1] * width + cells[:, 0], return_inverse=True)
+        cell_index = cell_index.ravel()
+        mass = np.bincount(cell_index).astype(float)
+        centers = np.stack([np.bincount(cell_index, pos[:, 0]),
+                            np.bincount(cell_index, pos[:, 1])], axis=1) / mass[:, None]
+
+        delta = centers[:, None, :] - centers[None, :, :]
+        distance_sq = np.maximum((delta ** 2).sum(axis=2), 1e-6)
+        weight = mass[None, :] * k * k / distance_sq
+        # 相邻9格（含本格）已由近场计算
+        cell_x, cell_y = keys % width, keys // width
+        adjacent = (np.abs(cell_x[:, None] - cell_x[None, :]) <= 1) & \
+            (np.abs(cell_y[:, None] - cell_y[None, :]) <= 1)
+        weight[adjacent] = 0.0
+        cell_force = np.einsum('ijk,ij->ik', delta, weight)
+        displacement += cell_force[cell_index]
+        return displacement
+
+    def _near_repulsion(self, pos, k, radius, within=True):
+        """近场斥力：距离小于 radius 的节点对（within=False 时为相邻9格内的全部节点对）"""
+        n = len(pos)
+        source, delta, distance_sq = self._near_pairs(pos, radius, within)
+        force = delta * (k * k / distance_sq)[:, None]
+        displacement = np.zeros_like(pos)
+        displacement[:, 0] = np.bincount(source, force[:, 0], minlength=n)
+        displacement[:, 1] = np.bincount(source, force[:, 1], minlength=n)
+        return displacement
+
+    def _remove_overlaps(self, pos, passes=20):
+        """力导向收敛后仍可能有节点重叠，把距离过近的节点对沿连线推开"""
+        n = len(pos)
+        min_distance = 2 * self.node_radius * 1.1
+        for _ in range(passes):
+            source, delta, distance_sq = self._near_pairs(pos, min_distance)
+            if len(source) == 0:
+                break
+            distance = np.sqrt(distance_sq)
+            # 每个节点对会出现两次，各自移动重叠量的一半
+            shift = delta * ((min_distance - distance) / (2 * distance))[:, None]
+            pos[:, 0] += np.bincount(source, shift[:, 0], minlength=n)
+            pos[:, 1] += np.bincount(source, shift[:, 1], minlength=n)
+
+    @staticmethod
+    def _near_pairs(pos, radius, within=True):
+        """找出距离小于 radius 的全部有序节点对
+
+        节点按边长 radius 的网格分桶，只在相邻9格内配对，within=False 时不按距离筛选，
+        返回 (源节点, 源减目标的坐标差, 距离平方)。
+        """
+        n = len(pos)
+        cells = np.floor(pos / radius).astype(np.int64)
+        cells -= cells.min(axis=0)
+        # 四周留一圈空格子，相邻格子的编号不会越界串行
+        width = int(cells[:, 0].max()) + 3
+        cell_keys = (cells[:, 1] + 1) * width + cells[:, 0] + 1
+
+        order = np.argsort(cell_keys, kind='stable')
+        sorted_keys = cell_keys[order]
+        sources, deltas, distances = [], [], []
+
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                # 找出每个节点相邻格子中的全部节点，展开为节点对
+                neighbor_keys = cell_keys + dy * width + dx
+                start = np.searchsorted(sorted_keys, neighbor_keys, side='left')
+                end = np.searchsorted(sorted_keys, neighbor_keys, side='right')
+                counts = end - start
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                source = np.repeat(np.arange(n), counts)
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                target = order[np.repeat(start, counts) + offsets]
+
+                mask = source != target
+                source, target = source[mask], target[mask]
+                delta = pos[source] - pos[target]
+                # 避免重合节点除零
+                distance_sq = np.maximum(np.einsum('ij,ij->i', delta, delta), 1e-6)
+                if not within:
+                    sources.append(source)
+                    deltas.append(delta)
+                    distances.append(distance_sq)
+                    continue
+                near = distance_sq < radius * radius
+                sources.append(source[near])
+                deltas.append(delta[near])
+                distances.append(distance_sq[near])
+
+        if not sources:
+            return np.zeros(0, dtype=np.intp), np.zeros((0, 2)), np.zeros(0)
+        return np.concatenate(sources), np.concatenate(deltas), np.concatenate(distances)
+
+
+def layout_extents(positions, half_width, half_height):
+    """根据节点位置和节点半宽、半高计算坐标轴范围 (xmin, xmax, ymin, ymax)"""
+    if not positions:
+        return -1.0, 1.0, -1.0, 1.0
+    coords = np.array(list(positions.values()), dtype=float)
+    return (coords[:, 0].min() - half_width, coords[:, 0].max() + half_width,
+            coords[:, 1].min() - half_height, coords[:, 1].max() + half_height)
+
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时预览模块
+编辑文本时把新场景与上一次的场景比较，只增删或移动发生变化的图形对象，
+配合防抖合并连续输入，几百个节点的图表也能随输入即时刷新
+"""
+
+from scene_drawer import PatchDrawer, node_label, finish_axes
+
+# 图形元素不超过该数量时界面画布逐个绘制图形，支持增量更新和拖动节点
+INTERACTIVE_LIMIT = 2000
+
+
+def node_style(node):
+    """节点图形的样式，相同时只需移动原有图形"""
+    return (node.shape, node.width, node.height, node.facecolor, node.edgecolor,
+            node.linewidth, node.pad)
+
+
+def edge_signature(edge):
+    """连线的完整描述，相同的连线直接保留原有图形"""
+    return (tuple(edge.points), edge.arrowstyle, edge.color, edge.linewidth,
+            edge.linestyle, edge.rad, edge.label, edge.label_offset)
+
+
+def remove_artists(*artists):
+    """从坐标轴上移除图形对象（忽略None）"""
+    for artist in artists:
+        if artist is not None:
+            artist.remove()
+
+
+class LivePreview:
+    """增量维护坐标轴上的场景图形
+
+    节点按ID对应：样式不变时移动原有图形、原地更新文字，样式变化时只替换该节点；
+    连线按完整描述对应，相同的保留，其余删除或新增。坐标轴被其他代码清空或
+    整体重绘后需要调用 reset()，下次 update() 会重新绘制全部图形。
+    """
+
+    def __init__(self, ax, drawer=None):
+        self.ax = ax
+        self.drawer = drawer or PatchDrawer()
+        self.reset()
+
+    def reset(self):
+        """丢弃已记录的图形，下次更新时清空坐标轴重新绘制"""
+        self.nodes = {}
+        self.edges = {}
+        self.view = None
+        self.valid = False
+        # 拖动后连线的描述已改变，下次更新前需要重新分组
+        self._moved = False
+
+    def update(self, scene):
+        """把坐标轴更新为 scene，返回各类变更的数量"""
+        stats = {'added': 0, 'removed': 0, 'moved': 0, 'changed': 0, 'kept': 0}
+        if not self.valid:
+            self.ax.clear()
+            self.valid = True
+
+        self.update_nodes(scene.nodes, stats)
+        self.update_edges(scene.edges, stats)
+
+        view = (scene.title, scene.xlim, scene.ylim)
+        if view != self.view:
+            finish_axes(self.ax, scene)
+            self.view = view
+        return stats
+
+    def update_nodes(self, nodes, stats):
+        """按节点ID比较；同一ID出现多次时按出现顺序区分"""
+        previous_nodes, self.nodes = self.nodes, {}
+        occurrences = {}
+
+        for node in nodes:
+            key = (node.node_id, occurrences.get(node.node_id, 0))
+            occurrences[node.node_id] = key[1] + 1
+
+            entry = previous_nodes.pop(key, None)
+            if entry is None:
+                self.nodes[key] = (node,) + self.drawer.draw_node(self.ax, node)
+                stats['added'] += 1
+                continue
+
+            previous, patch, text = entry
+            moved = (previous.x, previous.y) != (node.x, node.y)
+            if node_style(previous) != node_style(node):
+                patch.remove()
+                patch = self.drawer.node_patch(node)
+                self.ax.add_patch(patch)
+                stats['changed'] += 1
+            elif moved:
+                self.drawer.move_patch(patch, node)
+                stats['moved'] += 1
+            elif (previous.text, previous.fontsize, previous.fontweight) != \
+                    (node.text, node.fontsize, node.fontweight):
+                stats['changed'] += 1
+            else:
+                stats['kept'] += 1
+
+            self.nodes[key] = (node, patch, self.update_text(text, previous, node))
+
+        for _, patch, text in previous_nodes.values():
+            remove_artists(patch, text)
+            stats['removed'] += 1
+
+    def update_text(self, text, previous, node):
+        """原地更新节点文字，返回新的文字对象"""
+        if not node.text:
+            remove_artists(text)
+            return None
+        if text is None:
+            return node_label(self.ax, node)
+
+        if node.text != previous.text:
+            text.set_text(node.text)
+        if (node.x, node.y) != (previous.x, previous.y):
+            text.set_position((node.x, node.y))
+        if node.fontsize != previous.fontsize:
+            text.set_fontsize(node.fontsize)
+        if node.fontweight != previous.fontweight:
+            text.set_fontweight(node.fontweight)
+        return text
+
+    def update_edges(self, edges, stats):
+        """相同描述的连线保留，其余删除或新增"""
+        if self._moved:
+            self.regroup_edges()
+        previous_edges, self.edges = self.edges, {}
+
+        for edge in edges:
+            signature = edge_signature(edge)
+            reusable = previous_edges.get(signature)
+            if reusable:
+                _, line, label = reusable.pop()
+                stats['kept'] += 1
+            else:
+                line, label = self.drawer.draw_edge(self.ax, edge)
+                stats['added'] += 1
+            self.edges.setdefault(signature, []).append((edge, line, label))
+
+        for group in previous_edges.values():
+            for _, line, label in group:
+                remove_artists(line, label)
+                stats['removed'] += 1
+
+    def regroup_edges(self):
+        """按连线当前的描述重新分组"""
+        entries = [entry for group in self.edges.values() for entry in group]
+        self.edges = {}
+        for entry in entries:
+            self.edges.setdefault(edge_signature(entry[0]), []).append(entry)
+        self._moved = False
+
+    def node_at(self, event):
+        """鼠标事件所在的节点键，后绘制的节点优先；没有时返回None"""
+        for key in reversed(list(self.nodes)):
+            if self.nodes[key][1].contains(event)[0]:
+                return key
+        return None
+
+    def incident_edges(self, node_id):
+        """端点连着该节点的连线，返回 (连线, 线条, 标签) 列表"""
+        return [entry for group in self.edges.values() for entry in group
+                if node_id in (entry[0].source, entry[0].target)]
+
+    def move_node(self, key, x, y, incident=None):
+        """移动节点及其连线的图形，返回被修改的图形对象
+
+        incident 为 incident_edges 的结果，拖动时可以预先计算好重复使用。
+        """
+        node, patch, text = self.nodes[key]
+        deltas = {node.node_id: (x - node.x, y - node.y)}
+        node.x, node.y = x, y
+        self.drawer.move_patch(patch, node)
+        artists = [patch]
+        if text is not None:
+            text.set_position((x, y))
+            artists.append(text)
+
+        if incident is None:
+            incident = self.incident_edges(node.node_id)
+        for edge, line, label in incident:
+            edge.follow(deltas)
+            self.drawer.move_edge(line, label, edge)
+            artists.extend(artist for artist in (line, label) if artist is not None)
+        self._moved = True
+        return artists
+
+    @property
+    def artist_count(self):
+        """当前记录的节点和连线数量"""
+        return len(self.nodes) + sum(len(group) for group in self.edges.values())
+
+
+class Debouncer:
+    """防抖：连续触发时只在最后一次触发 delay 毫秒后执行一次
+
+    通过 Tk 的 after 调度，回调始终在主线程执行。
+    """
+
+    def __init__(self, root, delay, callback):
+        self.root = root
+        self.delay = delay
+        self.callback = callback
+        self._after_id = None
+
+    def trigger(self):
+        """重新开始计时"""
+        self.cancel()
+        self._after_id = self.root.after(self.delay, self._fire)
+
+    def cancel(self):
+        """取消尚未执行的回调"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def flush(self):
+        """有待执行的回调时立即执行"""
+        if self._after_id is not None:
+            self.cancel()
+            self.callback()
+
+    @property
+    def pending(self):
+        return self._after_id is not None
+
+    def _fire(self):
+        self._after_id = None
+        self.callback()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行渲染模块
+使用进程池将批量渲染任务分发到多个CPU核心；渲染缓存只由主进程读写，
+工作进程只渲染未命中的任务
+"""
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from diagram_renderer import DiagramRenderer
+from render_cache import RenderCache
+
+# 每个工作进程内预热好的渲染器（字体、模板和Figure只加载一次）
+_worker_renderer = None
+
+
+def _init_worker(template_dir, dpi, figsize):
+    """工作进程初始化：加载模板并预热渲染器"""
+    global _worker_renderer
+    _worker_renderer = DiagramRenderer(template_dir=template_dir, dpi=dpi, figsize=figsize)
+    _worker_renderer.warm_up()
+
+
+def _render_job(job):
+    """在工作进程中渲染单个任务，异常只影响当前任务
+
+    任务带有主进程解析好的 parsed 和 template_def 时直接渲染，并把图片字节
+    交回主进程写入缓存。
+    """
+    if job.get('error'):
+        return _job_result(job, False, error=job['error'])
+    try:
+        if 'parsed' in job:
+            image_bytes = _worker_renderer.render_data(job['parsed'], job['template_def'],
+                                                       job.get('format', 'png'))
+            return _job_result(job, True, data=image_bytes, size=len(image_bytes))
+        image_bytes = _worker_renderer.render(job['text'], job['template'],
+                                              job.get('format', 'png'))
+        output_path = job.get('output_path')
+        if output_path:
+            # 直接在工作进程中写文件，避免图片字节回传主进程
+            with open(output_path, 'wb') as f:
+                f.write(image_bytes)
+            return _job_result(job, True, size=len(image_bytes))
+        return _job_result(job, True, data=image_bytes, size=len(image_bytes))
+    except Exception as e:
+        return _job_result(job, False, error=f"{type(e).__name__}: {e}")
+
+
+def _job_result(job, ok, data=None, size=0, error=None):
+    """构造任务结果"""
+    return {
+        'name': job.get('name'),
+        'ok': ok,
+        'data': data,
+        'size': size,
+        'output_path': job.get('output_path'),
+        'error': error
+    }
+
+
+class ParallelRenderer:
+    """基于进程池的批量渲染器，按输入顺序返回结果
+
+    指定 cache_dir 时由主进程解析文本、查询缓存，命中的任务直接返回，
+    未命中的任务交给工作进程渲染后再由主进程写入缓存。磁盘缓存只有
+    一个使用者，容量上限和LRU顺序与串行渲染一致。
+    """
+
+    def __init__(self, workers=None, template_dir='templates', dpi=300,
+                 figsize=(14, 10), max_pending=None, cache_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.template_dir = template_dir
+        self.dpi = dpi
+        self.figsize = figsize
+        # 同时在途的任务数上限，保证海量任务时内存有界
+        self.max_pending = max_pending or self.workers * 4
+        self.cache = RenderCache(cache_dir) if cache_dir else None
+        # 主进程中只用于查找模板和解析文本，不绘图
+        self._renderer = (DiagramRenderer(template_dir=template_dir, dpi=dpi, figsize=figsize)
+                          if self.cache is not None else None)
+        self._executor = None
+
+    def _create_executor(self):
+        """创建进程池"""
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   initializer=_init_worker,
+                                   initargs=(self.template_dir, self.dpi, self.figsize))
+
+    def render_batch(self, jobs):
+        """渲染任务序列，按输入顺序逐个产生结果
+
+        jobs 中每个任务为字典：text、template、format（可选）、name（可选）、
+        output_path（可选，指定时由工作进程直接写文件）、error（可选，输入无效时
+        直接记为失败）
+        """
+        self._executor = self._create_executor()
+        pending = deque()
+        try:
+            for job in jobs:
+                pending.append(self._submit(job))
+                if len(pending) >= self.max_pending:
+                    yield self._collect(pending)
+            while pending:
+                yield self._collect(pending)
+        finally:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _submit(self, job):
+        """提交任务，返回 (任务, Future)；缓存命中时不经过工作进程"""
+        if self.cache is None or job.get('error'):
+            return job, self._executor.submit(_render_job, job)
+
+        fmt = job.get('format', 'png')
+        try:
+            template = self._renderer.get_template(job['template'])
+            parsed = self._renderer.parse_text_content(job['text'])
+        except Exception:
+            # 模板不存在等错误交给工作进程，得到与不使用缓存时相同的结果
+            return job, self._executor.submit(_render_job, job)
+
+        job = dict(job, parsed=parsed, template_def=template,
+                   cache_key=RenderCache.make_key(parsed, template, fmt, self.dpi,
+                                                  figsize=self.figsize))
+        cached = self.cache.get(job['cache_key'])
+        if cached is None:
+            return job, self._executor.submit(_render_job, job)
+
+        job['cached'] = True
+        future = Future()
+        future.set_result(_job_result(job, True, data=cached, size=len(cached)))
+        return job, future
+
+    def _finish(self, job, result):
+        """缓存新渲染的结果，指定了 output_path 时写文件，图片字节不再返回"""
+        if 'cache_key' not in job or not result['ok']:
+            return result
+        if not job.get('cached'):
+            self.cache.put(job['cache_key'], result['data'])
+        output_path = job.get('output_path')
+        if output_path:
+            try:
+                with open(output_path, 'wb') as f:
+                    f.write(result['data'])
+            except OSError as e:
+                return _job_result(job, False, error=f"{type(e).__name__}: {e}")
+            return _job_result(job, True, size=result['size'])
+        return result
+
+    def _collect(self, pending):
+        """取出最早提交的任务结果；进程崩溃时单独重试该任务以定位出错任务"""
+        job, future = pending.popleft()
+        try:
+            return self._finish(job, future.result())
+        except BrokenProcessPool:
+            self._reset_executor()
+            try:
+                result = self._executor.submit(_render_job, job).result()
+            except BrokenProcessPool:
+                self._reset_executor()
+                result = _job_result(job, False, error="工作进程异常退出")
+            self._resubmit(pending)
+            return self._finish(job, result)
+
+    def _reset_executor(self):
+        """重建进程池"""
+        self._executor.shutdown(cancel_futures=True)
+        self._executor = self._create_executor()
+
+    def _resubmit(self, pending):
+        """重新提交进程池崩溃时尚未成功完成的任务"""
+        for i in range(len(pending)):
+            job, future = pending[i]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                continue
+            pending[i] = (job, self._executor.submit(_render_job, job))
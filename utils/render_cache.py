@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染缓存模块
+按内容寻址缓存渲染结果：内存LRU + 磁盘两级，相同输入直接返回已渲染的字节
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 缓存键格式版本，绘制逻辑变化导致输出不同时递增
+CACHE_VERSION = 6
+
+# 不影响渲染结果的模板字段，不参与缓存键计算
+NON_RENDER_FIELDS = ('name', 'description', 'default_text')
+
+
+class RenderCache:
+    """两级渲染缓存，内存和磁盘都按字节数上限做LRU淘汰"""
+
+    def __init__(self, cache_dir=None, max_memory_bytes=64 * 1024 * 1024,
+                 max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._scan_disk()
+
+    @staticmethod
+    def make_key(data, template, fmt, dpi, template_type=None, figsize=(14, 10), batched=None):
+        """根据解析数据、模板定义、输出格式、分辨率和绘制方式计算缓存键"""
+        template_def = {k: v for k, v in (template or {}).items() if k not in NON_RENDER_FIELDS}
+        payload = {
+            'version': CACHE_VERSION,
+            'data': data,
+            'template': template_def,
+            'type': template_type or template_def.get('type'),
+            'format': fmt.lower(),
+            'dpi': dpi,
+            'figsize': list(figsize),
+            'batched': batched
+        }
+        normalized = json.dumps(payload, sort_keys=True, ensure_ascii=False,
+                                separators=(',', ':'), default=str)
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """读取缓存，未命中返回None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return data
+
+            if key in self._disk:
+                try:
+                    with open(self._disk_path(key), 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    self._disk_bytes -= self._disk.pop(key)
+                    data = None
+
+                if data is not None:
+                    self._disk.move_to_end(key)
+                    self._touch(key)
+                    self._put_memory(key, data)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return data
+
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """写入缓存"""
+        with self._lock:
+            self._put_memory(key, data)
+            if self.cache_dir:
+                self._put_disk(key, data)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for key in list(self._disk):
+                self._remove_disk(key)
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes
+            }
+
+    def _put_memory(self, key, data):
+        """写入内存LRU，超出上限时淘汰最久未使用的条目"""
+        if len(data) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def _put_disk(self, key, data):
+        """写入磁盘缓存（先写临时文件再原子替换）"""
+        if len(data) > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        if key in self._disk:
+            self._disk_bytes -= self._disk.pop(key)
+        self._disk[key] = len(data)
+        self._disk_bytes += len(data)
+
+        while self._disk_bytes > self.max_disk_bytes:
+            oldest = next(iter(self._disk))
+            self._remove_disk(oldest)
+            self.evictions += 1
+
+    def _remove_disk(self, key):
+        """删除磁盘缓存条目"""
+        self._disk_bytes -= self._disk.pop(key)
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _disk_path(self, key):
+        """缓存文件路径，按键前两位分目录"""
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _touch(self, key):
+        """更新文件访问时间，重启后仍能恢复LRU顺序"""
+        try:
+            os.utime(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _scan_disk(self):
+        """启动时扫描磁盘缓存，按修改时间恢复LRU顺序"""
+        entries = []
+        for sub_dir in os.scandir(self.cache_dir):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
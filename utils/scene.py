@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+场景模块
+绘图方法先把节点和连线描述为场景，再交给绘制器输出，
+同一场景既可以逐个生成matplotlib图形，也可以批量生成集合
+"""
+
+
+class SceneNode:
+    """场景中的节点
+
+    shape 为 'box'（圆角矩形）、'circle' 或 'diamond'；width/height 为节点主体尺寸，
+    圆角矩形另加 pad 的外边距，与 FancyBboxPatch 的 round,pad 一致。
+    """
+
+    def __init__(self, node_id, shape, x, y, width, height, text='', facecolor='#87CEEB',
+                 edgecolor='black', linewidth=2, fontsize=10, fontweight='bold', pad=0.1):
+        self.node_id = node_id
+        self.shape = shape
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.text = text
+        self.facecolor = facecolor
+        self.edgecolor = edgecolor
+        self.linewidth = linewidth
+        self.fontsize = fontsize
+        self.fontweight = fontweight
+        self.pad = pad
+
+
+class SceneEdge:
+    """场景中的连线
+
+    points 为折线顶点，两个点时可以用 rad 弯曲（与 arc3 连接样式一致）；
+    arrowstyle 为 '->'、'<->' 或 '-'（'-' 表示不带箭头的折线）；
+    标签画在两端中点，label_offset 为纵向偏移。
+    source/target 为起点、终点所连节点的ID，节点移动时对应端点随之移动；
+    routing 为 'elbow' 时是先竖后横的三点折线，端点移动后重新计算拐点，保持横平竖直。
+    """
+
+    def __init__(self, points, arrowstyle='->', color='black', linewidth=2, linestyle='-',
+                 rad=0.0, label='', label_offset=0.0, source=None, target=None, routing=None):
+        self.points = [tuple(point) for point in points]
+        self.arrowstyle = arrowstyle
+        self.color = color
+        self.linewidth = linewidth
+        self.linestyle = linestyle
+        self.rad = rad
+        self.label = label
+        self.label_offset = label_offset
+        self.source = source
+        self.target = target
+        self.routing = routing
+
+    def follow(self, deltas):
+        """端点所连节点按 {节点ID: (dx, dy)} 移动时同步移动端点"""
+        if self.source in deltas:
+            dx, dy = deltas[self.source]
+            x, y = self.points[0]
+            self.points[0] = (x + dx, y + dy)
+        if self.target in deltas:
+            dx, dy = deltas[self.target]
+            x, y = self.points[-1]
+            self.points[-1] = (x + dx, y + dy)
+        if self.routing == 'elbow':
+            self.points[1] = (self.points[0][0], self.points[-1][1])
+
+
+class Scene:
+    """一张图表的全部节点、连线、标题和坐标范围"""
+
+    # 连线类型对应的箭头样式、线型和弯曲度，与 DrawingUtils.draw_advanced_arrow 一致
+    ARROW_STYLES = {
+        'simple': ('->', '-', 0.1),
+        'thick': ('->', '-', 0.1),
+        'double': ('<->', '-', 0.1),
+        'curved': ('->', '-', 0.2),
+        'dashed': ('->', '--', 0.1),
+        'dotted': ('->', ':', 0.1)
+    }
+
+    def __init__(self, title='', xlim=(-10, 10), ylim=(0, 12)):
+        self.title = title
+        self.xlim = tuple(xlim)
+        self.ylim = tuple(ylim)
+        self.nodes = []
+        self.edges = []
+
+    def add_node(self, node_id, shape, x, y, width, height, text='', **style):
+        """添加节点"""
+        node = SceneNode(node_id, shape, x, y, width, height, text, **style)
+        self.nodes.append(node)
+        return node
+
+    def add_edge(self, points, **style):
+        """添加连线"""
+        edge = SceneEdge(points, **style)
+        self.edges.append(edge)
+        return edge
+
+    def add_arrow(self, x1, y1, x2, y2, arrow_type='simple', color='black', linewidth=2,
+                  label='', source=None, target=None):
+        """按连线类型添加箭头，对应 DrawingUtils.draw_advanced_arrow"""
+        arrowstyle, linestyle, rad = self.ARROW_STYLES.get(arrow_type, ('->', '-', 0.1))
+        return self.add_edge([(x1, y1), (x2, y2)], arrowstyle=arrowstyle, color=color,
+                             linewidth=linewidth, linestyle=linestyle, rad=rad, label=label,
+                             label_offset=0.3 if arrow_type == 'curved' else 0.0,
+                             source=source, target=target)
+
+    def add_hierarchical_connection(self, parent_pos, child_pos, color='black', linewidth=2,
+                                    source=None, target=None):
+        """添加折线形的层次连接，对应 DrawingUtils.draw_hierarchical_connection"""
+        x1, y1 = parent_pos
+        x2, y2 = child_pos
+        self.add_edge([(x1, y1), (x1, y2), (x2, y2)], arrowstyle='-', color=color,
+                      linewidth=linewidth, source=source, target=target, routing='elbow')
+        # 箭头两端都贴着子节点
+        return self.add_edge([(x2 - 0.3, y2), (x2, y2)], arrowstyle='->', color=color,
+                             linewidth=linewidth, source=target, target=target)
+
+    def move_nodes(self, positions):
+        """按 {节点ID: (x, y)} 移动节点，连线端点随之移动，坐标范围扩展到包含移动后的节点"""
+        deltas = {}
+        for node in self.nodes:
+            if node.node_id in positions:
+                x, y = positions[node.node_id]
+                deltas[node.node_id] = (x - node.x, y - node.y)
+                node.x, node.y = x, y
+
+                margin_x = node.width / 2 + node.pad + 0.5
+                margin_y = node.height / 2 + node.pad + 0.5
+                self.xlim = (min(self.xlim[0], x - margin_x), max(self.xlim[1], x + margin_x))
+                self.ylim = (min(self.ylim[0], y - margin_y), max(self.ylim[1], y + margin_y))
+
+        if deltas:
+            for edge in self.edges:
+                edge.follow(deltas)
+
+    @property
+    def size(self):
+        """图形元素总数"""
+        return len(self.nodes) + len(self.edges)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+场景绘制模块
+PatchDrawer 为每个节点和连线生成独立的图形对象；BatchDrawer 用NumPy计算全部
+顶点，所有节点和连线合并为少量 PolyCollection / LineCollection，全部文字转为
+文字轮廓合并为 PathCollection，图形对象数量与节点数无关，适合大图
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import matplotlib
+import matplotlib.patches as patches
+from matplotlib.patches import FancyBboxPatch
+from matplotlib.collections import PolyCollection, LineCollection, PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.path import Path
+from matplotlib.text import Annotation
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+
+# 图形元素（节点+连线）超过该数量时自动使用批量绘制
+BATCH_THRESHOLD = 200
+
+# 与 annotate 默认箭头一致：箭头长4磅、半宽2磅，两端各收缩2磅
+ARROW_HEAD_LENGTH = 4.0
+ARROW_HEAD_WIDTH = 2.0
+ARROW_SHRINK = 2.0
+
+# 连线标签的字号和底框边距（以字号为单位），与 edge_label 一致
+EDGE_LABEL_SIZE = 8
+EDGE_LABEL_PAD = 0.2
+# 文字轮廓的行距（以字号为单位）；行中心约在基线上方0.35个字号
+LINE_SPACING = 1.2
+BASELINE_OFFSET = 0.35
+
+
+def finish_axes(ax, scene):
+    """设置坐标范围、标题并隐藏坐标轴"""
+    ax.set_xlim(*scene.xlim)
+    ax.set_ylim(*scene.ylim)
+    ax.set_title(scene.title, fontsize=16, fontweight='bold', pad=20)
+    ax.axis('off')
+
+
+def node_label(ax, node):
+    """绘制节点文字，没有文字时返回None"""
+    if not node.text:
+        return None
+    return ax.text(node.x, node.y, node.text, ha='center', va='center',
+                   fontsize=node.fontsize, fontweight=node.fontweight)
+
+
+def label_position(edge):
+    """连线标签的位置：两端中点加纵向偏移"""
+    (x1, y1), (x2, y2) = edge.points[0], edge.points[-1]
+    return (x1 + x2) / 2, (y1 + y2) / 2 + edge.label_offset
+
+
+def edge_label(ax, edge):
+    """绘制连线标签，没有标签时返回None"""
+    if not edge.label:
+        return None
+    x, y = label_position(edge)
+    return ax.text(x, y, edge.label, ha='center', va='center', fontsize=8,
+                   bbox=dict(boxstyle='round,pad=0.2', facecolor='white', alpha=0.8))
+
+
+def outline_bounds(path):
+    """文字轮廓顶点（含贝塞尔控制点）的范围，不逐段求曲线极值；CLOSEPOLY 的顶点不计入"""
+    vertices = path.vertices[path.codes != Path.CLOSEPOLY]
+    return vertices.min(axis=0), vertices.max(axis=0)
+
+
+@lru_cache(maxsize=4096)
+def label_path(text, fontsize, fontweight, families):
+    """文字轮廓（磅坐标，原点为文字中心），多行文字逐行水平居中"""
+    prop = FontProperties(family=list(families), weight=fontweight)
+    lines = text.split('\n')
+    paths = []
+    for k, line in enumerate(lines):
+        if not line.strip():
+            continue
+        path = TextPath((0, 0), line, size=fontsize, prop=prop)
+        if not len(path.vertices):
+            continue
+        (x0, _), (x1, _) = outline_bounds(path)
+        dx = -(x0 + x1) / 2
+        dy = ((len(lines) - 1) / 2 - k) * fontsize * LINE_SPACING - fontsize * BASELINE_OFFSET
+        paths.append(Path(path.vertices + (dx, dy), path.codes))
+    return Path.make_compound_path(*paths) if paths else None
+
+
+def label_box(path, pad):
+    """标签底框（磅坐标），四周留出 pad 磅"""
+    low, high = outline_bounds(path)
+    (x0, y0), (x1, y1) = low - pad, high + pad
+    return Path([(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)], closed=True)
+
+
+def draw_labels(ax, scene):
+    """绘制节点文字和连线标签"""
+    for node in scene.nodes:
+        node_label(ax, node)
+    for edge in scene.edges:
+        edge_label(ax, edge)
+
+
+class PatchDrawer:
+    """逐个生成图形对象，与原有绘制方式完全一致"""
+
+    def draw(self, ax, scene):
+        """绘制场景"""
+        for node in scene.nodes:
+            ax.add_patch(self.node_patch(node))
+
+        for edge in scene.edges:
+            self.edge_artist(ax, edge)
+
+        draw_labels(ax, scene)
+        finish_axes(ax, scene)
+
+    def draw_node(self, ax, node):
+        """绘制单个节点，返回 (图形, 文字)，供增量更新使用"""
+        patch = self.node_patch(node)
+        ax.add_patch(patch)
+        return patch, node_label(ax, node)
+
+    def draw_edge(self, ax, edge):
+        """绘制单条连线，返回 (线条或箭头, 标签)，供增量更新使用"""
+        return self.edge_artist(ax, edge), edge_label(ax, edge)
+
+    @staticmethod
+    def edge_artist(ax, edge):
+        """连线对应的图形对象：折线为 Line2D，两点箭头为 Annotation"""
+        if edge.arrowstyle == '-' or len(edge.points) > 2:
+            xs, ys = zip(*edge.points)
+            line, = ax.plot(xs, ys, color=edge.color, linewidth=edge.linewidth,
+                            linestyle=edge.linestyle)
+            return line
+        return ax.annotate('', xy=edge.points[-1], xytext=edge.points[0],
+                           arrowprops=dict(arrowstyle=edge.arrowstyle, lw=edge.linewidth,
+                                           color=edge.color,
+                                           connectionstyle=f'arc3,rad={edge.rad}',
+                                           linestyle=edge.linestyle))
+
+    @staticmethod
+    def node_patch(node):
+        """节点对应的图形对象"""
+        style = dict(facecolor=node.facecolor, edgecolor=node.edgecolor,
+                     linewidth=node.linewidth)
+        if node.shape == 'circle':
+            return patches.Circle((node.x, node.y), node.width / 2, **style)
+        if node.shape == 'diamond':
+            return patches.Polygon(PatchDrawer.diamond_vertices(node), **style)
+        return FancyBboxPatch((node.x - node.width / 2, node.y - node.height / 2),
+                              node.width, node.height,
+                              boxstyle=f"round,pad={node.pad}", **style)
+
+    @staticmethod
+    def diamond_vertices(node):
+        """菱形的四个顶点"""
+        half_w, half_h = node.width / 2, node.height / 2
+        return [(node.x - half_w, node.y), (node.x, node.y + half_h),
+                (node.x + half_w, node.y), (node.x, node.y - half_h)]
+
+    @staticmethod
+    def move_patch(patch, node):
+        """把 node_patch 生成的图形移动到节点的新位置"""
+        if isinstance(patch, patches.Circle):
+            patch.set_center((node.x, node.y))
+        elif isinstance(patch, patches.Polygon):
+            patch.set_xy(PatchDrawer.diamond_vertices(node))
+        else:
+            patch.set_x(node.x - node.width / 2)
+            patch.set_y(node.y - node.height / 2)
+
+    @staticmethod
+    def move_edge(artist, label, edge):
+        """把 draw_edge 生成的图形更新到连线的新端点"""
+        if isinstance(artist, Annotation):
+            artist.xy = edge.points[-1]
+            artist.set_position(edge.points[0])
+        else:
+            xs, ys = zip(*edge.points)
+            artist.set_data(xs, ys)
+        if label is not None:
+            label.set_position(label_position(edge))
+
+
+class BatchDrawer:
+    """批量绘制：每种节点形状一个 PolyCollection，全部连线和箭头一个 LineCollection，
+    全部文字一个 PathCollection（有连线标签时底框再加一个）"""
+
+    def __init__(self, corner_steps=5, circle_steps=48, curve_steps=16):
+        self.corner_steps = corner_steps
+        self.circle_steps = circle_steps
+        self.curve_steps = curve_steps
+
+    def draw(self, ax, scene):
+        """绘制场景"""
+        # 箭头尺寸以磅为单位，需要先确定坐标范围才能换算
+        finish_axes(ax, scene)
+
+        for shape in ('box', 'circle', 'diamond'):
+            nodes = [node for node in scene.nodes if node.shape == shape]
+            if nodes:
+                ax.add_collection(self.node_collection(shape, nodes), autolim=False)
+
+        if scene.edges:
+            ax.add_collection(self.edge_collection(ax, scene), autolim=False)
+
+        for collection in self.label_collections(ax, scene):
+            ax.add_collection(collection, autolim=False)
+
+    @staticmethod
+    def label_collections(ax, scene):
+        """全部节点文字和连线标签合并为一个文字轮廓 PathCollection，连线标签的底框另为一个
+
+        轮廓以磅为单位、按数据坐标偏移到文字中心，与 ax.text 一样不随坐标范围缩放；
+        相同文字的轮廓只生成一次。
+        """
+        families = tuple(matplotlib.rcParams['font.sans-serif'])
+        paths, offsets, boxes, box_offsets = [], [], [], []
+        for node in scene.nodes:
+            if node.text:
+                path = label_path(node.text, node.fontsize, node.fontweight, families)
+                if path is not None:
+                    paths.append(path)
+                    offsets.append((node.x, node.y))
+        for edge in scene.edges:
+            if edge.label:
+                path = label_path(edge.label, EDGE_LABEL_SIZE, 'normal', families)
+                if path is not None:
+                    position = label_position(edge)
+                    paths.append(path)
+                    offsets.append(position)
+                    boxes.append(label_box(path, EDGE_LABEL_PAD * EDGE_LABEL_SIZE))
+                    box_offsets.append(position)
+
+        points = Affine2D().scale(1 / 72) + ax.figure.dpi_scale_trans
+        collections = []
+        if boxes:
+            collections.append(PathCollection(
+                boxes, offsets=box_offsets, offset_transform=ax.transData, transform=points,
+                facecolors='white', edgecolors='black', linewidths=1, alpha=0.8, zorder=3))
+        if paths:
+            collections.append(PathCollection(
+                paths, offsets=offsets, offset_transform=ax.transData, transform=points,
+                facecolors='black', edgecolors='none', linewidths=0, zorder=4))
+        return collections
+
+    def node_collection(self, shape, nodes):
+        """同一形状的节点合并为一个 PolyCollection"""
+        x = np.array([node.x for node in nodes], dtype=float)[:, None]
+        y = np.array([node.y for node in nodes], dtype=float)[:, None]
+        half_w = np.array([node.width for node in nodes], dtype=float)[:, None] / 2
+        half_h = np.array([node.height for node in nodes], dtype=float)[:, None] / 2
+
+        if shape == 'circle':
+            theta = np.linspace(0, 2 * np.pi, self.circle_steps, endpoint=False)
+            vx = x + half_w * np.cos(theta)
+            vy = y + half_w * np.sin(theta)
+        elif shape == 'diamond':
+            vx = x + half_w * np.array([-1, 0, 1, 0])
+            vy = y + half_h * np.array([0, 1, 0, -1])
+        else:
+            # 圆角矩形：四个角各一段圆弧，圆角半径等于 pad
+            pad = np.array([node.pad for node in nodes], dtype=float)[:, None]
+            steps = self.corner_steps
+            theta = np.concatenate([np.linspace(q * np.pi / 2, (q + 1) * np.pi / 2, steps)
+                                    for q in range(4)])
+            sign_x = np.repeat([1, -1, -1, 1], steps)
+            sign_y = np.repeat([1, 1, -1, -1], steps)
+            vx = x + sign_x * half_w + pad * np.cos(theta)
+            vy = y + sign_y * half_h + pad * np.sin(theta)
+
+        return PolyCollection(np.stack([vx, vy], axis=-1),
+                              facecolors=[node.facecolor for node in nodes],
+                              edgecolors=[node.edgecolor for node in nodes],
+                              linewidths=[node.linewidth for node in nodes],
+                              zorder=1)
+
+    def edge_collection(self, ax, scene):
+        """全部连线和箭头合并为一个 LineCollection"""
+        scale = self.points_per_unit(ax)
+        lines, colors, widths, styles = [], [], [], []
+
+        for edge, path in zip(scene.edges, self.edge_paths(scene.edges, scale)):
+            lines.append(path / scale)
+            colors.append(edge.color)
+            widths.append(edge.linewidth)
+            styles.append(edge.linestyle)
+
+            # 箭头画成两条短线，始终用实线
+            heads = []
+            if edge.arrowstyle in ('->', '<->'):
+                heads.append(self.arrow_head(path[-2], path[-1]))
+            if edge.arrowstyle == '<->':
+                heads.append(self.arrow_head(path[1], path[0]))
+            for head in heads:
+                lines.append(head / scale)
+                colors.append(edge.color)
+                widths.append(edge.linewidth)
+                styles.append('-')
+
+        return LineCollection(lines, colors=colors, linewidths=widths, linestyles=styles,
+                              capstyle='round', zorder=2)
+
+    def edge_paths(self, edges, scale):
+        """计算每条连线在磅坐标下的折线
+
+        两点连线按 arc3 的规则向量化计算二次贝塞尔曲线，中间控制点到两端
+        连线的距离为 rad 倍的两点距离；箭头的两端按 annotate 的默认值收缩。
+        """
+        paths = [None] * len(edges)
+        arcs = [i for i, edge in enumerate(edges)
+                if len(edge.points) == 2 and edge.arrowstyle != '-']
+
+        if arcs:
+            start = np.array([edges[i].points[0] for i in arcs], dtype=float) * scale
+            end = np.array([edges[i].points[1] for i in arcs], dtype=float) * scale
+            rad = np.array([edges[i].rad for i in arcs], dtype=float)[:, None]
+
+            delta = end - start
+            control = (start + end) / 2 + rad * np.stack([delta[:, 1], -delta[:, 0]], axis=1)
+            steps = self.curve_steps if np.any(rad) else 2
+            t = np.linspace(0, 1, steps)[None, :, None]
+            curves = ((1 - t) ** 2 * start[:, None] + 2 * (1 - t) * t * control[:, None]
+                      + t ** 2 * end[:, None])
+
+            # 两端沿切线方向收缩
+            curves[:, 0] += self.unit(curves[:, 1] - curves[:, 0]) * ARROW_SHRINK
+            curves[:, -1] += self.unit(curves[:, -2] - curves[:, -1]) * ARROW_SHRINK
+            for k, i in enumerate(arcs):
+                paths[i] = curves[k]
+
+        for i, edge in enumerate(edges):
+            if paths[i] is None:
+                paths[i] = np.array(edge.points, dtype=float) * scale
+        return paths
+
+    @staticmethod
+    def arrow_head(before, tip):
+        """开口箭头的三个顶点（磅坐标）"""
+        direction = BatchDrawer.unit(tip - before)
+        normal = np.array([-direction[1], direction[0]])
+        back = tip - direction * ARROW_HEAD_LENGTH
+        return np.array([back + normal * ARROW_HEAD_WIDTH, tip, back - normal * ARROW_HEAD_WIDTH])
+
+    @staticmethod
+    def unit(vectors):
+        """单位向量，零向量保持为零"""
+        length = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.divide(vectors, length, out=np.zeros_like(vectors), where=length > 0)
+
+    @staticmethod
+    def points_per_unit(ax):
+        """x、y方向每个数据单位对应的磅数"""
+        fig_width, fig_height = ax.figure.get_size_inches()
+        position = ax.get_position()
+        x0, x1 = ax.get_xlim()
+        y0, y1 = ax.get_ylim()
+        return np.array([position.width * fig_width * 72 / max(abs(x1 - x0), 1e-9),
+                         position.height * fig_height * 72 / max(abs(y1 - y0), 1e-9)])
+
+
+def draw_scene(ax, scene, batched=None, threshold=BATCH_THRESHOLD):
+    """绘制场景，batched 为 None 时按图形元素数量自动选择绘制方式"""
+    if batched is None:
+        batched = scene.size > threshold
+    drawer = BatchDrawer() if batched else PatchDrawer()
+    drawer.draw(ax, scene)
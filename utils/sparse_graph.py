@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稀疏图模块
+用CSR格式（indptr/indices两个NumPy数组）保存邻接关系，内存与连线数成正比，
+度数、可达性和连通分量查询全部向量化，适合数万个概念的网络分析
+"""
+
+import numpy as np
+
+from graph_model import DiagramGraph
+
+
+class SparseAdjacency:
+    """CSR格式的有向邻接表
+
+    第 i 个节点的后继为 indices[indptr[i]:indptr[i+1]]，每行已排序且去重。
+    3万个节点、10万条连线只占约1MB，而稠密矩阵需要9亿个元素。
+    """
+
+    def __init__(self, indptr, indices, node_ids=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.node_ids = list(node_ids) if node_ids is not None else None
+        self._index = {node_id: i for i, node_id in enumerate(self.node_ids or [])}
+        self._transpose = None
+
+    @classmethod
+    def from_edges(cls, n, sources, targets, node_ids=None):
+        """由起点、终点序号数组构建（自动去重）"""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if len(sources):
+            keys = np.unique(sources * n + targets)
+            sources, targets = keys // n, keys % n
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        return cls(indptr, targets.astype(np.int32 if n < 2 ** 31 else np.int64), node_ids)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """由 DiagramGraph 构建，连线两端按文本或ID解析"""
+        pairs = graph.edge_pairs(chain_if_empty=False)
+        sources = np.fromiter((graph.index_of(a) for a, _ in pairs), dtype=np.int64,
+                              count=len(pairs))
+        targets = np.fromiter((graph.index_of(b) for _, b in pairs), dtype=np.int64,
+                              count=len(pairs))
+        return cls.from_edges(len(graph), sources, targets, graph.node_ids())
+
+    @classmethod
+    def from_connections(cls, nodes, connections):
+        """由解析结果中的节点和连接关系构建"""
+        return cls.from_graph(DiagramGraph(nodes=nodes, connections=connections))
+
+    @property
+    def node_count(self):
+        return len(self.indptr) - 1
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    def index_of(self, node):
+        """节点ID转换为序号，已经是序号时原样返回；都不是时抛出 KeyError"""
+        index = self._index.get(node)
+        if index is not None:
+            return index
+        if isinstance(node, (int, np.integer)) and 0 <= node < self.node_count:
+            return int(node)
+        raise KeyError(f"节点不存在: {node}")
+
+    def neighbors(self, node):
+        """后继节点序号"""
+        i = self.index_of(node)
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def has_edge(self, source, target):
+        """是否存在 source -> target 的连线（行内二分查找）"""
+        row = self.neighbors(source)
+        target = self.index_of(target)
+        position = np.searchsorted(row, target)
+        return bool(position < len(row) and row[position] == target)
+
+    def out_degree(self):
+        """出度数组"""
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        """入度数组"""
+        return np.bincount(self.indices, minlength=self.node_count)
+
+    def degree(self):
+        """总度数数组"""
+        return self.out_degree() + self.in_degree()
+
+    def transpose(self):
+        """反向邻接表（结果会缓存）"""
+        if self._transpose is None:
+            sources = np.repeat(np.arange(self.node_count), self.out_degree())
+            self._transpose = SparseAdjacency.from_edges(
+                self.node_count, self.indices, sources, self.node_ids)
+            self._transpose._transpose = self
+        return self._transpose
+
+    def reachable(self, source, directed=True):
+        """从 source 出发可以到达的节点，返回布尔数组（包含自身）
+
+        有向时逐层扩展，每层用 np.repeat 一次取出整层节点的全部后继；
+        directed=False 时等价于同一弱连通分量，直接用连通分量计算。
+        """
+        source = self.index_of(source)
+        if not directed:
+            _, labels = self.connected_components()
+            return labels == labels[source]
+
+        visited = np.zeros(self.node_count, dtype=bool)
+        frontier = np.array([source], dtype=np.int64)
+        visited[frontier] = True
+
+        while len(frontier):
+            candidates = self._expand(frontier)
+            frontier = np.unique(candidates[~visited[candidates]])
+            visited[frontier] = True
+        return visited
+
+    def connected_components(self):
+        """弱连通分量，返回 (分量数, 每个节点的分量编号)
+
+        向量化的并查集：每轮把每条连线两端的根挂到较小的根上，再做指针跳跃
+        压缩路径，通常只需 O(log n) 轮。
+        """
+        n = self.node_count
+        parent = np.arange(n)
+        sources = np.repeat(np.arange(n), self.out_degree())
+        targets = self.indices.astype(np.int64)
+
+        while True:
+            root_s, root_t = parent[sources], parent[targets]
+            differ = root_s != root_t
+            if not differ.any():
+                break
+            root_s, root_t = root_s[differ], root_t[differ]
+            np.minimum.at(parent, np.maximum(root_s, root_t), np.minimum(root_s, root_t))
+            while True:
+                jumped = parent[parent]
+                if np.array_equal(jumped, parent):
+                    break
+                parent = jumped
+
+        roots, labels = np.unique(parent, return_inverse=True)
+        return len(roots), labels.ravel()
+
+    def to_dense(self):
+        """转换为稠密的0/1矩阵（只适合小图）"""
+        matrix = np.zeros((self.node_count, self.node_count), dtype=np.int8)
+        sources = np.repeat(np.arange(self.node_count), self.out_degree())
+        matrix[sources, self.indices] = 1
+        return matrix
+
+    def _expand(self, frontier):
+        """一层节点的全部后继"""
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return self.indices[np.repeat(starts, counts) + offsets].astype(np.int64)
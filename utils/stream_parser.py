@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式解析模块
+逐行读取文本、文件或任意行迭代器，边读边产出标题、节点和连接关系，
+不需要先把整个文本拆成列表，适合数MB的法条大纲
+"""
+
+import io
+import re
+
+from graph_model import DiagramGraph
+
+# 高级连接符号及连接类型，长符号在前，保证 --> 和 ==> 不会被识别为 -> 和 =>
+CONNECTION_TYPES = {
+    '--->': 'dashed',
+    '-->': 'dashed',
+    '==>': 'double',
+    '->': 'simple',
+    '=>': 'thick',
+    '→': 'simple',
+    '⇒': 'thick'
+}
+CONNECTION_SYMBOLS = list(CONNECTION_TYPES)
+
+# 所有连接符号编译为一个正则（长符号在前），每行只需 split 一次，
+# 捕获组保留匹配到的符号，按 CONNECTION_TYPES 映射为连接类型
+OPERATOR_PATTERN = re.compile(
+    '(' + '|'.join(map(re.escape, sorted(CONNECTION_TYPES, key=len, reverse=True))) + ')')
+
+
+def iter_lines(source):
+    """把字符串、文件对象或行迭代器统一为逐行迭代"""
+    if isinstance(source, str):
+        return io.StringIO(source)
+    return source
+
+
+def split_label(text):
+    """拆分 "目标 [标签]"，返回 (去掉标签的文本, 标签)"""
+    start = text.find('[')
+    if start < 0:
+        return text.strip(), ''
+    end = text.find(']', start)
+    if end < 0:
+        return text.strip(), ''
+    return text[:start].strip(), text[start + 1:end]
+
+
+def split_connections(parts):
+    """由 OPERATOR_PATTERN.split 的结果（文本与符号交替）生成连接字典列表
+
+    支持链式写法 A -> B [标签] => C，每段生成一条连线，
+    标签属于它前面的那条连线；端点为空的一段会被跳过。
+    """
+    connections = []
+    source = parts[0].strip()
+    for i in range(1, len(parts), 2):
+        target, label = split_label(parts[i + 1])
+        if source and target:
+            connections.append({
+                'from': source,
+                'to': target,
+                'type': CONNECTION_TYPES[parts[i]],
+                'label': label
+            })
+        source = target
+    return connections
+
+
+def parse_advanced_connection(line):
+    """解析带连接类型和标签的连接，返回 (是否为连接行, 连接字典列表)"""
+    if '>' not in line and '→' not in line and '⇒' not in line:
+        return False, []
+    parts = OPERATOR_PATTERN.split(line)
+    if len(parts) == 1:
+        return False, []
+    return True, split_connections(parts)
+
+
+def parse_simple_connection(line):
+    """解析连接，只保留端点，返回 (是否为连接行, 连接字典列表)
+
+    与 parse_advanced_connection 使用同一个 OPERATOR_PATTERN，所有连接符号和
+    链式写法都能识别，只是不区分连接类型，[标签] 被忽略。
+    """
+    is_connection, connections = parse_advanced_connection(line)
+    return is_connection, [{'from': conn['from'], 'to': conn['to']} for conn in connections]
+
+
+def tokenize_connections(text):
+    """整段文本分词，返回全部带类型和标签的连接关系
+
+    先用成员检查跳过不可能含连接符号的节点行，其余每行用 OPERATOR_PATTERN 切分一次。
+    """
+    split = OPERATOR_PATTERN.split
+    connections = []
+    for line in text.split('\n'):
+        if '>' not in line and '→' not in line and '⇒' not in line:
+            continue
+        parts = split(line)
+        if len(parts) != 3:
+            if len(parts) > 3:
+                connections.extend(split_connections(parts))
+            continue
+        # 最常见的单条连线直接生成
+        source, symbol, target = parts
+        label = ''
+        if '[' in target:
+            target, label = split_label(target)
+        source, target = source.strip(), target.strip()
+        if source and target:
+            connections.append({'from': source, 'to': target,
+                                'type': CONNECTION_TYPES[symbol], 'label': label})
+    return connections
+
+
+class StreamParser:
+    """逐行解析图表文本
+
+    第一行非空文本为标题；含连接符号的行为连接关系（支持链式连接），其余非空行为节点，
+    节点ID和层级按行号编号，与 DiagramRenderer.parse_text_content 一致。
+    advanced=True 时连接还带有 =>、-->、==> 等符号对应的连接类型和 [标签]。
+    """
+
+    def __init__(self, advanced=False, default_title="法学研究图表"):
+        self.advanced = advanced
+        self.default_title = default_title
+
+    def events(self, source):
+        """逐行产出 ('title', 标题)、('node', 节点字典)、('edge', 连接字典)"""
+        parse_connection = parse_advanced_connection if self.advanced else parse_simple_connection
+        index = -1
+        for raw_line in iter_lines(source):
+            line = raw_line.strip()
+            if not line:
+                continue
+            index += 1
+
+            if index == 0:
+                yield 'title', line
+                continue
+
+            is_connection, connections = parse_connection(line)
+            if is_connection:
+                for conn in connections:
+                    yield 'edge', conn
+            else:
+                yield 'node', {'id': f"node_{index}", 'text': line, 'level': index}
+
+        if index < 0:
+            yield 'title', self.default_title
+
+    def iter_nodes(self, source):
+        """只产出节点"""
+        for kind, item in self.events(source):
+            if kind == 'node':
+                yield item
+
+    def iter_connections(self, source):
+        """只产出连接关系（所有行都按连接解析，不区分标题）
+
+        source 为字符串时整段交给 tokenize_connections，普通节点行只做一次成员检查。
+        """
+        if isinstance(source, str) and self.advanced:
+            yield from tokenize_connections(source)
+            return
+
+        parse_connection = parse_advanced_connection if self.advanced else parse_simple_connection
+        for raw_line in iter_lines(source):
+            _, connections = parse_connection(raw_line.strip())
+            yield from connections
+
+    def parse(self, source):
+        """解析为 DiagramGraph，节点和连线在读取过程中直接写入图模型"""
+        graph = DiagramGraph()
+        for kind, item in self.events(source):
+            if kind == 'node':
+                graph.add_node_dict(item)
+            elif kind == 'edge':
+                graph.add_connection_dict(item)
+            else:
+                graph.title = item
+        return graph
+
+
+def parse_file(path, advanced=False, encoding='utf-8'):
+    """流式解析文本文件，返回 DiagramGraph"""
+    with open(path, 'r', encoding=encoding) as f:
+        return StreamParser(advanced).parse(f)
+
+
+def layout_file(path, layout, advanced=False, encoding='utf-8'):
+    """流式解析文本文件并直接计算分层布局，返回 (图模型, 节点位置)"""
+    graph = parse_file(path, advanced, encoding)
+    # 节点的 level 是行号，有连接关系时按连线分层
+    levels = None if graph.connections else {node['id']: node['level'] for node in graph.nodes}
+    return graph, layout.layout(graph.node_ids(), graph.edge_pairs(), levels)
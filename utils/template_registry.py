@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板注册表模块
+模板文件只解析一次并按名称、类型和标签建立索引，查找为O(1)；刷新时只比较文件的
+修改时间和大小，重新解析发生变化的文件；保存的模板来自追加写入的模板日志；
+列表和筛选使用不含图片数据等大字段的摘要。大字段随模板文件完整解析并留在内存中，
+并不延迟读取；需要按需读取的图片应放在 blob_store 中，模板只记录哈希（image_blob）
+"""
+
+import copy
+import json
+import os
+import threading
+from collections.abc import Mapping
+
+from template_store import TemplateJournal, JOURNAL_FILE
+
+# 内置模板文件及其标签，后面的文件中同名模板覆盖前面的
+TEMPLATE_FILES = [
+    ('legal_templates.json', '法学模板'),
+    ('academic_templates.json', '学术论文模板')
+]
+
+# 保存的模板的标签
+SAVED_TAG = '已保存模板'
+
+# 未找到模板文件时使用的默认模板
+DEFAULT_TEMPLATES = {
+    "法律条文关系图": {
+        "type": "hierarchy",
+        "description": "展示法律条文之间的层级关系",
+        "layout": "vertical",
+        "default_text": "宪法\n基本法\n行政法规\n部门规章\n地方性法规"
+    },
+    "学术论文研究框架图": {
+        "type": "framework",
+        "description": "展示学术论文的研究框架和结构",
+        "layout": "grid",
+        "default_text": "研究背景\n文献综述\n理论框架\n研究方法\n数据分析\n结论建议"
+    }
+}
+
+# 列表、筛选时用不到的大字段（旧版模板内嵌的图片数据），不放入摘要，取用完整模板时合并
+HEAVY_FIELDS = ('image_base64',)
+
+# 按模板目录共享的注册表
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(template_dir='templates'):
+    """获取模板目录对应的共享注册表，同一进程中模板文件只解析一次"""
+    key = os.path.abspath(template_dir)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = TemplateRegistry(template_dir)
+        return _registries[key]
+
+
+class TemplateRegistry(Mapping):
+    """模板注册表，可以像只读字典一样按名称取模板
+
+    取到的模板字典由注册表共享，调用方不应修改。导入的模板用 register() 添加，
+    只保存在内存中，刷新后仍然保留；save() 把模板写入模板目录的模板日志。
+    """
+
+    def __init__(self, template_dir='templates', files=None, defaults=None):
+        self.template_dir = template_dir
+        self.files = list(files if files is not None else TEMPLATE_FILES)
+        self.defaults = defaults if defaults is not None else DEFAULT_TEMPLATES
+        # 解析模板文件的次数
+        self.loads = 0
+        self._lock = threading.RLock()
+        self._sources = {}
+        self._registered = {}
+        self._light = {}
+        self._heavy = {}
+        self._full = {}
+        self._styles = {}
+        self._tags = {}
+        self._by_type = {}
+        self._by_tag = {}
+        self.journal = TemplateJournal(os.path.join(template_dir, JOURNAL_FILE))
+        self.refresh()
+
+    def refresh(self):
+        """重新解析修改过的模板文件，返回是否有变化"""
+        with self._lock:
+            changed = False
+            for filename, label in self.files:
+                path = os.path.join(self.template_dir, filename)
+                try:
+                    stat = os.stat(path)
+                    stamp = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    stamp = None
+
+                source = self._sources.get(filename)
+                if source is not None and source['stamp'] == stamp:
+                    continue
+
+                templates = {}
+                if stamp is not None:
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            templates = json.load(f)
+                        self.loads += 1
+                    except Exception as e:
+                        print(f"加载{label}文件失败: {e}")
+                self._sources[filename] = {'stamp': stamp, 'label': label,
+                                           'templates': templates}
+                changed = True
+
+            # 模板日志只读取新追加的记录
+            if self.journal.refresh():
+                changed = True
+
+            if changed:
+                self._rebuild()
+            return changed
+
+    def register(self, name, template, tags=('导入模板',)):
+        """添加内存中的模板（例如导入的模板），同名时覆盖文件中的模板"""
+        with self._lock:
+            self._registered[name] = (template, tuple(tags))
+            self._rebuild()
+
+    def save(self, name, template):
+        """保存模板到模板日志，其他进程刷新后也能取到"""
+        with self._lock:
+            self.journal.put(name, template)
+            # 追加时模板日志已读取了新记录，这里直接重建索引
+            if not self.refresh():
+                self._rebuild()
+
+    def delete(self, name):
+        """删除保存的模板"""
+        with self._lock:
+            self.journal.delete(name)
+            # 追加时模板日志已读取了新记录，这里直接重建索引
+            if not self.refresh():
+                self._rebuild()
+
+    def _rebuild(self):
+        """合并全部来源并重建索引"""
+        entries = {}
+        for filename, label in self.files:
+            for name, template in self._sources[filename]['templates'].items():
+                entries[name] = (template, (label,) + tuple(template.get('tags', ())))
+        for name, template in self.journal.templates.items():
+            entries[name] = (template, (SAVED_TAG,) + tuple(template.get('tags', ())))
+
+        # 没有加载到任何模板时使用默认模板
+        if not entries:
+            for name, template in self.defaults.items():
+                entries[name] = (copy.deepcopy(template), ('默认模板',))
+        entries.update(self._registered)
+
+        light, heavy, tags, by_type, by_tag = {}, {}, {}, {}, {}
+        for name, (template, template_tags) in entries.items():
+            light[name] = {key: value for key, value in template.items()
+                           if key not in HEAVY_FIELDS}
+            fields = {key: template[key] for key in HEAVY_FIELDS if key in template}
+            if fields:
+                heavy[name] = fields
+            tags[name] = template_tags
+            by_type.setdefault(template.get('type', 'hierarchy'), []).append(name)
+            for tag in template_tags:
+                by_tag.setdefault(tag, []).append(name)
+
+        self._light, self._heavy, self._tags = light, heavy, tags
+        self._by_type, self._by_tag = by_type, by_tag
+        self._full = {}
+        self._styles = {}
+
+    def __getitem__(self, name):
+        """完整的模板（包括大字段）"""
+        template = self._full.get(name)
+        if template is None:
+            with self._lock:
+                template = self._light[name]
+                if name in self._heavy:
+                    template = {**template, **self._heavy[name]}
+                self._full[name] = template
+        return template
+
+    def __iter__(self):
+        return iter(self._light)
+
+    def __len__(self):
+        return len(self._light)
+
+    def __contains__(self, name):
+        return name in self._light
+
+    def style(self, name, template_type=None):
+        """模板编译后的样式，按 (名称, 类型) 缓存到模板变化为止"""
+        key = (name, template_type)
+        style = self._styles.get(key)
+        if style is None:
+            # style_compiler 经 drawing_utils 导入本模块，在这里导入避免循环导入
+            from style_compiler import compile_style
+            style = compile_style(self[name], template_type)
+            self._styles[key] = style
+        return style
+
+    def summary(self, name):
+        """不含大字段的模板信息，用于列表和预览"""
+        return self._light[name]
+
+    def names_by_type(self, template_type):
+        """某种类型的模板名称"""
+        return list(self._by_type.get(template_type, []))
+
+    def names_by_tag(self, tag):
+        """带某个标签的模板名称"""
+        return list(self._by_tag.get(tag, []))
+
+    def tags_of(self, name):
+        """模板的标签"""
+        return self._tags.get(name, ())
+
+    @property
+    def types(self):
+        return list(self._by_type)
+
+    @property
+    def tags(self):
+        return list(self._by_tag)
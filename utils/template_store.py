@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板保存模块
+保存的模板以JSONL日志追加写入（每行一条保存或删除记录），保存只追加一行；
+写入时持有文件锁，失效记录过多时整理为新文件再原子替换，
+图形界面和多个渲染进程共用同一个模板目录时不会丢失数据
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+JOURNAL_FILE = 'saved_templates.jsonl'
+
+# 记录数超过有效模板数的该倍数（且文件大于下限）时整理日志
+COMPACT_RATIO = 2
+COMPACT_MIN_BYTES = 64 * 1024
+
+
+@contextmanager
+def file_lock(path):
+    """跨进程的排他文件锁（锁文件与数据文件分开，整理时替换数据文件不影响加锁）"""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK 重试约10秒后仍未取得锁会报错，继续等待
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class TemplateJournal:
+    """JSONL模板日志
+
+    记录格式为 {"op": "put", "name": 名称, "template": 模板} 或
+    {"op": "delete", "name": 名称}，后面的记录覆盖前面的。已读取的位置会被记住，
+    刷新时只读取其他进程新追加的行；文件被整理替换后重新读取全部内容。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.templates = {}
+        # 已读取的记录数，整理后等于有效模板数
+        self.records = 0
+        self._offset = 0
+        self._file_id = None
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """读取新追加的记录，返回模板是否有变化"""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                changed = bool(self.templates)
+                self._reset(None)
+                return changed
+
+            changed = False
+            file_id = (stat.st_dev, stat.st_ino)
+            if file_id != self._file_id or stat.st_size < self._offset:
+                # 文件被整理替换或截断，重新读取
+                changed = bool(self.templates)
+                self._reset(file_id)
+            if stat.st_size == self._offset:
+                return changed
+
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+            # 只处理完整的行，正在追加的最后一行留到下次读取
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                changed = self._apply(line) or changed
+            self._offset += end
+            return changed
+
+    def _reset(self, file_id):
+        self.templates = {}
+        self.records = 0
+        self._offset = 0
+        self._file_id = file_id
+
+    def _apply(self, line):
+        """应用一条记录，无法解析的行（例如写入中断留下的半行）跳过"""
+        if not line.strip():
+            return False
+        try:
+            record = json.loads(line)
+            name = record['name']
+            op = record.get('op', 'put')
+        except (ValueError, KeyError, TypeError):
+            return False
+
+        self.records += 1
+        if op == 'delete':
+            return self.templates.pop(name, None) is not None
+        if op == 'put' and isinstance(record.get('template'), dict):
+            self.templates[name] = record['template']
+            return True
+        return False
+
+    def put(self, name, template):
+        """保存模板（追加一行）"""
+        self._append({'op': 'put', 'name': name, 'template': template})
+
+    def delete(self, name):
+        """删除保存的模板"""
+        self._append({'op': 'delete', 'name': name})
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock, file_lock(self.lock_path):
+            self.refresh()
+            with open(self.path, 'ab') as f:
+                # 上次写入中断时文件末尾没有换行，补上换行避免与新记录连在一起
+                if f.tell() > self._offset:
+                    line = b'\n' + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.refresh()
+
+            if (self.records > COMPACT_RATIO * max(len(self.templates), 1) and
+                    self._offset > COMPACT_MIN_BYTES):
+                self._compact()
+
+    def compact(self):
+        """整理日志，只保留每个模板的最新记录"""
+        with self._lock, file_lock(self.lock_path):
+            self.refresh()
+            self._compact()
+
+    def _compact(self):
+        """写入临时文件后原子替换（调用方持有文件锁）"""
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                for name, template in self.templates.items():
+                    record = {'op': 'put', 'name': name, 'template': template}
+                    f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.refresh()
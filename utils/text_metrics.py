@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文字度量模块
+不经过渲染器测量字符宽度，每种字体的每个字符只测量一次，整行宽度按
+(文字, 粗细) 做LRU缓存（宽度与字号成正比），不需要渲染器；中日韩文字按字符宽度换行，
+用于确定节点框的大小
+"""
+
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+
+import matplotlib
+from matplotlib.font_manager import FontProperties, findfont, get_font
+from matplotlib.textpath import TextToPath
+
+# 测量时的字号，字符宽度与字号成正比，结果换算为以字号为单位
+REFERENCE_SIZE = 100
+LINE_SPACING = 1.2
+
+# 不放在行首的标点，换行时留在上一行末尾
+NO_LINE_START = set('，。、；：！？）》」』】〕…—,.;:!?)]}%')
+
+# 中日韩文字和全角符号可以在任意字符间换行，西文按单词（连续的非空白字符）换行
+WIDE_CHARS = '\u1100-\u115f\u2e80-\u303f\u3040-\u9fff\uac00-\ud7af\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef'
+TOKEN_PATTERN = re.compile(f'[{WIDE_CHARS}]|\\s+|[^\\s{WIDE_CHARS}]+')
+
+# 按字体列表共享的度量对象
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_text_metrics(families=None):
+    """获取字体列表对应的共享度量对象，未指定时使用当前的 font.sans-serif 设置"""
+    key = tuple(families or matplotlib.rcParams['font.sans-serif'])
+    with _metrics_lock:
+        if key not in _metrics:
+            _metrics[key] = TextMetrics(key)
+        return _metrics[key]
+
+
+class TextMetrics:
+    """文字度量：宽度以磅为单位
+
+    字符宽度由 matplotlib 的文字排版测量，字体回退与实际绘制一致；
+    字体列表中没有一种字体包含该字符（排版时只能画缺字占位符）或无法测量时，
+    按东亚宽度估算：全角字符为一个字号，其余为0.55个字号。
+    """
+
+    def __init__(self, families=('sans-serif',), max_lines=4096):
+        self.families = list(families)
+        self._text_to_path = TextToPath()
+        self._widths = {}
+        self._fonts = {}
+        self._lock = threading.Lock()
+        # 测量字符的次数
+        self.measured = 0
+        self._line_width = lru_cache(maxsize=max_lines)(self._measure_line)
+
+    def char_width(self, char, fontweight='normal'):
+        """字符宽度（以字号为单位）"""
+        key = (char, fontweight)
+        width = self._widths.get(key)
+        if width is None:
+            with self._lock:
+                width = None
+                if self.has_glyph(char, fontweight):
+                    prop = FontProperties(family=self.families, weight=fontweight,
+                                          size=REFERENCE_SIZE)
+                    try:
+                        width = self._text_to_path.get_text_width_height_descent(
+                            char, prop, ismath=False)[0] / REFERENCE_SIZE
+                    except Exception:
+                        pass
+                if width is None:
+                    width = 1.0 if unicodedata.east_asian_width(char) in 'WF' else 0.55
+                self.measured += 1
+            self._widths[key] = width
+        return width
+
+    def has_glyph(self, char, fontweight='normal'):
+        """字体列表中是否有字体包含该字符（缺字时排版不报错，只给出警告和占位符宽度）"""
+        code = ord(char)
+        return any(font.get_char_index(code) for font in self._resolve_fonts(fontweight))
+
+    def _resolve_fonts(self, fontweight):
+        """字体列表中本机实际存在的字体，按回退顺序排列，每种粗细只查找一次"""
+        fonts = self._fonts.get(fontweight)
+        if fonts is None:
+            fonts, paths = [], set()
+            for family in self.families:
+                try:
+                    path = findfont(FontProperties(family=family, weight=fontweight),
+                                    fallback_to_default=False)
+                except ValueError:
+                    continue
+                if path not in paths:
+                    paths.add(path)
+                    fonts.append(get_font(path))
+            self._fonts[fontweight] = fonts
+        return fonts
+
+    def _measure_line(self, line, fontweight):
+        return sum(self.char_width(char, fontweight) for char in line)
+
+    def line_width(self, line, fontsize, fontweight='normal'):
+        """单行文字的宽度（磅）"""
+        return self._line_width(line, fontweight) * fontsize
+
+    def text_size(self, text, fontsize, fontweight='normal'):
+        """多行文字的 (宽度, 高度)，单位为磅"""
+        lines = text.split('\n')
+        width = max(self._line_width(line, fontweight) for line in lines)
+        return width * fontsize, len(lines) * fontsize * LINE_SPACING
+
+    def wrap(self, text, max_width, fontsize, fontweight='normal'):
+        """按宽度（磅）换行：中日韩文字可以在任意字符间断开，西文按单词断开，
+        超过一行宽度的单词按字符断开；原有的换行保留"""
+        limit = max_width / fontsize
+        lines = []
+        for paragraph in text.split('\n'):
+            lines.extend(self._wrap_paragraph(paragraph, limit, fontweight))
+        return '\n'.join(lines)
+
+    def _wrap_paragraph(self, text, limit, fontweight):
+        lines = []
+        current, width = '', 0.0
+        for token in self._tokens(text, limit, fontweight):
+            token_width = self._line_width(token, fontweight)
+            if token.isspace():
+                # 行首不保留空格
+                if current:
+                    current += token
+                    width += token_width
+                continue
+            if current and width + token_width > limit and token[0] not in NO_LINE_START:
+                lines.append(current.rstrip())
+                current, width = '', 0.0
+            current += token
+            width += token_width
+        lines.append(current.rstrip())
+        return lines
+
+    def _tokens(self, text, limit, fontweight):
+        """换行单位，超过一行宽度的单词拆成单个字符"""
+        for token in TOKEN_PATTERN.findall(text):
+            if len(token) > 1 and not token.isspace() and \
+                    self._line_width(token, fontweight) > limit:
+                yield from token
+            else:
+                yield token
+
+    def fit(self, text, fontsize, max_width, fontweight='normal'):
+        """换行到 max_width 磅以内，返回 (换行后的文字, 宽度, 高度)，单位为磅"""
+        wrapped = self.wrap(text, max_width, fontsize, fontweight)
+        width, height = self.text_size(wrapped, fontsize, fontweight)
+        return wrapped, width, height
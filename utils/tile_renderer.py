@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+瓦片渲染模块
+把超大图表渲染为 DeepZoom 格式的瓦片金字塔（.dzi 描述文件加 _files/层级/列_行.png），
+每次只绘制一块瓦片并只包含与之相交的节点和连线（由网格索引查找），内存占用与图表规模无关；
+缩小的层级按细节层次隐藏过小的文字，可用 OpenSeadragon 或网页版的 TileViewer 浏览
+"""
+
+import copy
+import io
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from diagram_renderer import DiagramRenderer
+from export_pipeline import atomic_write
+from scene import Scene
+from scene_drawer import draw_scene
+
+# 最大层级上节点文字的大小（像素），未指定比例时据此确定每个数据单位的像素数
+LABEL_SIZE = 12
+# 节点文字小于该像素数时不绘制
+MIN_LABEL_SIZE = 4
+# 层级缩放比例低于该值时不绘制连线标签（标签字号固定，缩小后会遮住连线）
+EDGE_LABEL_MIN_SCALE = 0.5
+
+TILE_FORMATS = ('png', 'jpg')
+
+# 外接矩形覆盖的网格数超过该值时不登记到网格中，每次查询直接检查（例如很长的连线）
+MAX_CELLS_PER_BOX = 16
+
+# 每个工作进程内的瓦片渲染器（场景只传输一次）
+_worker_renderer = None
+
+
+def _init_worker(scene, options):
+    """工作进程初始化：设置中文字体并创建瓦片渲染器"""
+    global _worker_renderer
+    DiagramRenderer.setup_fonts()
+    _worker_renderer = TileRenderer(scene, **options)
+
+
+def _render_tiles(output_dir, tiles):
+    """在工作进程中渲染并写入一组瓦片，返回瓦片数"""
+    for level, col, row in tiles:
+        _worker_renderer.write_tile(output_dir, level, col, row)
+    return len(tiles)
+
+
+class GridIndex:
+    """外接矩形 (x0, x1, y0, y1) 的均匀网格索引
+
+    每个矩形登记到它覆盖的网格中，按网格编号排序存放；查询只取范围内各列网格的
+    矩形再精确比较，耗时与范围内的图形数量有关，与全部图形数量无关。覆盖网格过多的
+    大矩形单独存放，每次查询都检查。
+    """
+
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = boxes
+        self.cols = self.rows = 0
+        self.large = np.zeros(0, dtype=np.int64)
+        if not len(boxes):
+            return
+
+        self.x0, self.y0 = float(boxes[:, 0].min()), float(boxes[:, 2].min())
+        if cell_size is None:
+            # 网格不小于矩形尺寸的中位数，网格总数与矩形数量同一量级
+            sizes = np.maximum(boxes[:, 1] - boxes[:, 0], boxes[:, 3] - boxes[:, 2])
+            extent = max(float(boxes[:, 1].max()) - self.x0, float(boxes[:, 3].max()) - self.y0)
+            cell_size = max(float(np.median(sizes)), extent / math.sqrt(len(boxes)), 1e-9)
+        self.cell_size = cell_size
+
+        cx0, cx1 = self.cells(boxes[:, 0], self.x0), self.cells(boxes[:, 1], self.x0)
+        cy0, cy1 = self.cells(boxes[:, 2], self.y0), self.cells(boxes[:, 3], self.y0)
+        self.cols, self.rows = int(cx1.max()) + 1, int(cy1.max()) + 1
+        span_x, span_y = cx1 - cx0 + 1, cy1 - cy0 + 1
+        small = span_x * span_y <= MAX_CELLS_PER_BOX
+        self.large = np.flatnonzero(~small)
+
+        # 小矩形逐个展开为 (网格编号, 矩形下标)
+        cell_ids, members = [], []
+        for dx in range(MAX_CELLS_PER_BOX):
+            for dy in range(MAX_CELLS_PER_BOX // (dx + 1)):
+                selected = np.flatnonzero(small & (span_x > dx) & (span_y > dy))
+                if len(selected):
+                    cell_ids.append((cx0[selected] + dx) * self.rows + cy0[selected] + dy)
+                    members.append(selected)
+        cell_ids = np.concatenate(cell_ids) if cell_ids else np.zeros(0, dtype=np.int64)
+        members = np.concatenate(members) if members else np.zeros(0, dtype=np.int64)
+        order = np.argsort(cell_ids, kind='stable')
+        self.members = members[order]
+        self.starts = np.searchsorted(cell_ids[order],
+                                      np.arange(self.cols * self.rows + 1))
+
+    def cells(self, values, origin):
+        """坐标所在的网格序号"""
+        return np.floor((values - origin) / self.cell_size).astype(np.int64)
+
+    def query(self, xlim, ylim):
+        """与范围相交的矩形的下标（升序）"""
+        boxes = self.boxes
+        candidates = [self.large]
+        if self.cols:
+            qx0, qx1 = (int(math.floor((v - self.x0) / self.cell_size)) for v in xlim)
+            qy0, qy1 = (int(math.floor((v - self.y0) / self.cell_size)) for v in ylim)
+            qx0, qx1 = max(qx0, 0), min(qx1, self.cols - 1)
+            qy0, qy1 = max(qy0, 0), min(qy1, self.rows - 1)
+            if qx0 <= qx1 and qy0 <= qy1:
+                # 同一列中相邻行的网格编号连续，每列只需取一段
+                for cx in range(qx0, qx1 + 1):
+                    start = self.starts[cx * self.rows + qy0]
+                    end = self.starts[cx * self.rows + qy1 + 1]
+                    candidates.append(self.members[start:end])
+        candidates = np.unique(np.concatenate(candidates))
+        if not len(candidates):
+            return candidates
+        found = boxes[candidates]
+        mask = ((found[:, 1] >= xlim[0]) & (found[:, 0] <= xlim[1]) &
+                (found[:, 3] >= ylim[0]) & (found[:, 2] <= ylim[1]))
+        return candidates[mask]
+
+
+class TileRenderer:
+    """DeepZoom 瓦片金字塔渲染器
+
+    最大层级上每个数据单位对应 pixels_per_unit 个像素（两个方向相同，圆形节点保持为圆），
+    每降低一级尺寸减半，直到 1×1 像素。未指定 pixels_per_unit 时按节点字号的中位数
+    计算，使最大层级上的节点文字约为 LABEL_SIZE 像素。
+    """
+
+    def __init__(self, scene, tile_size=256, overlap=1, pixels_per_unit=None, fmt='png'):
+        if fmt not in TILE_FORMATS:
+            raise ValueError(f"不支持的瓦片格式: {fmt}")
+        self.scene = scene
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.fmt = fmt
+
+        # 单行文字的节点框最矮，文字高度取这类节点框高度的0.4倍；多行文字的节点字号与之相同
+        ratios = [node.fontsize / node.height for node in scene.nodes] or [1.0]
+        self.font_scale = 0.4 / max(max(ratios), 1e-6)
+
+        if pixels_per_unit is None:
+            fontsizes = [node.fontsize for node in scene.nodes] or [1.0]
+            pixels_per_unit = LABEL_SIZE / max(self.font_scale * float(np.median(fontsizes)),
+                                               1e-6)
+        self.pixels_per_unit = pixels_per_unit
+
+        (x0, x1), (y0, y1) = scene.xlim, scene.ylim
+        self.left, self.top = min(x0, x1), max(y0, y1)
+        self.width = max(1, math.ceil(abs(x1 - x0) * pixels_per_unit))
+        self.height = max(1, math.ceil(abs(y1 - y0) * pixels_per_unit))
+        self.max_level = math.ceil(math.log2(max(self.width, self.height)))
+
+        self._build_index()
+        self._figure = None
+        self._blank = {}
+
+    def _build_index(self):
+        """节点和连线的外接矩形及其网格索引，用于按瓦片范围筛选"""
+        nodes = self.scene.nodes
+        x = np.array([node.x for node in nodes], dtype=float)
+        y = np.array([node.y for node in nodes], dtype=float)
+        half_w = np.array([node.width / 2 + node.pad for node in nodes], dtype=float)
+        half_h = np.array([node.height / 2 + node.pad for node in nodes], dtype=float)
+        # 文字可能超出节点框，横向多留半个节点宽度
+        self.node_boxes = np.stack([x - 2 * half_w, x + 2 * half_w, y - half_h, y + half_h],
+                                   axis=1).reshape(-1, 4)
+
+        boxes = []
+        for edge in self.scene.edges:
+            points = np.array(edge.points, dtype=float)
+            low, high = points.min(axis=0), points.max(axis=0)
+            # 弧线的中间控制点偏离两端连线 rad 倍的距离
+            bulge = abs(edge.rad) * float(np.linalg.norm(points[-1] - points[0]))
+            boxes.append((low[0] - bulge, high[0] + bulge, low[1] - bulge, high[1] + bulge))
+        self.edge_boxes = np.array(boxes, dtype=float).reshape(-1, 4)
+        self.node_index = GridIndex(self.node_boxes)
+        self.edge_index = GridIndex(self.edge_boxes)
+
+    def level_size(self, level):
+        """某一层级的图片尺寸"""
+        factor = 2 ** (self.max_level - level)
+        return max(1, math.ceil(self.width / factor)), max(1, math.ceil(self.height / factor))
+
+    def level_scale(self, level):
+        """某一层级相对最大层级的缩放比例"""
+        return 2.0 ** (level - self.max_level)
+
+    def tile_count(self, level):
+        """某一层级的列数和行数"""
+        width, height = self.level_size(level)
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+    def iter_tiles(self):
+        """按层级从小到大产生全部 (层级, 列, 行)"""
+        for level in range(self.max_level + 1):
+            cols, rows = self.tile_count(level)
+            for col in range(cols):
+                for row in range(rows):
+                    yield level, col, row
+
+    @property
+    def total_tiles(self):
+        return sum(cols * rows for cols, rows in
+                   (self.tile_count(level) for level in range(self.max_level + 1)))
+
+    def tile_bounds(self, level, col, row):
+        """瓦片的像素范围 (x0, y0, x1, y1)，与相邻瓦片重叠 overlap 像素"""
+        width, height = self.level_size(level)
+        x0 = max(0, col * self.tile_size - self.overlap)
+        y0 = max(0, row * self.tile_size - self.overlap)
+        x1 = min(width, (col + 1) * self.tile_size + self.overlap)
+        y1 = min(height, (row + 1) * self.tile_size + self.overlap)
+        return x0, y0, x1, y1
+
+    def tile_scene(self, level, col, row):
+        """瓦片范围内的场景：只包含相交的节点和连线，字号和线宽按层级缩放"""
+        x0, y0, x1, y1 = self.tile_bounds(level, col, row)
+        pixels = self.pixels_per_unit * self.level_scale(level)
+        xlim = (self.left + x0 / pixels, self.left + x1 / pixels)
+        ylim = (self.top - y1 / pixels, self.top - y0 / pixels)
+        scene = Scene('', xlim, ylim)
+
+        # 线宽不超过原值，缩小时随之变细
+        scale = self.level_scale(level)
+        line_scale = min(1.0, max(math.sqrt(scale), 0.1))
+        show_edge_labels = scale >= EDGE_LABEL_MIN_SCALE
+
+        for index in self.node_index.query(xlim, ylim):
+            node = copy.copy(self.scene.nodes[index])
+            node.fontsize = node.fontsize * self.font_scale * pixels
+            if node.fontsize < MIN_LABEL_SIZE:
+                node.text = ''
+            node.linewidth *= line_scale
+            scene.nodes.append(node)
+
+        for index in self.edge_index.query(xlim, ylim):
+            edge = copy.copy(self.scene.edges[index])
+            edge.linewidth *= line_scale
+            if not show_edge_labels:
+                edge.label = ''
+            scene.edges.append(edge)
+        return scene
+
+    def render_tile(self, level, col, row):
+        """渲染单个瓦片，返回图片字节"""
+        x0, y0, x1, y1 = self.tile_bounds(level, col, row)
+        size = (x1 - x0, y1 - y0)
+        scene = self.tile_scene(level, col, row)
+        if not scene.nodes and not scene.edges:
+            return self.blank_tile(size)
+
+        # 72dpi 下1磅等于1像素，复用同一个Figure；瓦片总是批量绘制
+        figure = self.get_figure()
+        figure.clf()
+        figure.set_size_inches(size[0] / 72, size[1] / 72)
+        ax = figure.add_axes((0, 0, 1, 1))
+        draw_scene(ax, scene, batched=True)
+        return self.save_figure(figure)
+
+    def blank_tile(self, size):
+        """没有内容的瓦片，同一尺寸只渲染一次"""
+        if size not in self._blank:
+            figure = self.get_figure()
+            figure.clf()
+            figure.set_size_inches(size[0] / 72, size[1] / 72)
+            self._blank[size] = self.save_figure(figure)
+        return self._blank[size]
+
+    def save_figure(self, figure):
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format=self.fmt, dpi=72, facecolor='white', edgecolor='none')
+        return buffer.getvalue()
+
+    def get_figure(self):
+        if self._figure is None:
+            self._figure = Figure(dpi=72)
+            FigureCanvasAgg(self._figure)
+        return self._figure
+
+    def tile_path(self, output_dir, level, col, row):
+        return os.path.join(output_dir, str(level), f"{col}_{row}.{self.fmt}")
+
+    def write_tile(self, output_dir, level, col, row):
+        """渲染瓦片并写入 output_dir/层级/列_行.格式"""
+        path = self.tile_path(output_dir, level, col, row)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(self.render_tile(level, col, row))
+
+    def descriptor(self):
+        """DeepZoom 描述文件内容"""
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+            f'Format="{self.fmt}" Overlap="{self.overlap}" TileSize="{self.tile_size}">\n'
+            f'  <Size Width="{self.width}" Height="{self.height}"/>\n'
+            '</Image>\n'
+        ).encode('utf-8')
+
+    def render(self, output_dir, name, workers=1, progress=None, chunk_size=64):
+        """渲染完整的金字塔，返回 .dzi 文件路径
+
+        workers 大于1时按 chunk_size 块瓦片一组分发到进程池，同时在途的组数有上限；
+        progress(比例, 说明) 用于报告进度。描述文件在全部瓦片写完后才原子写入，
+        浏览器不会读到不完整的金字塔。
+        """
+        tiles_dir = os.path.join(output_dir, f"{name}_files")
+        total = self.total_tiles
+        done = 0
+
+        if workers > 1:
+            options = {'tile_size': self.tile_size, 'overlap': self.overlap,
+                       'pixels_per_unit': self.pixels_per_unit, 'fmt': self.fmt}
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.scene, options)) as executor:
+                pending = deque()
+                for chunk in self.iter_chunks(chunk_size):
+                    pending.append(executor.submit(_render_tiles, tiles_dir, chunk))
+                    if len(pending) >= workers * 4:
+                        done += pending.popleft().result()
+                        self.report(progress, done, total)
+                while pending:
+                    done += pending.popleft().result()
+                    self.report(progress, done, total)
+        else:
+            for level, col, row in self.iter_tiles():
+                self.write_tile(tiles_dir, level, col, row)
+                done += 1
+                if done % chunk_size == 0:
+                    self.report(progress, done, total)
+
+        dzi_path = os.path.join(output_dir, f"{name}.dzi")
+        atomic_write(dzi_path, self.descriptor())
+        self.report(progress, total, total)
+        return dzi_path
+
+    def iter_chunks(self, chunk_size):
+        """把全部瓦片按 chunk_size 分组"""
+        chunk = []
+        for tile in self.iter_tiles():
+            chunk.append(tile)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def report(progress, done, total):
+        if progress is not None:
+            progress(done / max(total, 1), f"已渲染瓦片 {done}/{total}")
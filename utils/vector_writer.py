@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+矢量输出模块
+直接把场景的节点、连线和文字写成SVG或PDF（PDF使用reportlab），不经过matplotlib的
+绘制流程；页面布局、连线弯曲和箭头与matplotlib的输出一致，文字保留为文本而不是路径，
+速度快、文件小，输出中的文字可以选择和搜索
+"""
+
+import io
+from abc import ABC, abstractmethod
+from xml.sax.saxutils import escape
+
+import numpy as np
+from matplotlib.colors import to_rgba
+
+from scene_drawer import BatchDrawer, label_position
+from diagram_renderer import FONT_FAMILIES
+from text_metrics import get_text_metrics
+
+VECTOR_FORMATS = ('svg', 'pdf')
+
+# 与 finish_axes、edge_label 中的字号和间距一致
+TITLE_FONTSIZE = 16
+TITLE_PAD = 20
+EDGE_LABEL_FONTSIZE = 8
+EDGE_LABEL_PAD = 0.2
+LINE_SPACING = 1.2
+
+# 与matplotlib默认的子图位置一致（figure.subplot.left/right/bottom/top）
+SUBPLOT_BOX = (0.125, 0.9, 0.11, 0.88)
+MARGIN = 10
+
+# matplotlib默认的虚线样式（磅），按线宽缩放
+DASH_PATTERNS = {'--': (3.7, 1.6), ':': (1.0, 1.65), '-.': (6.4, 1.6, 1.0, 1.6)}
+
+# PDF使用的字体，第一次输出PDF时注册
+_pdf_font = None
+
+
+def text_width(text, fontsize):
+    """文字宽度（磅），按 FONT_FAMILIES 中已安装的字体测量"""
+    return get_text_metrics(FONT_FAMILIES).text_size(text, fontsize)[0]
+
+
+def line_centers(y, text, fontsize):
+    """多行文字每一行中线的纵坐标（页面坐标，y向上），整体在 y 处居中"""
+    lines = text.split('\n')
+    step = fontsize * LINE_SPACING
+    top = y + step * (len(lines) - 1) / 2
+    return [(line, top - i * step) for i, line in enumerate(lines)]
+
+
+def dash_pattern(linestyle, linewidth):
+    """线型对应的虚线间隔，实线返回None"""
+    pattern = DASH_PATTERNS.get(linestyle)
+    if pattern is None:
+        return None
+    return [length * linewidth for length in pattern]
+
+
+class PageLayout:
+    """数据坐标到页面坐标（磅，y向上）的换算
+
+    页面大小按 figsize 和matplotlib默认的子图位置计算，字号与matplotlib的输出一致。
+    """
+
+    def __init__(self, scene, figsize=(14, 10)):
+        left, right, bottom, top = SUBPLOT_BOX
+        self.plot_width = figsize[0] * 72 * (right - left)
+        self.plot_height = figsize[1] * 72 * (top - bottom)
+        (x0, x1), (y0, y1) = scene.xlim, scene.ylim
+        # 坐标轴反向时缩放为负数，与matplotlib的显示坐标一致
+        self.scale = np.array([self.plot_width / ((x1 - x0) or 1e-9),
+                               self.plot_height / ((y1 - y0) or 1e-9)])
+        self.offset = np.array([MARGIN - x0 * self.scale[0], MARGIN - y0 * self.scale[1]])
+
+        self.width = self.plot_width + 2 * MARGIN
+        self.height = self.plot_height + 2 * MARGIN
+        if scene.title:
+            self.height += TITLE_PAD + TITLE_FONTSIZE * LINE_SPACING
+
+    def point(self, x, y):
+        """单个点的页面坐标"""
+        return x * self.scale[0] + self.offset[0], y * self.scale[1] + self.offset[1]
+
+    def size(self, width, height):
+        """数据单位的长度换算为磅"""
+        return abs(width * self.scale[0]), abs(height * self.scale[1])
+
+    def edge_paths(self, edges):
+        """每条连线的 (折线, [箭头]) 页面坐标，几何与 BatchDrawer 相同"""
+        drawer = BatchDrawer()
+        result = []
+        for edge, path in zip(edges, drawer.edge_paths(edges, self.scale)):
+            heads = []
+            if edge.arrowstyle in ('->', '<->'):
+                heads.append(drawer.arrow_head(path[-2], path[-1]) + self.offset)
+            if edge.arrowstyle == '<->':
+                heads.append(drawer.arrow_head(path[1], path[0]) + self.offset)
+            result.append((path + self.offset, heads))
+        return result
+
+
+class VectorWriter(ABC):
+    """按场景依次输出节点、连线、文字和标题，子类实现具体的图形指令"""
+
+    def __init__(self, figsize=(14, 10)):
+        self.figsize = figsize
+
+    def write(self, scene):
+        """把场景写为文件内容（字节）"""
+        layout = PageLayout(scene, self.figsize)
+        self.begin(layout)
+
+        for node in scene.nodes:
+            self.node(layout, node)
+
+        for edge, (path, heads) in zip(scene.edges, layout.edge_paths(scene.edges)):
+            self.polyline(path, edge.color, edge.linewidth, edge.linestyle)
+            for head in heads:
+                self.polyline(head, edge.color, edge.linewidth, '-')
+
+        for node in scene.nodes:
+            if node.text:
+                self.text(*layout.point(node.x, node.y), node.text, node.fontsize,
+                          node.fontweight)
+        for edge in scene.edges:
+            if edge.label:
+                self.edge_label(layout, edge)
+
+        if scene.title:
+            self.text(MARGIN + layout.plot_width / 2,
+                      MARGIN + layout.plot_height + TITLE_PAD + TITLE_FONTSIZE * 0.35,
+                      scene.title, TITLE_FONTSIZE, 'bold')
+        return self.end()
+
+    def node(self, layout, node):
+        """节点主体，形状与 PatchDrawer.node_patch 一致"""
+        x, y = layout.point(node.x, node.y)
+        style = (node.facecolor, node.edgecolor, node.linewidth)
+        if node.shape == 'circle':
+            rx, ry = layout.size(node.width / 2, node.width / 2)
+            self.ellipse(x, y, rx, ry, *style)
+        elif node.shape == 'diamond':
+            half_w, half_h = layout.size(node.width / 2, node.height / 2)
+            self.polygon([(x - half_w, y), (x, y + half_h), (x + half_w, y), (x, y - half_h)],
+                         *style)
+        else:
+            width, height = layout.size(node.width + 2 * node.pad, node.height + 2 * node.pad)
+            rx, ry = layout.size(node.pad, node.pad)
+            self.rounded_rect(x - width / 2, y - height / 2, width, height, rx, ry, *style)
+
+    def edge_label(self, layout, edge):
+        """连线标签：半透明白底圆角框加文字，与 edge_label 一致"""
+        x, y = layout.point(*label_position(edge))
+        pad = EDGE_LABEL_PAD * EDGE_LABEL_FONTSIZE
+        width = self.measure(edge.label, EDGE_LABEL_FONTSIZE) + 2 * pad
+        height = EDGE_LABEL_FONTSIZE * LINE_SPACING * len(edge.label.split('\n')) + 2 * pad
+        self.rounded_rect(x - width / 2, y - height / 2, width, height, pad, pad,
+                          'white', 'black', 1.0, alpha=0.8)
+        self.text(x, y, edge.label, EDGE_LABEL_FONTSIZE, 'normal')
+
+    def measure(self, text, fontsize):
+        """文字宽度（磅）"""
+        return text_width(text, fontsize)
+
+    @abstractmethod
+    def begin(self, layout):
+        """开始输出一页（layout 为 PageLayout）"""
+
+    @abstractmethod
+    def end(self):
+        """结束输出，返回文件内容（字节）"""
+
+    @abstractmethod
+    def rounded_rect(self, x, y, width, height, rx, ry, facecolor, edgecolor, linewidth,
+                     alpha=None):
+        """圆角矩形，(x, y) 为左下角"""
+
+    @abstractmethod
+    def ellipse(self, x, y, rx, ry, facecolor, edgecolor, linewidth):
+        """椭圆，(x, y) 为中心"""
+
+    @abstractmethod
+    def polygon(self, points, facecolor, edgecolor, linewidth):
+        """闭合多边形"""
+
+    @abstractmethod
+    def polyline(self, points, color, linewidth, linestyle):
+        """折线"""
+
+    @abstractmethod
+    def text(self, x, y, text, fontsize, fontweight):
+        """以 (x, y) 为中心的文字，可以有多行"""
+
+
+def num(value):
+    """坐标保留两位小数"""
+    text = f"{value:.2f}".rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+class SVGWriter(VectorWriter):
+    """输出SVG：文字为 <text> 元素，字体按 FONT_FAMILIES 回退"""
+
+    def begin(self, layout):
+        self.height = layout.height
+        families = ', '.join(f"'{family}'" if ' ' in family else family
+                             for family in FONT_FAMILIES)
+        self.parts = [
+            '<?xml version="1.0" encoding="utf-8"?>\n',
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{num(layout.width)}pt" '
+            f'height="{num(layout.height)}pt" '
+            f'viewBox="0 0 {num(layout.width)} {num(layout.height)}">\n',
+            '<rect width="100%" height="100%" fill="#ffffff"/>\n',
+            f'<g font-family="{families}, sans-serif" stroke-linejoin="round">\n'
+        ]
+
+    def end(self):
+        self.parts.append('</g>\n</svg>\n')
+        return ''.join(self.parts).encode('utf-8')
+
+    def xy(self, x, y):
+        """页面坐标转换为SVG坐标（y向下）"""
+        return f'{num(x)},{num(self.height - y)}'
+
+    @staticmethod
+    def paint(attribute, color):
+        """颜色属性，带透明度时加 -opacity"""
+        r, g, b, a = to_rgba(color)
+        value = f'{attribute}="#{round(r * 255):02x}{round(g * 255):02x}{round(b * 255):02x}"'
+        if a < 1:
+            value += f' {attribute}-opacity="{num(a)}"'
+        return value
+
+    def shape_style(self, facecolor, edgecolor, linewidth):
+        return f'{self.paint("fill", facecolor)} {self.paint("stroke", edgecolor)} ' \
+               f'stroke-width="{num(linewidth)}"'
+
+    def rounded_rect(self, x, y, width, height, rx, ry, facecolor, edgecolor, linewidth,
+                     alpha=None):
+        opacity = f' opacity="{num(alpha)}"' if alpha is not None else ''
+        self.parts.append(
+            f'<rect x="{num(x)}" y="{num(self.height - y - height)}" width="{num(width)}" '
+            f'height="{num(height)}" rx="{num(rx)}" ry="{num(ry)}" '
+            f'{self.shape_style(facecolor, edgecolor, linewidth)}{opacity}/>\n')
+
+    def ellipse(self, x, y, rx, ry, facecolor, edgecolor, linewidth):
+        self.parts.append(
+            f'<ellipse cx="{num(x)}" cy="{num(self.height - y)}" rx="{num(rx)}" ry="{num(ry)}" '
+            f'{self.shape_style(facecolor, edgecolor, linewidth)}/>\n')
+
+    def polygon(self, points, facecolor, edgecolor, linewidth):
+        self.parts.append(
+            f'<polygon points="{" ".join(self.xy(x, y) for x, y in points)}" '
+            f'{self.shape_style(facecolor, edgecolor, linewidth)}/>\n')
+
+    def polyline(self, points, color, linewidth, linestyle):
+        dashes = dash_pattern(linestyle, linewidth)
+        dash = f' stroke-dasharray="{",".join(num(d) for d in dashes)}"' if dashes else ''
+        self.parts.append(
+            f'<polyline points="{" ".join(self.xy(x, y) for x, y in points)}" fill="none" '
+            f'{self.paint("stroke", color)} stroke-width="{num(linewidth)}"{dash}/>\n')
+
+    def text(self, x, y, text, fontsize, fontweight):
+        weight = ' font-weight="bold"' if fontweight == 'bold' else ''
+        for line, center in line_centers(y, text, fontsize):
+            self.parts.append(
+                f'<text x="{num(x)}" y="{num(self.height - center)}" font-size="{num(fontsize)}"'
+                f'{weight} text-anchor="middle" dominant-baseline="central">'
+                f'{escape(line)}</text>\n')
+
+
+def pdf_font():
+    """注册并返回PDF使用的中文字体：系统中有 FONT_FAMILIES 的TrueType字体时嵌入该字体，
+    否则使用reportlab内置的 STSong-Light（不嵌入，由阅读器提供）"""
+    global _pdf_font
+    if _pdf_font is None:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+        from matplotlib import font_manager
+
+        for family in FONT_FAMILIES[:-1]:
+            try:
+                path = font_manager.findfont(family, fallback_to_default=False)
+                pdfmetrics.registerFont(TTFont('DiagramFont', path))
+                _pdf_font = 'DiagramFont'
+                break
+            except Exception:
+                continue
+        else:
+            pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+            _pdf_font = 'STSong-Light'
+    return _pdf_font
+
+
+class PDFWriter(VectorWriter):
+    """用reportlab输出PDF，页面坐标与PDF坐标相同（y向上）"""
+
+    def begin(self, layout):
+        from reportlab.pdfgen.canvas import Canvas
+
+        self.font = pdf_font()
+        self.buffer = io.BytesIO()
+        self.canvas = Canvas(self.buffer, pagesize=(layout.width, layout.height))
+        self.canvas.setLineJoin(1)
+
+    def end(self):
+        self.canvas.showPage()
+        self.canvas.save()
+        return self.buffer.getvalue()
+
+    def measure(self, text, fontsize):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        return max(stringWidth(line, self.font, fontsize) for line in text.split('\n'))
+
+    def set_paint(self, facecolor, edgecolor, linewidth):
+        r, g, b, a = to_rgba(facecolor)
+        self.canvas.setFillColorRGB(r, g, b, a)
+        r, g, b, a = to_rgba(edgecolor)
+        self.canvas.setStrokeColorRGB(r, g, b, a)
+        self.canvas.setLineWidth(linewidth)
+
+    def rounded_rect(self, x, y, width, height, rx, ry, facecolor, edgecolor, linewidth,
+                     alpha=None):
+        canvas = self.canvas
+        canvas.saveState()
+        self.set_paint(facecolor, edgecolor, linewidth)
+        if alpha is not None:
+            canvas.setFillAlpha(alpha)
+            canvas.setStrokeAlpha(alpha)
+        # 四个角为椭圆弧（两个方向缩放不同时与matplotlib一致）
+        path = canvas.beginPath()
+        path.moveTo(x + rx, y)
+        path.arcTo(x + width - 2 * rx, y, x + width, y + 2 * ry, -90, 90)
+        path.arcTo(x + width - 2 * rx, y + height - 2 * ry, x + width, y + height, 0, 90)
+        path.arcTo(x, y + height - 2 * ry, x + 2 * rx, y + height, 90, 90)
+        path.arcTo(x, y, x + 2 * rx, y + 2 * ry, 180, 90)
+        path.close()
+        canvas.drawPath(path, stroke=1, fill=1)
+        canvas.restoreState()
+
+    def ellipse(self, x, y, rx, ry, facecolor, edgecolor, linewidth):
+        self.canvas.saveState()
+        self.set_paint(facecolor, edgecolor, linewidth)
+        self.canvas.ellipse(x - rx, y - ry, x + rx, y + ry, stroke=1, fill=1)
+        self.canvas.restoreState()
+
+    def polygon(self, points, facecolor, edgecolor, linewidth):
+        self.canvas.saveState()
+        self.set_paint(facecolor, edgecolor, linewidth)
+        path = self.canvas.beginPath()
+        path.moveTo(*points[0])
+        for point in points[1:]:
+            path.lineTo(*point)
+        path.close()
+        self.canvas.drawPath(path, stroke=1, fill=1)
+        self.canvas.restoreState()
+
+    def polyline(self, points, color, linewidth, linestyle):
+        canvas = self.canvas
+        canvas.saveState()
+        self.set_paint('none', color, linewidth)
+        dashes = dash_pattern(linestyle, linewidth)
+        if dashes:
+            canvas.setDash(dashes)
+        path = canvas.beginPath()
+        path.moveTo(*points[0])
+        for point in points[1:]:
+            path.lineTo(*point)
+        canvas.drawPath(path, stroke=1, fill=0)
+        canvas.restoreState()
+
+    def text(self, x, y, text, fontsize, fontweight):
+        canvas = self.canvas
+        canvas.saveState()
+        canvas.setFont(self.font, fontsize)
+        canvas.setFillColorRGB(0, 0, 0)
+        # 内置中文字体没有粗体，粗体用描边加粗
+        mode = 0
+        if fontweight == 'bold':
+            canvas.setStrokeColorRGB(0, 0, 0)
+            canvas.setLineWidth(fontsize * 0.04)
+            mode = 2
+        for line, center in line_centers(y, text, fontsize):
+            canvas.drawCentredString(x, center - fontsize * 0.35, line, mode=mode)
+        canvas.restoreState()
+
+
+WRITERS = {'svg': SVGWriter, 'pdf': PDFWriter}
+
+
+def write_vector(scene, fmt, figsize=(14, 10)):
+    """把场景直接写为SVG或PDF，返回文件内容（字节）"""
+    if fmt not in WRITERS:
+        raise ValueError(f"原生矢量输出不支持的格式: {fmt}")
+    return WRITERS[fmt](figsize).write(scene)